@@ -0,0 +1,57 @@
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from cliquepay.aws_cognito import CognitoService
+from cliquepay.db_service import resolve_user
+from cliquepay.models import User
+
+
+def get_id_token(request):
+    """
+    Find the ID token of a request, in order: an "Authorization: Bearer"
+    header, "id_token" in the request body or "idToken" in the query string.
+    """
+    auth = get_authorization_header(request).split()
+    if len(auth) == 2 and auth[0].lower() == b'bearer':
+        return auth[1].decode('utf-8')
+
+    if hasattr(request.data, 'get'):
+        id_token = request.data.get('id_token')
+        if id_token:
+            return id_token
+
+    return request.query_params.get('idToken')
+
+
+class CognitoIdTokenAuthentication(BaseAuthentication):
+    """
+    Resolves the Cognito ID token of a request to its User once, through
+    the user cache, so views can pass request.user straight to
+    DatabaseService instead of decoding the token and looking the user
+    up again.
+
+    Requests without a token are left unauthenticated for the view to
+    reject. Invalid tokens and unknown users get a 401 in the same
+    {'status', 'message'} shape the views return.
+    """
+
+    def authenticate(self, request):
+        id_token = get_id_token(request)
+        if not id_token:
+            return None
+
+        decoded = CognitoService().get_user_id(id_token)
+        if decoded['status'] != 'SUCCESS':
+            raise exceptions.AuthenticationFailed(decoded)
+
+        try:
+            user = resolve_user(decoded['user_sub'])
+        except User.DoesNotExist:
+            raise exceptions.AuthenticationFailed({
+                'status': 'ERROR',
+                'message': 'User not found'
+            })
+
+        return user, decoded
+
+    def authenticate_header(self, request):
+        return 'Bearer'
@@ -1,6 +1,10 @@
 from rest_framework import serializers
+import time
 import uuid
+from django.db import transaction
 from cliquepay.models import Expense, Group, User, GroupMember, ExpenseSplit
+from cliquepay.ledger_service import BalanceLedger, to_amount
+from cliquepay.summary_service import GroupSummaryService
 class UserRegistrationSerializer(serializers.Serializer):
     username = serializers.CharField(max_length=255, required=True)
     fullname = serializers.CharField(max_length=255, required=True)
@@ -146,8 +150,18 @@ class GetDirectMessagesSerializer(serializers.Serializer):
             'blank': 'ID token cannot be blank'
         }
     )
+    peer_id = serializers.CharField(required=False)
     page = serializers.IntegerField(required=False, default=1, min_value=1)
     page_size = serializers.IntegerField(required=False, default=50, min_value=25, max_value=100)
+    before = serializers.CharField(required=False)
+    after = serializers.CharField(required=False)
+    use_cursor = serializers.BooleanField(required=False, default=False)
+    include_total = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, data):
+        if 'before' in data and 'after' in data:
+            raise serializers.ValidationError("Only one of before or after can be provided")
+        return data
 
 
 class GetGroupMessagesSerializer(serializers.Serializer):
@@ -161,6 +175,15 @@ class GetGroupMessagesSerializer(serializers.Serializer):
     group_id = serializers.CharField(required=True)
     page = serializers.IntegerField(required=False, default=1, min_value=1)
     page_size = serializers.IntegerField(required=False, default=50, min_value=25, max_value=100)
+    before = serializers.CharField(required=False)
+    after = serializers.CharField(required=False)
+    use_cursor = serializers.BooleanField(required=False, default=False)
+    include_total = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, data):
+        if 'before' in data and 'after' in data:
+            raise serializers.ValidationError("Only one of before or after can be provided")
+        return data
 
 class SearchUserSerializer(serializers.Serializer):
     id_token = serializers.CharField(required=True)
@@ -223,6 +246,7 @@ class GroupCreateSerializer(serializers.ModelSerializer):
                     group=group,
                     user=user
                 )
+                GroupSummaryService.add_member(user.id, group.id)
                 print(f"Added member {user.full_name} to group {group.name}")
             except User.DoesNotExist:
                 print(f"User with ID {member_id} not found, skipping")
@@ -258,85 +282,73 @@ class ExpenseCreateSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
+        """
+        Create the expense and all of its splits in one transaction.
+
+        Members are fetched with a single query and the splits are written
+        with one bulk INSERT. Pass a callable as context['timing_hook'] to
+        receive the expense id, split count and elapsed seconds of the call.
+        """
+        started = time.perf_counter()
         expense_id = str(uuid.uuid4())
         
         group_id = validated_data.pop('group_id', None).id if 'group_id' in validated_data else None
         friend_id = validated_data.pop('friend_id', None).id if 'friend_id' in validated_data else None
         paid_by_id = validated_data.pop('paid_by').id if 'paid_by' in validated_data else None
-        remaining_amount = 0
-        # Calculate the remaining amount based on whether it's a group or friend expense
+        total_amount = validated_data['total_amount']
+
+        # Work out who shares the expense
         if group_id:
-            # For group expenses, we need to find how many members are in the group
-            group_members = GroupMember.objects.filter(group_id=group_id)
-            member_count = group_members.count()
-            
-            if member_count > 0:
-                # The person who paid is owed by everyone else
-                # So remaining amount is total minus their own share
-                payer_share = validated_data['total_amount'] / member_count
-                remaining_amount = validated_data['total_amount'] - payer_share
-            else:
-                # Edge case - if no members (shouldn't happen), set remaining to 0
-                remaining_amount = 0
+            member_ids = list(
+                GroupMember.objects.filter(group_id=group_id).values_list('user_id', flat=True)
+            )
         elif friend_id:
             # For friend expenses, it's a simple 50/50 split
-            remaining_amount = validated_data['total_amount'] / 2
+            member_ids = [paid_by_id, friend_id]
         else:
             # Edge case - no group or friend (shouldn't happen)
-            remaining_amount = 0
-        # print(remaining_amount)
-        expense = Expense.objects.create(
-            id=expense_id,
-            friend_id=friend_id,
-            group_id=group_id,
-            paid_by_id=paid_by_id,
-            remaining_amount=remaining_amount,
-            **validated_data
-        )
-        
-        # Splitting the expense amount among group members or a friend
-        if group_id:
-            group_members = GroupMember.objects.filter(group_id=group_id)
-            member_count = group_members.count()
-            
-            if member_count > 0:
-                split_amount = validated_data['total_amount'] / member_count
-                
-                for member in group_members:
-                    # Create a split for each member
-                    # The payer's split is marked as paid, others as unpaid
-                    is_payer = str(member.user_id) == str(paid_by_id)
-                    
-                    ExpenseSplit.objects.create(
-                        id=str(uuid.uuid4()),
-                        expense_id=expense_id,
-                        user_id=member.user_id,
-                        total_amount=split_amount,
-                        remaining_amount=0 if is_payer else split_amount,
-                        is_paid=is_payer
-                    )
-        elif friend_id:
-            # Create splits for a friend expense (just two people)
-            # Split for the payer
-            ExpenseSplit.objects.create(
-                id=str(uuid.uuid4()),
-                expense_id=expense_id,
-                user_id=paid_by_id,
-                total_amount=validated_data['total_amount'] / 2,
-                remaining_amount=0,
-                is_paid=True
+            member_ids = []
+
+        # Create a split for each member
+        # The payer's split is marked as paid, others as unpaid
+        splits = []
+        if member_ids:
+            split_amount = to_amount(total_amount / len(member_ids))
+            for user_id in member_ids:
+                is_payer = str(user_id) == str(paid_by_id)
+                splits.append(ExpenseSplit(
+                    id=str(uuid.uuid4()),
+                    expense_id=expense_id,
+                    user_id=user_id,
+                    total_amount=split_amount,
+                    remaining_amount=0 if is_payer else split_amount,
+                    is_paid=is_payer
+                ))
+
+        # The payer is owed everything that isn't their own share
+        remaining_amount = sum((split.remaining_amount for split in splits), 0)
+
+        with transaction.atomic():
+            expense = Expense.objects.create(
+                id=expense_id,
+                friend_id=friend_id,
+                group_id=group_id,
+                paid_by_id=paid_by_id,
+                remaining_amount=remaining_amount,
+                **validated_data
             )
-            
-            # Split for the friend
-            ExpenseSplit.objects.create(
-                id=str(uuid.uuid4()),
-                expense_id=expense_id,
-                user_id=friend_id,
-                total_amount=validated_data['total_amount'] / 2,
-                remaining_amount=validated_data['total_amount'] / 2,
-                is_paid=False
-            )
-        expense.save()
+            ExpenseSplit.objects.bulk_create(splits)
+
+            # Record what everyone now owes the payer
+            BalanceLedger.apply(BalanceLedger.split_deltas(splits, paid_by_id, group_id))
+
+        timing_hook = self.context.get('timing_hook')
+        if callable(timing_hook):
+            timing_hook({
+                'expense_id': expense_id,
+                'split_count': len(splits),
+                'elapsed': time.perf_counter() - started
+            })
         return expense
     
 class ExpenseUpdateSerializer(serializers.ModelSerializer):
@@ -372,6 +384,8 @@ class GetSettlementDataSerializer(serializers.Serializer):
     id_token = serializers.CharField(required=True)
     friend_id = serializers.CharField(required=False, allow_null=True)
     group_id = serializers.CharField(required=False, allow_null=True)
+    page = serializers.IntegerField(required=False, default=1, min_value=1)
+    page_size = serializers.IntegerField(required=False, default=20, min_value=1, max_value=100)
 
 class RemoveFriendSerializer(serializers.Serializer):
     id_token = serializers.CharField(required=True)
@@ -440,4 +454,33 @@ class EditGroupSerializer(serializers.Serializer):
 class RemoveFromGroupSerializer(serializers.Serializer):
     id_token = serializers.CharField(required=True)
     group_id = serializers.CharField(required=True)
-    user_id = serializers.CharField(required=True)
\ No newline at end of file
+    user_id = serializers.CharField(required=True)
+
+class FriendshipStatusSerializer(serializers.Serializer):
+    id_token = serializers.CharField(required=True)
+    user_ids = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=500
+    )
+
+class GetUnreadCountsSerializer(serializers.Serializer):
+    id_token = serializers.CharField(required=True)
+
+class MarkGroupReadSerializer(serializers.Serializer):
+    id_token = serializers.CharField(required=True)
+    group_id = serializers.CharField(required=True)
+    message_id = serializers.CharField(required=False)
+
+class MarkDirectMessagesReadSerializer(serializers.Serializer):
+    id_token = serializers.CharField(required=True)
+    peer_id = serializers.CharField(required=True)
+    up_to_message_id = serializers.CharField(required=False)
+
+class GetDirectUnreadCountsSerializer(serializers.Serializer):
+    id_token = serializers.CharField(required=True)
+
+class GetConversationsSerializer(serializers.Serializer):
+    id_token = serializers.CharField(required=True)
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=100)
+    before = serializers.CharField(required=False)
\ No newline at end of file
@@ -11,6 +11,7 @@ urlpatterns = [
     path('api/reset-password/',views.initiate_reset_password, name='initiate_reset_password'),
     path('api/confirm-reset-password/',views.confirm_reset_password, name='confirm_reset_password'),
     path('api/get-user-friends/',views.get_user_friends, name='get_user_friends'),
+    path('api/friendship-statuses/',views.get_friendship_statuses, name='get_friendship_statuses'),
     path('api/resend-code/',views.get_resend_code, name='resend_code'),
     path('api/verify-user-access/',views.verify_user_access, name='verify_user_access'),
     path('api/user-profile/',views.get_user_profile, name='get_user_profile'),
@@ -25,6 +26,9 @@ urlpatterns = [
     path('api/get-direct-messages/',views.get_direct_messages, name='get_direct_messages'),
     path('api/get-group-messages/',views.get_group_messages, name='get_group_messages'),
     path('api/send-direct-message/',views.send_direct_message, name='send_direct_message'),
+    path('api/get-conversations/',views.get_conversations, name='get_conversations'),
+    path('api/mark-direct-messages-read/',views.mark_direct_messages_read, name='mark_direct_messages_read'),
+    path('api/get-direct-unread-counts/',views.get_direct_unread_counts, name='get_direct_unread_counts'),
     path('api/search-user/',views.search_user, name='search_user'),
     path('api/create-expense/', views.create_expense, name='create_expense'),
     path('api/get-expenses/', views.get_expenses, name='get_expenses'),
@@ -39,6 +43,8 @@ urlpatterns = [
     path('api/group-invite/',views.invite_to_group, name='group_invite'),
     path('api/leave-group/',views.leave_group, name='leave_group'),
     path('api/get-user-groups/',views.get_user_groups, name='get_user_groups'),
+    path('api/get-unread-counts/',views.get_unread_counts, name='get_unread_counts'),
+    path('api/mark-group-read/',views.mark_group_read, name='mark_group_read'),
     path('api/accept-group-invite/',views.accept_group_invite, name='accept_group_invite'),
     path('api/reject-group-invite/',views.reject_group_invite, name='reject_group_invite'),
     path('api/get-user-invites/',views.get_user_invites, name='get_user_invites'),
@@ -1,15 +1,19 @@
 from rest_framework.reverse import reverse
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, authentication_classes
 from rest_framework import status
 from django.http import JsonResponse
 from cliquepay.aws_cognito import CognitoService
 from cliquepay.db_service import DatabaseService
+from cliquepay.ledger_service import BalanceLedger, SettlementEngine, to_amount
 from .serializers import *
+from .authentication import CognitoIdTokenAuthentication
 from cliquepay.storage_service import CloudStorageService
 from api.serializers import SearchUserSerializer, GetDirectMessagesSerializer, GetGroupMessagesSerializer, InviteSearchListSerializer
 import logging
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -72,6 +76,11 @@ def api_root(request, format=None):
                 'method': 'POST',
                 'description': 'Extracts the user_sub from ID token,gets the user_id from database using user_sub and then makes a db query to get user friends using the user_id.'
             },
+            'friendship-statuses': {
+                'url': reverse('get_friendship_statuses', request=request, format=format),
+                'method': 'POST',
+                'description': 'Gets the friendship status and id between the user and each of up to 500 users.'
+            },
             'user-access': {
                 'url': reverse('verify_user_access', request=request, format=format),
                 'method': 'POST',
@@ -178,6 +187,31 @@ def api_root(request, format=None):
                 'method':'POST',
                 'description':'leave group.'
             },
+            'get-unread-counts': {
+                'url': reverse('get_unread_counts', request=request, format=format),
+                'method': 'POST',
+                'description': 'Gets the unread message count of every group the user is in.'
+            },
+            'mark-group-read': {
+                'url': reverse('mark_group_read', request=request, format=format),
+                'method': 'POST',
+                'description': 'Marks a group as read up to a message, the latest one by default.'
+            },
+            'get-conversations': {
+                'url': reverse('get_conversations', request=request, format=format),
+                'method': 'POST',
+                'description': 'Gets the direct message inbox, most recent conversation first, with cursor pagination.'
+            },
+            'mark-direct-messages-read': {
+                'url': reverse('mark_direct_messages_read', request=request, format=format),
+                'method': 'POST',
+                'description': 'Marks the messages from a user as read, up to a message or all of them.'
+            },
+            'get-direct-unread-counts': {
+                'url': reverse('get_direct_unread_counts', request=request, format=format),
+                'method': 'POST',
+                'description': 'Gets the unread direct message count of every conversation of the user.'
+            },
             'get-user-groups':{
                 'url':reverse('get_user_groups', request=request, format=format),
                 'method':'POST',
@@ -478,6 +512,7 @@ def confirm_reset_password(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def get_user_friends(request):
     """
     Confirm password reset with code
@@ -489,18 +524,15 @@ def get_user_friends(request):
     """
     serializer = GetUserFriendsSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        firstResult = cognito.get_user_id(serializer.validated_data['id_token'])
-        if firstResult['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.get_user_friends(firstResult.get('user_sub'))
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
+        db = DatabaseService()
+        result = db.get_user_friends(request.user)
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
         
         return Response({
             'status': 'error',
             'message': 'Could not verify user identity',
-            'details': firstResult.get('message')
+            'details': result.get('message')
         }, status=status.HTTP_401_UNAUTHORIZED)
     
     return Response({
@@ -509,6 +541,31 @@ def get_user_friends(request):
         'errors': serializer.errors
     }, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
+def get_friendship_statuses(request):
+    """
+    Get the friendship status with many users at once.
+
+    Request body:
+    {
+        "id_token": "your-id-token",
+        "user_ids": ["user-id-1", "user-id-2"]
+    }
+    """
+    serializer = FriendshipStatusSerializer(data=request.data)
+    if serializer.is_valid():
+        db = DatabaseService()
+        result = db.get_friendship_statuses(request.user, serializer.validated_data['user_ids'])
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'status': 'error',
+        'message': 'Invalid input',
+        'errors': serializer.errors
+    }, status=status.HTTP_400_BAD_REQUEST)
+
 @api_view(['POST'])
 def get_resend_code(request):
     """
@@ -559,6 +616,7 @@ def verify_user_access(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def get_user_profile(request):
     """
     Get the user profile from database by just providing the idToken.
@@ -571,15 +629,11 @@ def get_user_profile(request):
     """
     serializer = GetUserProfileSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        getId = cognito.get_user_id(serializer.validated_data['id_token'])
-        if getId['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.get_user_by_cognito_id(getId['user_sub'])
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_404_NOT_FOUND)
-        return Response(getId, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.get_user_by_cognito_id(request.user)
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_404_NOT_FOUND)
 
 
     return Response({
@@ -618,6 +672,7 @@ def change_password(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['PATCH'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def update_user_profile(request):
     """
     Updates the user's profile fields using an id_token
@@ -634,26 +689,17 @@ def update_user_profile(request):
     """
     serializer = UpdateUserProfileSerializer(data=request.data, partial=True)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            update_result = db.update_user_details(decoded['user_sub'],
-                full_name=serializer.validated_data.get('full_name'),
-                phone_number=serializer.validated_data.get('phone_number'),
-                avatar_url=serializer.validated_data.get('avatar_url'),
-                currency=serializer.validated_data.get('currency')
-            )
-            if update_result['status'] == 'SUCCESS':
-                return Response(update_result, status=status.HTTP_200_OK)
-            else:
-                return Response(update_result, status=status.HTTP_400_BAD_REQUEST)
+        db = DatabaseService()
+        update_result = db.update_user_details(request.user,
+            full_name=serializer.validated_data.get('full_name'),
+            phone_number=serializer.validated_data.get('phone_number'),
+            avatar_url=serializer.validated_data.get('avatar_url'),
+            currency=serializer.validated_data.get('currency')
+        )
+        if update_result['status'] == 'SUCCESS':
+            return Response(update_result, status=status.HTTP_200_OK)
         else:
-            return Response({
-                'status': 'ERROR',
-                'message': 'Could not decode user',
-                'details': decoded.get('message')
-            }, status=status.HTTP_401_UNAUTHORIZED)
+            return Response(update_result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -661,6 +707,7 @@ def update_user_profile(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def send_friend_request(request):
     """
     Send a friend request on behalf of the authenticated user.
@@ -674,29 +721,14 @@ def send_friend_request(request):
     """
     serializer = FriendRequestSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        id_result = cognito.get_user_id(serializer.validated_data['id_token'])
-        if id_result['status'] == 'SUCCESS':
-            user_sub = id_result['user_sub']
-            db = DatabaseService()
-            result = db.get_user_id_by_cognito_id(user_sub)
-            if result['status'] == 'SUCCESS':
-                user_id = result['user_id']
-                expected_keys = ['recieve_username', 'recieve_useremail']
-                filtered_data = {key: value for key, value in serializer.validated_data.items() if key in expected_keys}
-                result1 = db.send_friend_request(user_id, **filtered_data)
-                if result1['status'] == 'SUCCESS':
-                    return Response(result1, status=status.HTTP_200_OK)
-                else:
-                    return Response(result1, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        db = DatabaseService()
+        expected_keys = ['recieve_username', 'recieve_useremail']
+        filtered_data = {key: value for key, value in serializer.validated_data.items() if key in expected_keys}
+        result = db.send_friend_request(request.user, **filtered_data)
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
         else:
-            return Response({
-                'status': 'error',
-                'message': 'User verification failed',
-                'details': id_result.get('message', 'Invalid id_token')
-            }, status=status.HTTP_401_UNAUTHORIZED)
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
     
     return Response({
         'status': 'error',
@@ -705,6 +737,7 @@ def send_friend_request(request):
     }, status=status.HTTP_400_BAD_REQUEST)    
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def accept_friend_request(request):
     """
     Accept a friend request on behalf of the authenticated user.
@@ -717,16 +750,11 @@ def accept_friend_request(request):
     """
     serializer = AcceptFriendRequestSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        id_req = cognito.get_user_id(id_token=serializer.validated_data['id_token'])
-        if id_req['status'] == 'SUCCESS':
-            cognito_id = id_req['user_sub']
-            db = DatabaseService()
-            result = db.accept_friend_request(cognito_id=cognito_id, request_id=serializer.validated_data['request_id'])
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_202_ACCEPTED)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(id_req, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.accept_friend_request(cognito_id=request.user, request_id=serializer.validated_data['request_id'])
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_202_ACCEPTED)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -734,6 +762,7 @@ def accept_friend_request(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def block_user(request):
     """
     Block a user from the given idToken account
@@ -746,15 +775,11 @@ def block_user(request):
     """
     serializer = BlockUserSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        reqId = cognito.get_user_id(id_token=serializer.validated_data['id_token'])
-        if reqId['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.block_user(cognito_id=reqId['user_sub'], blocked_id=serializer.validated_data['blocked_id'])
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(reqId, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.block_user(cognito_id=request.user, blocked_id=serializer.validated_data['blocked_id'])
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
     'status': 'error',
     'message': 'Invalid input',
@@ -762,6 +787,7 @@ def block_user(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def upload_profile_picture(request):
     """
     Upload a profile picture for the user.
@@ -774,76 +800,70 @@ def upload_profile_picture(request):
     """
     serializer = UploadProfilePictureSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        getId = cognito.get_user_id(serializer.validated_data['id_token'])
-        if getId['status'] == 'SUCCESS':
-            db = DatabaseService()
-            user = db.get_user_by_cognito_id(getId['user_sub'])
-            
-            if user['status'] == 'SUCCESS':
-                storage = CloudStorageService()
-                try:
-                    # Upload the new profile picture
-                    new_url = storage.upload_profile_picture(
-                        serializer.validated_data['profile_picture'],
-                        user['user_data'].get('avatar_url')
+        db = DatabaseService()
+        user = db.get_user_by_cognito_id(request.user)
+        
+        if user['status'] == 'SUCCESS':
+            storage = CloudStorageService()
+            try:
+                # Upload the new profile picture
+                new_url = storage.upload_profile_picture(
+                    serializer.validated_data['profile_picture'],
+                    user['user_data'].get('avatar_url')
+                )
+                
+                if new_url:
+                    # Update the profile photo URL in the database
+                    update_result = db.update_profile_photo(
+                        cognito_id=request.user,
+                        photo_url=new_url
                     )
                     
-                    if new_url:
-                        # Update the profile photo URL in the database
-                        update_result = db.update_profile_photo(
-                            cognito_id=getId['user_sub'],
-                            photo_url=new_url
-                        )
-                        
-                        if update_result['status'] == 'SUCCESS':
-                            return Response({
-                                'status': 'success',
-                                'message': 'Profile picture updated successfully',
-                                'avatar_url': new_url,
-                                'user_data': update_result.get('user_data')
-                            }, status=status.HTTP_200_OK)
-                        
-                        # Return the original error response for debugging
-                        return Response(update_result, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                    if update_result['status'] == 'SUCCESS':
+                        return Response({
+                            'status': 'success',
+                            'message': 'Profile picture updated successfully',
+                            'avatar_url': new_url,
+                            'user_data': update_result.get('user_data')
+                        }, status=status.HTTP_200_OK)
                     
-                    # Return storage service error
-                    return Response({
-                        'status': 'error',
-                        'message': 'Failed to get URL from storage service',
-                        'debug_info': {
-                            'new_url': new_url,
-                            'file_name': serializer.validated_data['profile_picture'].name,
-                            'file_size': serializer.validated_data['profile_picture'].size,
-                            'content_type': serializer.validated_data['profile_picture'].content_type
-                        }
-                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                    # Return the original error response for debugging
+                    return Response(update_result, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
                 
-                except Exception as e:
-                    # Return detailed exception info for debugging
-                    return Response({
-                        'status': 'error',
-                        'message': 'Error processing profile picture',
-                        'error_type': type(e).__name__,
-                        'error_details': str(e),
-                        'debug_info': {
-                            'file_info': {
-                                'name': serializer.validated_data['profile_picture'].name,
-                                'size': serializer.validated_data['profile_picture'].size,
-                                'content_type': serializer.validated_data['profile_picture'].content_type
-                            },
-                            'user_info': {
-                                'cognito_id': getId['user_sub'],
-                                'current_avatar': user['user_data'].get('avatar_url')
-                            }
-                        }
-                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                # Return storage service error
+                return Response({
+                    'status': 'error',
+                    'message': 'Failed to get URL from storage service',
+                    'debug_info': {
+                        'new_url': new_url,
+                        'file_name': serializer.validated_data['profile_picture'].name,
+                        'file_size': serializer.validated_data['profile_picture'].size,
+                        'content_type': serializer.validated_data['profile_picture'].content_type
+                    }
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
-            # Return the original user fetch error
-            return Response(user, status=status.HTTP_404_NOT_FOUND)
+            except Exception as e:
+                # Return detailed exception info for debugging
+                return Response({
+                    'status': 'error',
+                    'message': 'Error processing profile picture',
+                    'error_type': type(e).__name__,
+                    'error_details': str(e),
+                    'debug_info': {
+                        'file_info': {
+                            'name': serializer.validated_data['profile_picture'].name,
+                            'size': serializer.validated_data['profile_picture'].size,
+                            'content_type': serializer.validated_data['profile_picture'].content_type
+                        },
+                        'user_info': {
+                            'cognito_id': request.user.cognito_id,
+                            'current_avatar': user['user_data'].get('avatar_url')
+                        }
+                    }
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        # Return the original Cognito error
-        return Response(getId, status=status.HTTP_401_UNAUTHORIZED)
+        # Return the original user fetch error
+        return Response(user, status=status.HTTP_404_NOT_FOUND)
 
     # Return serializer validation errors
     return Response({
@@ -857,6 +877,7 @@ def upload_profile_picture(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def reset_profile_picture(request):
     """
     Reset user's profile picture to default.
@@ -868,55 +889,51 @@ def reset_profile_picture(request):
     """
     serializer = ResetProfilePictureSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        getId = cognito.get_user_id(serializer.validated_data['id_token'])
-        if getId['status'] == 'SUCCESS':
-            db = DatabaseService()
-            user = db.get_user_by_cognito_id(getId['user_sub'])
-            
-            if user['status'] == 'SUCCESS':
-                storage = CloudStorageService()
-                try:
-                    # Reset the profile picture and get default URL
-                    default_url = storage.reset_profile_picture(
-                        user['user_data'].get('avatar_url')
+        db = DatabaseService()
+        user = db.get_user_by_cognito_id(request.user)
+        
+        if user['status'] == 'SUCCESS':
+            storage = CloudStorageService()
+            try:
+                # Reset the profile picture and get default URL
+                default_url = storage.reset_profile_picture(
+                    user['user_data'].get('avatar_url')
+                )
+                
+                if default_url:
+                    # Update the profile photo URL in the database
+                    update_result = db.update_profile_photo(
+                        cognito_id=request.user,
+                        photo_url=default_url
                     )
                     
-                    if default_url:
-                        # Update the profile photo URL in the database
-                        update_result = db.update_profile_photo(
-                            cognito_id=getId['user_sub'],
-                            photo_url=default_url
-                        )
-                        
-                        if update_result['status'] == 'SUCCESS':
-                            return Response({
-                                'status': 'success',
-                                'message': 'Profile picture reset successfully',
-                                'avatar_url': default_url,
-                                'user_data': update_result.get('user_data')
-                            }, status=status.HTTP_200_OK)
-                        
+                    if update_result['status'] == 'SUCCESS':
                         return Response({
-                            'status': 'error',
-                            'message': 'Failed to update profile picture in database',
-                            'details': update_result.get('message')
-                        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                            'status': 'success',
+                            'message': 'Profile picture reset successfully',
+                            'avatar_url': default_url,
+                            'user_data': update_result.get('user_data')
+                        }, status=status.HTTP_200_OK)
                     
                     return Response({
                         'status': 'error',
-                        'message': 'Failed to reset profile picture'
+                        'message': 'Failed to update profile picture in database',
+                        'details': update_result.get('message')
                     }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
                 
-                except Exception as e:
-                    return Response({
-                        'status': 'error',
-                        'message': 'Error resetting profile picture',
-                        'details': str(e)
-                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                return Response({
+                    'status': 'error',
+                    'message': 'Failed to reset profile picture'
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
-            return Response(user, status=status.HTTP_404_NOT_FOUND)
-        return Response(getId, status=status.HTTP_401_UNAUTHORIZED)
+            except Exception as e:
+                return Response({
+                    'status': 'error',
+                    'message': 'Error resetting profile picture',
+                    'details': str(e)
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        return Response(user, status=status.HTTP_404_NOT_FOUND)
 
     return Response({
         'status': 'error',
@@ -925,6 +942,7 @@ def reset_profile_picture(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def get_direct_messages(request):
     """
     Get direct messages belonging to a user.
@@ -932,19 +950,30 @@ def get_direct_messages(request):
     Request Body:
     {
         id_token: "your-id-token",
+        "peer_id"(optional): "only-the-conversation-with-this-user",
+        "page"(optional): "default-1",
+        "page_size"(optional): "default-50",
+        "use_cursor"(optional): "default-false",
+        "before" OR "after"(optional): "cursor-from-previous-page",
+        "include_total"(optional): "default-false"
     }
     """
     serializer = GetDirectMessagesSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.get_direct_messages(decoded['user_sub'], serializer.validated_data.get('page'), serializer.validated_data.get('page_size')) 
-            if result['status'] == 'SUCCESS':
-                return JsonResponse(result, status=status.HTTP_200_OK)
-            return JsonResponse(result, status=status.HTTP_400_BAD_REQUEST)
-        return JsonResponse(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.get_direct_messages(
+            request.user,
+            serializer.validated_data.get('page'),
+            serializer.validated_data.get('page_size'),
+            before=serializer.validated_data.get('before'),
+            after=serializer.validated_data.get('after'),
+            use_cursor=serializer.validated_data.get('use_cursor'),
+            include_total=serializer.validated_data.get('include_total'),
+            peer_id=serializer.validated_data.get('peer_id')
+        )
+        if result['status'] == 'SUCCESS':
+            return JsonResponse(result, status=status.HTTP_200_OK)
+        return JsonResponse(result, status=status.HTTP_400_BAD_REQUEST)
     
     return JsonResponse({
         'status': 'error',
@@ -953,6 +982,7 @@ def get_direct_messages(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def get_group_messages(request):
     """
     Get group messages belonging to a user.
@@ -963,20 +993,28 @@ def get_group_messages(request):
         "id_token": "your-id-token",
         "group_id": "your-group-id",
         "page"(optional): "default-1",
-        "page_size "(optional): "default-50" 
+        "page_size "(optional): "default-50",
+        "use_cursor"(optional): "default-false",
+        "before" OR "after"(optional): "cursor-from-previous-page",
+        "include_total"(optional): "default-false"
     }
     """
     serializer = GetGroupMessagesSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.get_group_messages(decoded['user_sub'], serializer.validated_data['group_id'], serializer.validated_data.get('page'), serializer.validated_data.get('page_size'))
-            if result['status'] == 'SUCCESS':
-                return JsonResponse(result, status=status.HTTP_200_OK)
-            return JsonResponse(result, status=status.HTTP_400_BAD_REQUEST)
-        return JsonResponse(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.get_group_messages(
+            request.user,
+            serializer.validated_data['group_id'],
+            serializer.validated_data.get('page'),
+            serializer.validated_data.get('page_size'),
+            before=serializer.validated_data.get('before'),
+            after=serializer.validated_data.get('after'),
+            use_cursor=serializer.validated_data.get('use_cursor'),
+            include_total=serializer.validated_data.get('include_total')
+        )
+        if result['status'] == 'SUCCESS':
+            return JsonResponse(result, status=status.HTTP_200_OK)
+        return JsonResponse(result, status=status.HTTP_400_BAD_REQUEST)
     return JsonResponse({
         'status': 'error',
         'message': 'Invalid input',
@@ -984,6 +1022,7 @@ def get_group_messages(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def send_direct_message(request):
     """
     Send a direct message to another user.
@@ -1004,21 +1043,17 @@ def send_direct_message(request):
     """
     serializer = SendDirectMessageSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.send_direct_message(
-                sender_id=decoded['user_sub'],
-                recipient_id=serializer.validated_data['recipient_id'],
-                content=serializer.validated_data['content'],
-                message_type=serializer.validated_data['message_type'],
-                file_url=serializer.validated_data.get('file_url')
-            )
-            if result['status'] == 'SUCCESS':
-                return JsonResponse(result, status=status.HTTP_200_OK)
-            return JsonResponse(result, status=status.HTTP_400_BAD_REQUEST)
-        return JsonResponse(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.send_direct_message(
+            sender_id=request.user,
+            recipient_id=serializer.validated_data['recipient_id'],
+            content=serializer.validated_data['content'],
+            message_type=serializer.validated_data['message_type'],
+            file_url=serializer.validated_data.get('file_url')
+        )
+        if result['status'] == 'SUCCESS':
+            return JsonResponse(result, status=status.HTTP_200_OK)
+        return JsonResponse(result, status=status.HTTP_400_BAD_REQUEST)
     return JsonResponse({
         'status': 'error',
         'message': 'Invalid input',
@@ -1026,6 +1061,7 @@ def send_direct_message(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def search_user(request):
     """
     Search for a user by full name, username or email .
@@ -1039,15 +1075,11 @@ def search_user(request):
     """
     serializer = SearchUserSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.search_users(decoded['user_sub'], serializer.validated_data['query'], serializer.validated_data.get('limit'))
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return JsonResponse(result, status=status.HTTP_400_BAD_REQUEST)
-        return JsonResponse(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.search_users(request.user, serializer.validated_data['query'], serializer.validated_data.get('limit'))
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return JsonResponse(result, status=status.HTTP_400_BAD_REQUEST)
     return JsonResponse({
         'status': 'error',
         'message': 'Invalid input',
@@ -1056,16 +1088,18 @@ def search_user(request):
 
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def create_expense(request):
     """
-    Create a new expense record in the database.
+    Create a new expense record in the database, paid by the
+    authenticated user.
     
     Request Body:
     {
+        "id_token": "your-id-token",
         "group_id": "group-id" OR "friend_id": "friend-id",
         "total_amount": 100.00,
         "description": "Expense description",
-        "paid_by": "user-id",
         "deadline": "2021-12-31",
         "receipt_url": "https://example.com/receipt.jpg"  # Optional
     }
@@ -1073,25 +1107,17 @@ def create_expense(request):
     Returns:
     - 201: Successfully created expense with expense details
     - 400: Validation error with detailed error messages
+    - 401: Invalid ID token
     - 403: Permission denied if user doesn't have access to the group
     """
-
-    request_data = request.data.copy()
-
-    try:
-        cognito = CognitoService()
-        firstResult = cognito.get_user_id(id_token=request_data['paid_by'])
-        
-        db = DatabaseService()
-        user_id = db.get_user_id_by_cognito_id(firstResult['user_sub'])['user_id']
-        request_data['paid_by'] = user_id
-        
-    except Exception as e:
-        print(f"Token verification error: {str(e)}")
+    if not isinstance(request.user, User):
         return Response({
             "status": "error",
-            "message": "Invalid token"
-        }, status=status.HTTP_401_UNAUTHORIZED)
+            "message": "ID token is required"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    request_data = request.data.copy()
+    request_data['paid_by'] = request.user.id
 
     serializer = ExpenseCreateSerializer(data=request_data)
     is_valid = serializer.is_valid()
@@ -1113,6 +1139,7 @@ def create_expense(request):
     )
 
 @api_view(['GET'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def get_expenses(request):
     """
     Get all expenses for the authenticated user.
@@ -1122,27 +1149,13 @@ def get_expenses(request):
     }
     """
     try:
-        id_token = request.query_params.get('idToken')
-        
-        if not id_token:
+        if not isinstance(request.user, User):
             return Response({
                 "status": "error",
                 "message": "idToken is required as a query parameter"
             }, status=status.HTTP_400_BAD_REQUEST)
             
-        try:
-            cognito = CognitoService()
-            firstResult = cognito.get_user_id(id_token=id_token)
-            
-            db = DatabaseService()
-            user_id = db.get_user_id_by_cognito_id(firstResult['user_sub'])['user_id']
-            
-        except Exception as e:
-            print(f"Token verification error: {str(e)}")
-            return Response({
-                "status": "error",
-                "message": "Invalid token"
-            }, status=status.HTTP_401_UNAUTHORIZED)
+        user_id = request.user.id
         
         expenses = Expense.objects.filter(
             models.Q(paid_by=user_id) | models.Q(splits=user_id)
@@ -1164,14 +1177,16 @@ def get_expenses(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['PUT', 'PATCH'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def update_expense(request):
     """
-    Update an existing expense record in the database.
+    Update an existing expense record in the database. Only the user who
+    paid the expense may update it.
     
     Request Body:
     {
+        "id_token": "your-id-token",
         "expense_id": "expense-id",
-        "user_id": "user-id",
         "total_amount": 100.00,       # Optional
         "description": "Updated description",  # Optional
         "deadline": "2021-12-31",     # Optional
@@ -1179,9 +1194,15 @@ def update_expense(request):
         "remaining_amount": 50.00     # Optional
     }
     """
+    if not isinstance(request.user, User):
+        return Response({
+            "status": "error",
+            "message": "ID token is required"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
     try:
         expense_id = request.data.get('expense_id')
-        user_id = request.data.get('user_id')
+        user_id = request.user.id
         if not expense_id:
             return Response({
                 "status": "error",
@@ -1219,19 +1240,25 @@ def update_expense(request):
             }, status=status.HTTP_400_BAD_REQUEST)
             
         
-        # If total_amount changed, update the splits proportionally
-        if 'total_amount' in request.data and request.data['total_amount'] != expense.total_amount:
-            old_amount = float(expense.total_amount)
-            new_amount = float(request.data['total_amount'])
-            ratio = new_amount / old_amount
-            
-            # Update each split amount
-            splits = ExpenseSplit.objects.filter(expense_id=expense_id)
-            for split in splits:
-                split.total_amount = split.total_amount * ratio
-                split.remaining_amount = split.remaining_amount * ratio
-                split.save()
-        serializer.save()
+        with transaction.atomic():
+            # If total_amount changed, update the splits proportionally
+            if 'total_amount' in request.data and request.data['total_amount'] != expense.total_amount:
+                old_amount = expense.total_amount
+                new_amount = to_amount(request.data['total_amount'])
+                ratio = new_amount / old_amount
+
+                # Update each split amount and move the difference onto the ledger
+                splits = list(ExpenseSplit.objects.select_for_update().filter(expense_id=expense_id))
+                deltas = BalanceLedger.split_deltas(splits, expense.paid_by_id, expense.group_id, sign=-1)
+                for split in splits:
+                    split.total_amount = to_amount(split.total_amount * ratio)
+                    split.remaining_amount = to_amount(split.remaining_amount * ratio)
+                ExpenseSplit.objects.bulk_update(splits, ['total_amount', 'remaining_amount'])
+
+                for key, delta in BalanceLedger.split_deltas(splits, expense.paid_by_id, expense.group_id).items():
+                    deltas[key] += delta
+                BalanceLedger.apply(deltas)
+            serializer.save()
     
         return Response({
             "status": "success",
@@ -1246,19 +1273,30 @@ def update_expense(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def get_expense_detail(request):
     """
-    Get detailed information about a specific expense
+    Get detailed information about a specific expense the authenticated
+    user paid or has a share in.
     
     Request Body:
     {
+        "id_token": "your-id-token",
         "expense_id": "expense-id"
     }
 
     """
+    if not isinstance(request.user, User):
+        return Response({
+            "status": "error",
+            "message": "ID token is required"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
     try:
         expense_id = request.data.get('expense_id')
-        expense = Expense.objects.get(id=expense_id)
+        expense = Expense.objects.filter(
+            models.Q(paid_by=request.user) | models.Q(splits__user=request.user)
+        ).distinct().get(id=expense_id)
         serializer = ExpenseGetSerializer(expense)
         return Response({
             "status": "Returned",
@@ -1275,15 +1313,17 @@ def get_expense_detail(request):
 
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def record_payment(request):
     """
-    Record a payment for settling up with a friend
+    Record a payment for settling up with a friend or a group.
+    Oldest unpaid splits are paid off first.
     
     Request Body:
     {
         "id_token": "your-id-token",
-        "user_id": "user-id-to-pay",
-        "amount": 50.00,
+        "user_id": "user-id-to-pay" OR "group_id": "group-to-settle",
+        "amount": 50.00 OR "settle_all": true,
         "description": "Payment settlement"
     }
     """
@@ -1296,80 +1336,51 @@ def record_payment(request):
                 "errors": serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
             
-        # Get the authenticated user
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] != 'SUCCESS':
-            return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
-        
-        db_user = User.objects.get(cognito_id=decoded['user_sub'])
-        print(f"Authenticated user: {db_user.name}")   
+        # The authenticated user
+        db_user = request.user
 
-        is_group_settlement = 'group_id' in serializer.validated_data
-        amount_to_settle = float(serializer.validated_data['amount'])
-        
-        if is_group_settlement:
-            # Group settlement logic
-            group_id = serializer.validated_data['group_id']
-            print(f"Processing group settlement for group {group_id}")
-
-            # Get all splits where current user owes money to other users in the group
-            splits_to_settle = ExpenseSplit.objects.filter(
-                user_id=db_user.id,
-                expense__group_id=group_id,
-                is_paid=False
-            )
-            print(splits_to_settle.values())
+        if serializer.validated_data.get('settle_all'):
+            amount_to_settle = None
+        elif 'amount' in serializer.validated_data:
+            amount_to_settle = serializer.validated_data['amount']
+        else:
+            return Response({
+                "status": "error",
+                "message": "Either amount or settle_all must be provided"
+            }, status=status.HTTP_400_BAD_REQUEST)
 
+        # Group settlements pay everyone the user owes in the group,
+        # otherwise only the splits owed to the given user are paid.
+        if 'group_id' in serializer.validated_data:
+            result = SettlementEngine.settle(
+                db_user.id,
+                amount_to_settle,
+                group_id=serializer.validated_data['group_id']
+            )
         else:
-            recipient_id = serializer.validated_data['user_id']
-            # Find all unsettled splits between these users
-            # Get all splits where current user owes money to the recipient
-            splits_to_settle = ExpenseSplit.objects.filter(
-                user_id=db_user.id,
-                expense__paid_by_id=recipient_id,
-                is_paid=False
-            ).order_by('created_at')
-        
-        if not splits_to_settle.exists():
+            result = SettlementEngine.settle(
+                db_user.id,
+                amount_to_settle,
+                creditor_id=serializer.validated_data['user_id']
+            )
+
+        if result['status'] != 'SUCCESS':
             return Response({
                 "status": "error",
-                "message": "No splits found to settle"
+                "message": result['message']
             }, status=status.HTTP_404_NOT_FOUND)
 
-        # Record payments for each split until the amount is fully paid
-        remaining_to_pay = amount_to_settle
-        settled_splits = []
-        for split in splits_to_settle:
-            if remaining_to_pay <= 0:
-                break
-            split_amount = min(float(split.remaining_amount), remaining_to_pay)
-            
-            # Update the split
-            split.remaining_amount = float(split.remaining_amount) - split_amount
-            if split.remaining_amount <= 0:
-                split.is_paid = True
-            split.save()
-            
-            # Update the expense's remaining amount
-            expense = split.expense
-            expense.remaining_amount = float(expense.remaining_amount) - split_amount
-            expense.save()
-            
-            remaining_to_pay -= split_amount
-            settled_splits.append({
-                'id': split.id,
-                'expense_id': split.expense_id,
-                'amount_paid': split_amount,
-                'is_fully_paid': split.is_paid
-            })
+        settled_splits = [
+            dict(split, amount_paid=float(split['amount_paid']))
+            for split in result['settled_splits']
+        ]
         
         return Response({
             "status": "success",
             "message": "Payment recorded successfully",
             "data": {
-                "amount_settled": amount_to_settle - remaining_to_pay,
-                "remaining_amount": remaining_to_pay if remaining_to_pay > 0 else 0,
+                "amount_settled": float(result['amount_settled']),
+                "remaining_amount": float(result['remaining_amount']),
                 "settled_splits": settled_splits
             }
         }, status=status.HTTP_200_OK)
@@ -1382,15 +1393,23 @@ def record_payment(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['DELETE'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def delete_expense(request):
     """
-    Delete an expense and its related splits
+    Delete an expense and its related splits. Only the user who paid the
+    expense may delete it.
     
     Request Body:
     {
+        "id_token": "your-id-token",
         "expense_id": "expense-id"
     }
     """
+    if not isinstance(request.user, User):
+        return Response({
+            "status": "error",
+            "message": "ID token is required"
+        }, status=status.HTTP_400_BAD_REQUEST)
 
     expense_id = request.data.get('expense_id')
     if not expense_id:
@@ -1400,10 +1419,18 @@ def delete_expense(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        expense = Expense.objects.get(id=expense_id)
-        splits = ExpenseSplit.objects.filter(expense_id=expense_id)
-        splits.delete()
-        expense.delete()
+        with transaction.atomic():
+            expense = Expense.objects.get(id=expense_id)
+            if expense.paid_by_id != request.user.id:
+                return Response({
+                    "status": "error",
+                    "message": "You don't have permission to delete this expense"
+                }, status=status.HTTP_403_FORBIDDEN)
+            splits = ExpenseSplit.objects.select_for_update().filter(expense_id=expense_id)
+            # Drop whatever is still owed on this expense from the ledger
+            BalanceLedger.apply(BalanceLedger.split_deltas(splits, expense.paid_by_id, expense.group_id, sign=-1))
+            splits.delete()
+            expense.delete()
         
         return Response({
             "status": "success",
@@ -1417,145 +1444,142 @@ def delete_expense(request):
 
 
 @api_view(['GET'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def get_financial_summary(request):
     """
     Get financial summary for dashboard.
     
     """
-    id_token = request.query_params.get('idToken')
-    if not id_token:
+    if not isinstance(request.user, User):
         return Response({
             'status': 'ERROR',
             'message': 'ID token is required'
         }, status=status.HTTP_400_BAD_REQUEST)
-        
-    cognito = CognitoService()
-    decoded = cognito.get_user_id(id_token)
     
-    if decoded['status'] != 'SUCCESS':
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
-    
-    user_id = decoded['user_sub']
-    
-    try:
-        # Find the database user by their Cognito ID
-        db_user = User.objects.get(cognito_id=user_id)
-        
-        # Now use the database primary key for queries
-        you_owe_splits = ExpenseSplit.objects.filter(
-            user_id=db_user.id,  # Use DB primary key
-            is_paid=False
-        ).exclude(expense__paid_by_id=db_user.id)
-        
-        they_owe_splits = ExpenseSplit.objects.filter(
-            expense__paid_by_id=db_user.id,  # Use DB primary key
-            is_paid=False
-        ).exclude(user_id=db_user.id)
-        
-        total_you_owe = sum(float(split.remaining_amount) for split in you_owe_splits)
-        total_they_owe = sum(float(split.remaining_amount) for split in they_owe_splits)
-        total_bill = total_you_owe + total_they_owe
+    # Totals come straight from the balance ledger
+    you_owe, they_owe = BalanceLedger.get_totals(request.user.id)
 
-        
-        return Response({
-            'status': 'SUCCESS',
-            'message': 'Financial summary fetched successfully',
-            'summary': {
-                'youOwe': total_you_owe,
-                'theyOwe': total_they_owe,
-                'totalBill': total_bill,
-            }
-        }, status=status.HTTP_200_OK)
-        
-    except User.DoesNotExist:
-        return Response({
-            'status': 'ERROR',
-            'message': 'User not found'
-        }, status=status.HTTP_404_NOT_FOUND)
+    total_you_owe = float(you_owe)
+    total_they_owe = float(they_owe)
+    total_bill = total_you_owe + total_they_owe
+
+    
+    return Response({
+        'status': 'SUCCESS',
+        'message': 'Financial summary fetched successfully',
+        'summary': {
+            'youOwe': total_you_owe,
+            'theyOwe': total_they_owe,
+            'totalBill': total_bill,
+        }
+    }, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def get_settlement_data(request):
     """
     Get data about money the user owes to others.
+    Each creditor's expenses list is paginated with page/page_size.
     
     Request Body:
     {
         "id_token": "your-id-token",
+        "group_id" (optional): "only-debts-from-this-group",
+        "page" (optional): "default-1",
+        "page_size" (optional): "default-20"
     }
     """
     serializer = GetSettlementDataSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        
-        if decoded['status'] != 'SUCCESS':
-            return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
-        
         try:
-            # Find the database user by their Cognito ID
-            db_user = User.objects.get(cognito_id=decoded['user_sub'])
-            
-            # Initialize response data
-            response_data = {
-                'settlements': [],
-                'total_to_pay': 0,
-            }
+            db_user = request.user
+            group_id = serializer.validated_data.get('group_id')
+            page = serializer.validated_data.get('page')
+            page_size = serializer.validated_data.get('page_size')
             
-            # Get unsettled expense splits
-            splits_query = ExpenseSplit.objects.filter(is_paid=False)
-            
-            # THIS IS THE KEY CHANGE: Get splits where USER OWES OTHERS
+            # Get splits where USER OWES OTHERS
             # (user is in the split but NOT the payer)
-            you_owe_splits = splits_query.filter(
-                user_id=db_user.id  # User is part of the split
+            you_owe_splits = ExpenseSplit.objects.filter(
+                user_id=db_user.id,  # User is part of the split
+                is_paid=False
             ).exclude(expense__paid_by_id=db_user.id)  # But user is not the payer
             
-
-            
             # Filter by group if specified
-            # if group_id:
-            #     you_owe_splits = you_owe_splits.filter(expense__group_id=group_id)
+            if group_id:
+                you_owe_splits = you_owe_splits.filter(expense__group_id=group_id)
             
-            # Process the splits where user owes others
+            # Amount owed to each creditor comes from the balance ledger
             user_owes = {}
-            for split in you_owe_splits:
-                paid_by_id = split.expense.paid_by_id
-                if paid_by_id not in user_owes:
-                    try:
-                        paid_by_user = User.objects.get(id=paid_by_id)
-                        user_owes[paid_by_id] = {
-                            'id': paid_by_id,
-                            'name': paid_by_user.full_name,
-                            'avatar_url': paid_by_user.avatar_url,
-                            'amount': 0,
-                            'expenses': []
-                        }
-                    except User.DoesNotExist:
-                        continue
-                group = None
-                if split.expense.group_id:
-                    group = Group.objects.get(id=split.expense.group_id)
-
-                user_owes[paid_by_id]['amount'] += float(split.remaining_amount)
-                user_owes[paid_by_id]['expenses'].append({
-                    'id': split.expense.id,
-                    'description': split.expense.description,
-                    'amount': float(split.remaining_amount),
-                    'created_at': split.expense.created_at.isoformat(),
-                    'deadline': split.expense.deadline.isoformat() if split.expense.deadline else None,
-                    'group_id': split.expense.group_id,
-                    'group_name': group.name if split.expense.group_id else None,
+            for creditor in BalanceLedger.get_creditors(db_user.id, group_id):
+                user_owes[creditor['creditor_id']] = {
+                    'id': creditor['creditor_id'],
+                    'name': creditor['creditor__full_name'],
+                    'avatar_url': creditor['creditor__avatar_url'],
+                    'amount': float(creditor['total']),
+                    'expenses': []
+                }
+
+            # Number of unsettled expenses per creditor, grouped in the database
+            expense_counts = dict(
+                you_owe_splits.order_by()
+                .values('expense__paid_by_id')
+                .annotate(count=Count('id'))
+                .values_list('expense__paid_by_id', 'count')
+            )
+
+            # One page of expenses for every creditor in a single query
+            start_idx = (page - 1) * page_size
+            owed_expenses = you_owe_splits.annotate(
+                row_number=Window(
+                    expression=RowNumber(),
+                    partition_by=[F('expense__paid_by_id')],
+                    order_by=[F('expense__created_at').asc(), F('id').asc()]
+                )
+            ).filter(
+                row_number__gt=start_idx,
+                row_number__lte=start_idx + page_size
+            ).values(
+                'remaining_amount',
+                'expense_id',
+                'expense__paid_by_id',
+                'expense__description',
+                'expense__created_at',
+                'expense__deadline',
+                'expense__group_id',
+                'expense__group__name'
+            )
+
+            for split in owed_expenses:
+                creditor = user_owes.get(split['expense__paid_by_id'])
+                if creditor is None:
+                    continue
+                creditor['expenses'].append({
+                    'id': split['expense_id'],
+                    'description': split['expense__description'],
+                    'amount': float(split['remaining_amount']),
+                    'created_at': split['expense__created_at'].isoformat(),
+                    'deadline': split['expense__deadline'].isoformat() if split['expense__deadline'] else None,
+                    'group_id': split['expense__group_id'],
+                    'group_name': split['expense__group__name'],
                 })
                 
             # Combine data and calculate totals
             all_settlements = []
             total_to_pay = 0
-            for user_id, data in user_owes.items():
+            for paid_by_id, data in user_owes.items():
+                total_expenses = expense_counts.get(paid_by_id, 0)
+                total_pages = (total_expenses + page_size - 1) // page_size
+                data['expenses_pagination'] = {
+                    'current_page': page,
+                    'total_pages': total_pages,
+                    'page_size': page_size,
+                    'total_expenses': total_expenses,
+                    'has_next': page < total_pages,
+                    'has_previous': page > 1
+                }
                 total_to_pay += data['amount']
                 data['type'] = 'to_pay'  # Explicitly mark as "to pay"
                 all_settlements.append(data)
-
-            print(all_settlements)
             
             response_data = {
                 'status': 'SUCCESS',
@@ -1566,12 +1590,6 @@ def get_settlement_data(request):
             
             return Response(response_data, status=status.HTTP_200_OK)
             
-        except User.DoesNotExist:
-            return Response({
-                'status': 'ERROR',
-                'message': 'User not found'
-            }, status=status.HTTP_404_NOT_FOUND)
-            
         except Exception as e:
             return Response({
                 'status': 'ERROR',
@@ -1585,6 +1603,7 @@ def get_settlement_data(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def reject_friend_request(request):
     """
     Reject a friend request on behalf of the authenticated user.
@@ -1597,16 +1616,11 @@ def reject_friend_request(request):
     """
     serializer = AcceptFriendRequestSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        id_req = cognito.get_user_id(id_token=serializer.validated_data['id_token'])
-        if id_req['status'] == 'SUCCESS':
-            cognito_id = id_req['user_sub']
-            db = DatabaseService()
-            result = db.reject_friend_request(cognito_id=cognito_id, request_id=serializer.validated_data['request_id'])
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_202_ACCEPTED)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(id_req, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.reject_friend_request(cognito_id=request.user, request_id=serializer.validated_data['request_id'])
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_202_ACCEPTED)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -1614,6 +1628,7 @@ def reject_friend_request(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def remove_friend(request):
     """
     Remove a friend connection between two users.
@@ -1628,22 +1643,16 @@ def remove_friend(request):
     """
     serializer = RemoveFriendSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        id_result = cognito.get_user_id(serializer.validated_data['id_token'])
+        db = DatabaseService()
+        result = db.remove_friend(
+            cognito_id=request.user,
+            friendship_id=serializer.validated_data['friendship_id'],
+            block=serializer.validated_data.get('block')
+        )
         
-        if id_result['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.remove_friend(
-                cognito_id=id_result['user_sub'],
-                friendship_id=serializer.validated_data['friendship_id'],
-                block=serializer.validated_data.get('block')
-            )
-            
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-            
-        return Response(id_result, status=status.HTTP_401_UNAUTHORIZED)
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -1651,6 +1660,7 @@ def remove_friend(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def get_group_info(request):
     """
     Get the group information along with members.
@@ -1664,15 +1674,11 @@ def get_group_info(request):
     """
     serializer = GetGroupInfoSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.get_group_info(decoded['user_sub'], serializer.validated_data['group_id'])
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.get_group_info(request.user, serializer.validated_data['group_id'])
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -1680,6 +1686,7 @@ def get_group_info(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def create_group(request):
     """
     Creates a group and assigns the user admin role.
@@ -1693,19 +1700,15 @@ def create_group(request):
     """
     serializer = CreateGroupSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.create_group(
-                user_sub=decoded['user_sub'],
-                group_name=serializer.validated_data['group_name'],
-                group_description=serializer.validated_data.get('group_description')
-            )
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.create_group(
+            user_sub=request.user,
+            group_name=serializer.validated_data['group_name'],
+            group_description=serializer.validated_data.get('group_description')
+        )
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -1713,6 +1716,7 @@ def create_group(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def invite_to_group(request):
     """
     Invite a user to group.
@@ -1726,19 +1730,15 @@ def invite_to_group(request):
     """
     serializer = InvitePersonSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.invite_to_group(
-                user_sub=decoded['user_sub'],
-                invited_id=serializer.validated_data['invited_id'],
-                group_id=serializer.validated_data['group_id']
-            )
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.invite_to_group(
+            user_sub=request.user,
+            invited_id=serializer.validated_data['invited_id'],
+            group_id=serializer.validated_data['group_id']
+        )
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -1746,6 +1746,7 @@ def invite_to_group(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def leave_group(request):
     """
     Leave a group.
@@ -1758,18 +1759,14 @@ def leave_group(request):
     """
     serializer = LeaveGroupSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.leave_group(
-                user_sub=decoded['user_sub'],
-                group_id=serializer.validated_data['group_id']
-            )
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.leave_group(
+            user_sub=request.user,
+            group_id=serializer.validated_data['group_id']
+        )
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -1777,6 +1774,7 @@ def leave_group(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def get_user_groups(request):
     """
     Get all the groups belonging to the user.
@@ -1788,16 +1786,12 @@ def get_user_groups(request):
     """
     serializer = GetUserGroupsSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.get_user_groups(decoded['user_sub'])
-            print(result)
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.get_user_groups(request.user)
+        print(result)
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -1805,6 +1799,7 @@ def get_user_groups(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def accept_group_invite(request):
     """
     Accept an invitation to join a group.
@@ -1817,18 +1812,14 @@ def accept_group_invite(request):
     """
     serializer = AcceptGroupInviteSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.accept_group_invite(
-                user_sub=decoded['user_sub'],
-                invite_id=serializer.validated_data['invite_id']
-            )
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.accept_group_invite(
+            user_sub=request.user,
+            invite_id=serializer.validated_data['invite_id']
+        )
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -1836,6 +1827,7 @@ def accept_group_invite(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def reject_group_invite(request):
     """
     reject a group invitation.
@@ -1848,18 +1840,14 @@ def reject_group_invite(request):
     """
     serializer = AcceptGroupInviteSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.reject_group_invite(
-                user_sub=decoded['user_sub'],
-                invite_id=serializer.validated_data['invite_id']
-            )
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.reject_group_invite(
+            user_sub=request.user,
+            invite_id=serializer.validated_data['invite_id']
+        )
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -1867,6 +1855,7 @@ def reject_group_invite(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def get_user_invites(request):
     """
     Get all the group invitations for a user.
@@ -1878,15 +1867,11 @@ def get_user_invites(request):
     """
     serializer = GetUserInvitesSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.get_user_invites(decoded['user_sub'])
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.get_user_invites(request.user)
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -1894,6 +1879,7 @@ def get_user_invites(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def cancel_group_invite(request):
     """
     Take back the invite sent to a user.
@@ -1906,18 +1892,14 @@ def cancel_group_invite(request):
     """
     serializer = AcceptGroupInviteSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.cancel_group_invite(
-                user_sub=decoded['user_sub'],
-                invite_id=serializer.validated_data['invite_id']
-            )
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.cancel_group_invite(
+            user_sub=request.user,
+            invite_id=serializer.validated_data['invite_id']
+        )
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -1925,6 +1907,7 @@ def cancel_group_invite(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def send_group_message(request):
     """
     Send a message to a group.
@@ -1940,21 +1923,17 @@ def send_group_message(request):
     """
     serializer = SendGroupMessageSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.send_group_message(
-                sender_id=decoded['user_sub'],
-                group_id=serializer.validated_data['group_id'],
-                content=serializer.validated_data['content'],
-                message_type=serializer.validated_data['message_type'],
-                file_url=serializer.validated_data.get('file_url')
-            )
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.send_group_message(
+            sender_id=request.user,
+            group_id=serializer.validated_data['group_id'],
+            content=serializer.validated_data['content'],
+            message_type=serializer.validated_data['message_type'],
+            file_url=serializer.validated_data.get('file_url')
+        )
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -1962,6 +1941,7 @@ def send_group_message(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def invite_search(request):
     """
     Search users to invite to the group.
@@ -1975,19 +1955,15 @@ def invite_search(request):
     """
     serializer = InviteSearchListSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.search_invite(
-                user_sub=decoded['user_sub'],
-                group_id=serializer.validated_data['group_id'],
-                search_term=serializer.validated_data['search_term']
-            )
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.search_invite(
+            user_sub=request.user,
+            group_id=serializer.validated_data['group_id'],
+            search_term=serializer.validated_data['search_term']
+        )
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -1995,6 +1971,7 @@ def invite_search(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def delete_group(request):
     """
     Delete a group.
@@ -2007,18 +1984,14 @@ def delete_group(request):
     """
     serializer = DeleteGroupSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.delete_group(
-                user_sub=decoded['user_sub'],
-                group_id=serializer.validated_data['group_id']
-            )
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.delete_group(
+            user_sub=request.user,
+            group_id=serializer.validated_data['group_id']
+        )
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -2026,6 +1999,7 @@ def delete_group(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def edit_group(request):
     """
     Edit a group.
@@ -2040,20 +2014,16 @@ def edit_group(request):
     """
     serializer = EditGroupSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.edit_group(
-                user_sub=decoded['user_sub'],
-                group_id=serializer.validated_data['group_id'],
-                group_name=serializer.validated_data.get('group_name'),
-                group_description=serializer.validated_data.get('group_description')
-            )
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.edit_group(
+            user_sub=request.user,
+            group_id=serializer.validated_data['group_id'],
+            group_name=serializer.validated_data.get('group_name'),
+            group_description=serializer.validated_data.get('group_description')
+        )
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
@@ -2061,6 +2031,7 @@ def edit_group(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
 def remove_from_group(request):
     """
     Remove a user from a group.
@@ -2074,19 +2045,153 @@ def remove_from_group(request):
     """
     serializer = RemoveFromGroupSerializer(data=request.data)
     if serializer.is_valid():
-        cognito = CognitoService()
-        decoded = cognito.get_user_id(serializer.validated_data['id_token'])
-        if decoded['status'] == 'SUCCESS':
-            db = DatabaseService()
-            result = db.remove_from_group(
-                user_sub=decoded['user_sub'],
-                group_id=serializer.validated_data['group_id'],
-                user_id=serializer.validated_data['user_id']
-            )
-            if result['status'] == 'SUCCESS':
-                return Response(result, status=status.HTTP_200_OK)
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
-        return Response(decoded, status=status.HTTP_401_UNAUTHORIZED)
+        db = DatabaseService()
+        result = db.remove_from_group(
+            user_sub=request.user,
+            group_id=serializer.validated_data['group_id'],
+            user_id=serializer.validated_data['user_id']
+        )
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'status': 'error',
+        'message': 'Invalid input',
+        'errors': serializer.errors
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
+def get_unread_counts(request):
+    """
+    Get the user's unread message counts for all of their groups.
+
+    Request Body:
+    {
+        "id_token": "your-id-token"
+    }
+    """
+    serializer = GetUnreadCountsSerializer(data=request.data)
+    if serializer.is_valid():
+        db = DatabaseService()
+        result = db.get_unread_counts(request.user)
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'status': 'error',
+        'message': 'Invalid input',
+        'errors': serializer.errors
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
+def mark_group_read(request):
+    """
+    Mark a group as read up to a message.
+
+    Request Body:
+    {
+        "id_token": "your-id-token",
+        "group_id": "group-id",
+        "message_id": "message-id" (optional, defaults to the latest message)
+    }
+    """
+    serializer = MarkGroupReadSerializer(data=request.data)
+    if serializer.is_valid():
+        db = DatabaseService()
+        result = db.mark_group_read(
+            user_sub=request.user,
+            group_id=serializer.validated_data['group_id'],
+            message_id=serializer.validated_data.get('message_id')
+        )
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'status': 'error',
+        'message': 'Invalid input',
+        'errors': serializer.errors
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
+def mark_direct_messages_read(request):
+    """
+    Mark the direct messages from a user as read.
+
+    Request Body:
+    {
+        "id_token": "your-id-token",
+        "peer_id": "user-id",
+        "up_to_message_id": "message-id" (optional, defaults to all messages)
+    }
+    """
+    serializer = MarkDirectMessagesReadSerializer(data=request.data)
+    if serializer.is_valid():
+        db = DatabaseService()
+        result = db.mark_direct_messages_read(
+            user_sub=request.user,
+            peer_id=serializer.validated_data['peer_id'],
+            up_to_message_id=serializer.validated_data.get('up_to_message_id')
+        )
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'status': 'error',
+        'message': 'Invalid input',
+        'errors': serializer.errors
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
+def get_direct_unread_counts(request):
+    """
+    Get the user's unread direct message counts per conversation.
+
+    Request Body:
+    {
+        "id_token": "your-id-token"
+    }
+    """
+    serializer = GetDirectUnreadCountsSerializer(data=request.data)
+    if serializer.is_valid():
+        db = DatabaseService()
+        result = db.get_direct_unread_counts(request.user)
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'status': 'error',
+        'message': 'Invalid input',
+        'errors': serializer.errors
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+@authentication_classes([CognitoIdTokenAuthentication])
+def get_conversations(request):
+    """
+    Get the user's direct message conversations, most recent first.
+
+    Request Body:
+    {
+        "id_token": "your-id-token",
+        "limit": 20 (optional),
+        "before": "cursor" (optional, next_cursor of the previous page)
+    }
+    """
+    serializer = GetConversationsSerializer(data=request.data)
+    if serializer.is_valid():
+        db = DatabaseService()
+        result = db.get_conversations(
+            user_sub=request.user,
+            limit=serializer.validated_data['limit'],
+            before=serializer.validated_data.get('before')
+        )
+        if result['status'] == 'SUCCESS':
+            return Response(result, status=status.HTTP_200_OK)
+        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     return Response({
         'status': 'error',
         'message': 'Invalid input',
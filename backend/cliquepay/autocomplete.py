@@ -0,0 +1,197 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import namedtuple
+from django.conf import settings
+from django.db import connection
+from .models import User
+
+# What a search result needs to show, so prefix queries never load users
+IndexedUser = namedtuple('IndexedUser', ['id', 'name', 'full_name', 'avatar_url'])
+
+
+def _name_keys(full_name):
+    # The whole full name and every later word of it, so "won" finds
+    # "Alice Wonder"
+    full_name = (full_name or '').lower()
+    words = full_name.split()
+    return {full_name} | {' '.join(words[i:]) for i in range(1, len(words))}
+
+
+class PrefixIndex:
+    """
+    In-process prefix index over usernames and full names, answering
+    autocomplete queries without a database round trip.
+
+    Keys live in two sorted lists of (key, user_id) pairs, so a prefix
+    query is a bisect to the first key and a walk while keys still start
+    with the prefix. Username matches come before full name matches.
+    Each user's name, full name and avatar are kept next to the keys, so
+    results can be rendered straight from the index.
+
+    The index is built in a background thread when the process first asks
+    for it, and kept current by the User post_save/post_delete signals.
+    Signals only reach the process that saved the user, so the index is
+    also rebuilt in the background every refresh_interval seconds to pick
+    up changes made by other workers. Searches never wait for a build:
+    they answer from the current lists, which are empty until the first
+    build is swapped in, and callers fall back to the database.
+    """
+
+    def __init__(self, refresh_interval=300):
+        self.refresh_interval = refresh_interval
+        self._names = []
+        self._full_names = []
+        # user id -> (IndexedUser, name key, full name keys)
+        self._users = {}
+        self._built_at = None
+        self._building = False
+        # user id -> IndexedUser, or None when deleted, for changes made
+        # while a build is loading users
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Start rebuilding the index in a background thread, unless a build
+        is already running. The current lists keep serving searches until
+        the new ones are swapped in.
+        """
+        with self._lock:
+            self._start_build()
+
+    def _start_build(self):
+        # Called with _lock held
+        if self._building:
+            return
+        self._building = True
+        self._pending = {}
+        threading.Thread(target=self._build, name='autocomplete-build', daemon=True).start()
+
+    def _build(self):
+        try:
+            names = []
+            full_names = []
+            users = {}
+            for values in User.objects.values_list('id', 'name', 'full_name', 'avatar_url').iterator():
+                user = IndexedUser(*values)
+                name_key = (user.name or '').lower()
+                full_name_keys = _name_keys(user.full_name)
+                names.append((name_key, user.id))
+                full_names.extend((key, user.id) for key in full_name_keys)
+                users[user.id] = (user, name_key, full_name_keys)
+            names.sort()
+            full_names.sort()
+
+            with self._lock:
+                self._names, self._full_names, self._users = names, full_names, users
+                # Users saved or deleted while the query ran may be missing
+                # from it or loaded with their old names
+                for user_id, user in self._pending.items():
+                    if user is None:
+                        self._discard(user_id)
+                    else:
+                        self._insert(user)
+                self._built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._building = False
+                self._pending = {}
+            # The thread's connection is not closed by the request cycle
+            connection.close()
+
+    @staticmethod
+    def _remove(entries, entry):
+        i = bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+
+    def _discard(self, user_id):
+        entry = self._users.pop(user_id, None)
+        if entry is None:
+            return
+        _, name_key, full_name_keys = entry
+        self._remove(self._names, (name_key, user_id))
+        for key in full_name_keys:
+            self._remove(self._full_names, (key, user_id))
+
+    def _insert(self, user):
+        self._discard(user.id)
+        name_key = (user.name or '').lower()
+        full_name_keys = _name_keys(user.full_name)
+        insort(self._names, (name_key, user.id))
+        for key in full_name_keys:
+            insort(self._full_names, (key, user.id))
+        self._users[user.id] = (user, name_key, full_name_keys)
+
+    def update_user(self, user):
+        """
+        Re-index a created or updated user. Does nothing until the first
+        build has started, that build loads the user anyway.
+        """
+        indexed = IndexedUser(user.id, user.name, user.full_name, user.avatar_url)
+        with self._lock:
+            if self._building:
+                self._pending[user.id] = indexed
+            if self._built_at is not None:
+                self._insert(indexed)
+
+    def remove_user(self, user_id):
+        with self._lock:
+            if self._building:
+                self._pending[user_id] = None
+            self._discard(user_id)
+
+    def search(self, prefix, limit=10, exclude=None):
+        """
+        Users whose username, full name or a word of their full name
+        starts with prefix, usernames first.
+
+        Args:
+            prefix (str): Text typed so far
+            limit (int): Maximum number of users to return
+            exclude (str, optional): ID of a user to leave out, e.g. the
+                one searching
+
+        Returns:
+            list: IndexedUser tuples, best matches first
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+
+        with self._lock:
+            if self._built_at is None or time.monotonic() - self._built_at > self.refresh_interval:
+                self._start_build()
+            user_ids = []
+            for entries in (self._names, self._full_names):
+                i = bisect_left(entries, (prefix,))
+                while i < len(entries) and len(user_ids) < limit:
+                    key, user_id = entries[i]
+                    if not key.startswith(prefix):
+                        break
+                    if user_id not in user_ids and user_id != exclude:
+                        user_ids.append(user_id)
+                    i += 1
+            return [self._users[user_id][0] for user_id in user_ids]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_autocomplete_index():
+    """
+    Return the process-wide autocomplete index. The first call starts
+    filling it from the database in the background, not import time.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = PrefixIndex(
+                    refresh_interval=getattr(settings, 'AUTOCOMPLETE_REFRESH_INTERVAL', 300)
+                )
+                index.refresh()
+                _index = index
+    return _index
@@ -3,19 +3,168 @@ import jwt
 import hmac
 import hashlib
 import base64
+import threading
+import time
+import uuid
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from django.conf import settings
+from django.core.cache import caches
 from .db_service import *
+from .token_verifier import get_token_verifier
+from .cache_utils import SingleFlight, TTLCache
+
+_client = None
+_client_lock = threading.Lock()
+
+AUTH_KEY_PREFIX = 'cliquepay:auth'
+# Longest a check_user_auth result is cached without a shared cache, which
+# bounds how long other workers keep accepting a logged out session
+LOCAL_AUTH_CACHE_MAX_TTL = 10
+
+# In-flight and just finished token renewals keyed by refresh token hash
+_renewals = SingleFlight()
+_renewal_results = TTLCache(maxsize=1024)
+
+
+def get_cognito_client():
+    """
+    Return the process-wide Cognito client, building it on first use.
+
+    boto3 clients are thread-safe, so a single client and its connection
+    pool is shared by every CognitoService instead of paying endpoint
+    resolution and credential loading on each request. It is built from
+    its own session because the default boto3 session is not thread-safe.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = boto3.session.Session().client(
+                    'cognito-idp',
+                    region_name=settings.COGNITO_AWS_REGION,
+                    config=Config(
+                        max_pool_connections=getattr(settings, 'COGNITO_MAX_POOL_CONNECTIONS', 50),
+                        connect_timeout=getattr(settings, 'COGNITO_CONNECT_TIMEOUT', 2),
+                        read_timeout=getattr(settings, 'COGNITO_READ_TIMEOUT', 5),
+                        retries={'max_attempts': 3, 'mode': 'standard'},
+                        tcp_keepalive=True
+                    )
+                )
+    return _client
+
+
+def _access_token_key(access_token):
+    return hashlib.sha256(access_token.encode('utf-8')).hexdigest()
+
+
+def _access_token_claims(access_token):
+    # Only used for cache bookkeeping, Cognito still checks the token itself
+    try:
+        return jwt.decode(access_token, options={'verify_signature': False})
+    except jwt.InvalidTokenError:
+        return {}
+
+
+class AuthCache:
+    """
+    check_user_auth results keyed by access token hash.
+
+    Each result carries its user's version, which invalidate() replaces
+    on logout or password change, so every cached session of the user is
+    dropped, not just the token that logged out. With a shared Django
+    cache the versions live there and a logout on one worker reaches all
+    of them. Without one the versions are process-local, so results are
+    cached for at most LOCAL_AUTH_CACHE_MAX_TTL seconds and other workers
+    stop accepting a revoked session within that time.
+    """
+
+    def __init__(self, maxsize=4096, ttl=60, shared=None):
+        self.shared = shared
+        self.ttl = ttl if shared is not None else min(ttl, LOCAL_AUTH_CACHE_MAX_TTL)
+        self._results = TTLCache(maxsize=maxsize, ttl=self.ttl)
+        # Versions outlive the results they guard, like the user cache's
+        self._versions = TTLCache(maxsize=maxsize, ttl=self.ttl * 2)
+
+    def _version_key(self, user_sub):
+        return f'{AUTH_KEY_PREFIX}:version:{user_sub}'
+
+    def get_version(self, user_sub):
+        """
+        Current version of a user's cached results. Read it before asking
+        Cognito and pass it to set(), so a result fetched while the user
+        was logging out is never cached as current.
+        """
+        if self.shared is not None:
+            return self.shared.get(self._version_key(user_sub), '0')
+        return self._versions.get(user_sub, '0')
+
+    def get(self, access_token):
+        key = _access_token_key(access_token)
+        cached = self._results.get(key)
+        if cached is None:
+            return None
+        if cached['version'] != self.get_version(cached['result']['user_sub']):
+            self._results.delete(key)
+            return None
+        return dict(cached['result'])
+
+    def set(self, access_token, result, version, ttl):
+        self._results.set(
+            _access_token_key(access_token),
+            {'result': result, 'version': version},
+            ttl=min(self.ttl, ttl)
+        )
+
+    def invalidate(self, access_token):
+        self._results.delete(_access_token_key(access_token))
+        user_sub = _access_token_claims(access_token).get('sub')
+        if not user_sub:
+            return
+        version = uuid.uuid4().hex
+        self._versions.set(user_sub, version)
+        if self.shared is not None:
+            self.shared.set(self._version_key(user_sub), version, timeout=self.ttl * 2)
+
+
+_auth_cache = None
+_auth_cache_lock = threading.Lock()
+
+
+def get_auth_cache():
+    """
+    Return the process-wide check_user_auth cache, building it on first
+    use. COGNITO_AUTH_CACHE_ALIAS names a Django cache that shares
+    revocations across processes. Without it revocations are
+    process-local and COGNITO_AUTH_CACHE_TTL is capped at
+    LOCAL_AUTH_CACHE_MAX_TTL seconds.
+    """
+    global _auth_cache
+    if _auth_cache is None:
+        with _auth_cache_lock:
+            if _auth_cache is None:
+                alias = getattr(settings, 'COGNITO_AUTH_CACHE_ALIAS', None)
+                _auth_cache = AuthCache(
+                    ttl=getattr(settings, 'COGNITO_AUTH_CACHE_TTL', 60),
+                    shared=caches[alias] if alias else None
+                )
+    return _auth_cache
+
+
+def invalidate_user_auth(access_token):
+    """
+    Drop cached check_user_auth results for the owner of the access token,
+    including results cached for their other sessions, in every process
+    that shares the auth cache.
+    """
+    get_auth_cache().invalidate(access_token)
 
 class CognitoService:
     def __init__(self):
-        self.client = boto3.client(
-            'cognito-idp',
-            region_name=settings.COGNITO_AWS_REGION
-        )
+        self.client = get_cognito_client()
         self.client_id = settings.COGNITO_APP_CLIENT_ID
         self.client_secret = settings.COGNITO_APP_CLIENT_SECRET
-        print(settings.COGNITO_AWS_REGION)
+
     def get_secret_hash(self, username):
         message = username + self.client_id
         dig = hmac.new(
@@ -27,9 +176,22 @@ class CognitoService:
 
     def register_user(self, username, fullname, password, email, phone_number=None):
         try:
-            username_check = self.check_username_exists(username)
-            if username_check['exists']:
-                return username_check
+            # Every registered user has a row in the users table, so duplicates
+            # are rejected locally. Anything the table doesn't know about is
+            # left to sign_up, which fails with UsernameExistsException.
+            local_check = DatabaseService.check_user_exists(username, email)
+            if local_check['username_exists']:
+                return {
+                    'status': 'ERROR',
+                    'exists': True,
+                    'message': 'Username already exists'
+                }
+            if local_check['email_exists']:
+                return {
+                    'status': 'ERROR',
+                    'exists': True,
+                    'message': 'Email already exists'
+                }
                 
             user_attributes = [
                 {
@@ -83,6 +245,13 @@ class CognitoService:
             }
 
         except ClientError as e:
+            if e.response['Error']['Code'] == 'UsernameExistsException':
+                return {
+                    'status': 'ERROR',
+                    'exists': True,
+                    'error_code': 'UsernameExistsException',
+                    'message': 'Username already exists'
+                }
             return {
                 'status': 'ERROR',
                 'error_code': e.response['Error']['Code'],
@@ -198,6 +367,29 @@ class CognitoService:
                 'error_code': e.response['Error']['Code'],
                 'message': e.response['Error']['Message']
             }
+
+    def get_username_by_email(self, email):
+        """
+        Find the Cognito username of an email address, from the users table
+        when possible and from the user pool otherwise
+        
+        Args:
+            email (str): The email address of the user
+            
+        Returns:
+            str: The username, or None if no user has this email
+        """
+        local = DatabaseService.get_username_by_email(email)
+        if local['status'] == 'SUCCESS':
+            return local['username']
+
+        response = self.client.list_users(
+            UserPoolId=settings.COGNITO_USER_POOL_ID,
+            Filter=f'email = "{email}"'
+        )
+        users = response.get('Users', [])
+        return users[0]['Username'] if users else None
+
     def login_user(self, username, password):
         try:
             params = {
@@ -228,6 +420,35 @@ class CognitoService:
             }
 
     def renew_tokens(self, refresh_token, id_token):
+        """
+        Renew access and ID tokens, coalescing concurrent renewals.
+
+        Tabs and components of the SPA often renew at the same moment when
+        a token expires. Calls with the same refresh token share a single
+        in-flight Cognito request, and a successful result is reused for
+        COGNITO_RENEW_CACHE_TTL seconds.
+
+        Args:
+            refresh_token (str): The refresh token (opaque, not a JWT).
+            id_token (str): The id token containing user claims (including username).
+
+        Returns:
+            dict: Response with new tokens or error message.
+        """
+        key = hashlib.sha256(refresh_token.encode('utf-8')).hexdigest()
+        cached = _renewal_results.get(key)
+        if cached is not None:
+            return dict(cached)
+
+        def renew():
+            result = self._initiate_token_renewal(refresh_token, id_token)
+            if result['status'] == 'SUCCESS':
+                _renewal_results.set(key, result, ttl=getattr(settings, 'COGNITO_RENEW_CACHE_TTL', 10))
+            return result
+
+        return dict(_renewals.do(key, renew))
+
+    def _initiate_token_renewal(self, refresh_token, id_token):
         """
         Renew access and ID tokens using refresh token and id token for username extraction.
         
@@ -299,6 +520,7 @@ class CognitoService:
             response = self.client.global_sign_out(
                 AccessToken=accessToken
             )
+            invalidate_user_auth(accessToken)
             return {
                 'status': 'SUCCESS',
                 'message': 'Logout successful'
@@ -321,22 +543,12 @@ class CognitoService:
             dict: Status of the password reset initiation
         """
         try:
-            # First find the user by email attribute
-            params = {
-                'UserPoolId': settings.COGNITO_USER_POOL_ID,
-                'Filter': f'email = "{email}"',
-            }
-            
-            response = self.client.list_users(**params)
-            
-            if not response.get('Users', []):
+            username = self.get_username_by_email(email)
+            if username is None:
                 return {
                     'status': 'ERROR',
                     'message': 'No user found with this email'
                 }
-            
-            # Get the username from the first (and should be only) user
-            username = response['Users'][0]['Username']
 
             # Now initiate forgot password with the username
             forgot_params = {
@@ -374,23 +586,13 @@ class CognitoService:
             dict: Status of the password reset confirmation
         """
         try:
-            # First find the user by email attribute
-            params = {
-                'UserPoolId': settings.COGNITO_USER_POOL_ID,
-                'Filter': f'email = "{email}"',
-            }
-            
-            response = self.client.list_users(**params)
-            
-            if not response.get('Users', []):
+            username = self.get_username_by_email(email)
+            if username is None:
                 return {
                     'status': 'ERROR',
                     'message': 'No user found with this email'
                 }
-            
-            # Get the username from the first user
-            username = response['Users'][0]['Username']
-            print(username)
+
             confirm_params = {
                 'ClientId': self.client_id,
                 'Username': username,
@@ -417,7 +619,9 @@ class CognitoService:
     
     def get_user_id(self, id_token):
         """
-        Extract the user sub (unique identifier) from the ID token
+        Extract the user sub (unique identifier) from the ID token.
+        The token's signature, audience, issuer and expiry are verified
+        locally against the user pool's cached public keys.
         
         Args:
             id_token (str): The ID token from authentication
@@ -426,8 +630,7 @@ class CognitoService:
             dict: User sub or error message
         """
         try:
-            # Decode the ID token without verification
-            decoded_token = jwt.decode(id_token, options={"verify_signature": False})
+            decoded_token = get_token_verifier().verify(id_token)
             
             # Extract the sub claim
             user_sub = decoded_token.get('sub')
@@ -445,6 +648,11 @@ class CognitoService:
                 'email': decoded_token.get('email')
             }
 
+        except jwt.ExpiredSignatureError:
+            return {
+                'status': 'ERROR',
+                'message': 'ID token has expired'
+            }
         except jwt.InvalidTokenError:
             return {
                 'status': 'ERROR',
@@ -457,7 +665,10 @@ class CognitoService:
             }
     def check_user_auth(self, access_token):
         """
-        Verify if the access token is valid and get user information
+        Verify if the access token is valid and get user information.
+        Successful results are cached by token hash for up to
+        COGNITO_AUTH_CACHE_TTL seconds, never past the token's expiry
+        (see get_auth_cache() for how logouts reach other workers).
         
         Args:
             access_token (str): The access token from the client
@@ -465,6 +676,13 @@ class CognitoService:
         Returns:
             dict: User information or error message
         """
+        auth_cache = get_auth_cache()
+        cached = auth_cache.get(access_token)
+        if cached is not None:
+            return cached
+
+        claims = _access_token_claims(access_token)
+        version = auth_cache.get_version(claims.get('sub'))
         try:
             # Get user information using the access token
             response = self.client.get_user(
@@ -484,12 +702,16 @@ class CognitoService:
                     'message': 'Could not extract user sub from response'
                 }
             
-            return {
+            result = {
                 'status': 'SUCCESS',
                 'user_sub': user_sub,
                 'username': response['Username'],
                 'is_confirmed': True  # If we get here, user is confirmed
             }
+
+            if claims.get('sub') == user_sub:
+                auth_cache.set(access_token, result, version, ttl=claims.get('exp', 0) - time.time())
+            return dict(result)
             
         except self.client.exceptions.NotAuthorizedException:
             return {
@@ -528,6 +750,7 @@ class CognitoService:
                 ProposedPassword=new_password,
                 AccessToken=access_token
             )
+            invalidate_user_auth(access_token)
             
             return {
                 'status': 'SUCCESS',
@@ -1,6 +1,120 @@
 import uuid
+import base64
+from datetime import datetime
 from .models import *
-from django.db.models import Exists, OuterRef, Subquery, Count, F 
+from . import realtime
+from .summary_service import ConversationService, GroupSummaryService
+from .search_index import UserSearchIndex
+from .autocomplete import get_autocomplete_index
+from .friend_graph import get_friend_graph
+from .user_cache import get_user_cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.db.models import Exists, OuterRef, Subquery, Count, F, FilteredRelation, Q
+
+
+def encode_cursor(message, field='created_at'):
+    """
+    Build an opaque pagination cursor from a message's (created_at, id),
+    or another timestamp field and id of any row.
+    """
+    raw = f"{getattr(message, field).isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Turn a cursor from encode_cursor back into (created_at, id).
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, message_id = raw.split('|', 1)
+        return datetime.fromisoformat(created_at), message_id
+    except (UnicodeError, ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def keyset_page(queryset, page_size, before=None, after=None):
+    """
+    Fetch one page of messages, newest first, by seeking on (created_at, id)
+    instead of counting and skipping rows with OFFSET.
+
+    Args:
+        queryset (QuerySet): Messages to page through
+        page_size (int): Number of messages per page
+        before (str, optional): Cursor, return messages older than it
+        after (str, optional): Cursor, return messages newer than it
+    Returns:
+        tuple: (messages, has_older, has_newer)
+    """
+    if after:
+        created_at, message_id = decode_cursor(after)
+        messages = list(queryset.filter(
+            models.Q(created_at__gt=created_at) |
+            models.Q(created_at=created_at, id__gt=message_id)
+        ).order_by('created_at', 'id')[:page_size + 1])
+        has_newer = len(messages) > page_size
+        return messages[:page_size][::-1], True, has_newer
+
+    if before:
+        created_at, message_id = decode_cursor(before)
+        queryset = queryset.filter(
+            models.Q(created_at__lt=created_at) |
+            models.Q(created_at=created_at, id__lt=message_id)
+        )
+    messages = list(queryset.order_by('-created_at', '-id')[:page_size + 1])
+    has_older = len(messages) > page_size
+    return messages[:page_size], has_older, bool(before)
+
+
+def cursor_pagination(messages, page_size, has_older, has_newer, total_messages=None):
+    """
+    Pagination block for cursor mode. next_cursor pages to older messages
+    (pass it as before), previous_cursor to newer ones (pass it as after).
+    """
+    pagination = {
+        'page_size': page_size,
+        'next_cursor': encode_cursor(messages[-1]) if messages and has_older else None,
+        'previous_cursor': encode_cursor(messages[0]) if messages else None,
+        'has_next': has_older,
+        'has_previous': has_newer
+    }
+    if total_messages is not None:
+        pagination['total_messages'] = total_messages
+    return pagination
+
+
+def resolve_user(user):
+    """
+    Return the User for a Cognito ID, or the User itself when the caller
+    already resolved it (the API attaches it to request.user).
+    Lookups by Cognito ID are served from the user cache when possible.
+    Raises User.DoesNotExist like a plain lookup would.
+    """
+    if isinstance(user, User):
+        return user
+
+    cache = get_user_cache()
+    version = cache.get_version(user)
+    cached = cache.get(user, version)
+    if cached is not None:
+        return cached
+
+    record = User.objects.get(cognito_id=user)
+    cache.set(record, version)
+    return record
+
+
+def lock_user(user):
+    """
+    Load a user's row straight from the database and lock it for update.
+    Write paths use this instead of resolve_user so a cached copy never
+    overwrites newer values. Must run inside a transaction.
+    Raises User.DoesNotExist like a plain lookup would.
+    """
+    cognito_id = user.cognito_id if isinstance(user, User) else user
+    return User.objects.select_for_update().get(cognito_id=cognito_id)
 
 
 class DatabaseService:
@@ -20,14 +134,17 @@ class DatabaseService:
             dict: Status of the creation operation
         """
         try:
-            user = User.objects.create(
-                id=str(uuid.uuid4()),
-                cognito_id=cognito_id,
-                name=name,
-                full_name=full_name,
-                email=email,
-                phone_number=phone_number
-            )
+            with transaction.atomic():
+                user = User.objects.create(
+                    id=str(uuid.uuid4()),
+                    cognito_id=cognito_id,
+                    name=name,
+                    full_name=full_name,
+                    email=email,
+                    phone_number=phone_number
+                )
+                UserSearchIndex.index_user(user)
+            get_user_cache().invalidate(cognito_id)
             return {
                 'status': 'SUCCESS',
                 'message': 'User created successfully',
@@ -52,13 +169,13 @@ class DatabaseService:
         Retrieve user info by Cognito ID
         
         Args:
-            cognito_id (str): Cognito user ID
+            cognito_id (str or User): Cognito user ID
             
         Returns:
             dict: User data or error message
         """
         try:
-            user = User.objects.get(cognito_id=cognito_id)
+            user = resolve_user(cognito_id)
             return {
                 'status': 'SUCCESS',
                 'user_data': {
@@ -82,26 +199,28 @@ class DatabaseService:
     @staticmethod
     def get_user_friends(user_id):
         """
-        Get all friends efficiently using a single query
+        Get all friends from the cached friend graph, loading only the
+        friends' profiles from the database
         """
         try:
-            user = User.objects.get(cognito_id=user_id)
-            friendships = Friendship.objects.filter(
-                models.Q(user1=user) | models.Q(user2=user)
-            ).select_related('user1', 'user2', 'action_user')
+            user = resolve_user(user_id)
+            adjacency = get_friend_graph().get(user.id)
+            friends = User.objects.in_bulk(list(adjacency))
 
             friends_list = []
-            for friendship in friendships:
-                friend = friendship.user2 if friendship.user1.id == user.id else friendship.user1
-                if(friendship.status == 'BLOCKED' or friendship.status == 'blocked'):
+            for friend_id, edge in sorted(adjacency.items(), key=lambda item: item[1].created_at):
+                friend = friends.get(friend_id)
+                if friend is None:
+                    continue
+                if edge.status == Friendship.BLOCKED:
                     friends_list.append({
                         'friend_id': "null",
                         'friend_name': friend.full_name,
                         'email': "null",
                         'profile_photo': friend.avatar_url,
-                        'status': friendship.status,
-                        'initiator': friendship.action_user.id == user_id,
-                        'created_at': friendship.created_at
+                        'status': edge.status,
+                        'initiator': edge.action_user_id == user.id,
+                        'created_at': edge.created_at
                     })
                 else:
                     friends_list.append({   
@@ -109,10 +228,10 @@ class DatabaseService:
                         'friend_name': friend.full_name,
                         'email': friend.email,
                         'profile_photo': friend.avatar_url,
-                        'status': friendship.status,
-                        'initiator': friendship.action_user.id,
-                        'created_at': friendship.created_at,
-                        'friendship_id': friendship.id
+                        'status': edge.status,
+                        'initiator': edge.action_user_id,
+                        'created_at': edge.created_at,
+                        'friendship_id': edge.friendship_id
                     })
 
             return {
@@ -125,6 +244,43 @@ class DatabaseService:
                 'message': 'User not found'
             }
 
+    @staticmethod
+    def get_friendship_statuses(cognito_id, user_ids):
+        """
+        Get the user's friendship with each of the given users at once,
+        for rendering search results, group members and invites
+
+        Args:
+            cognito_id (str or User): Cognito user ID
+            user_ids (list): Database IDs of the other users
+
+        Returns:
+            dict: Friendship status and id for every requested user, status
+                is None where the users have no friendship
+        """
+        try:
+            user = resolve_user(cognito_id)
+            adjacency = get_friend_graph().get(user.id)
+
+            friendships = {}
+            for user_id in user_ids:
+                edge = adjacency.get(user_id)
+                friendships[user_id] = {
+                    'status': edge.status if edge else None,
+                    'friendship_id': edge.friendship_id if edge else None,
+                    'initiator': edge.action_user_id == user.id if edge else None
+                }
+
+            return {
+                'status': 'SUCCESS',
+                'friendships': friendships
+            }
+        except User.DoesNotExist:
+            return {
+                'status': 'ERROR',
+                'message': 'User not found'
+            }
+
     @staticmethod
     def update_user_details(cognito_id, full_name=None, phone_number=None, avatar_url=None, currency=None):
         """
@@ -132,19 +288,29 @@ class DatabaseService:
         based on kwargs only if they exist.
         """
         try:
-            user = User.objects.get(cognito_id=cognito_id)
-
-            # Update only the fields provided:
-            if full_name:
-                user.full_name = full_name
-            if phone_number:
-                user.phone_number = phone_number
-            if avatar_url:
-                user.avatar_url = avatar_url
-            if currency:
-                user.currency = currency
-
-            user.save()
+            with transaction.atomic():
+                user = lock_user(cognito_id)
+
+                # Update only the fields provided:
+                updated_fields = []
+                if full_name:
+                    user.full_name = full_name
+                    updated_fields.append('full_name')
+                if phone_number:
+                    user.phone_number = phone_number
+                    updated_fields.append('phone_number')
+                if avatar_url:
+                    user.avatar_url = avatar_url
+                    updated_fields.append('avatar_url')
+                if currency:
+                    user.currency = currency
+                    updated_fields.append('currency')
+
+                if updated_fields:
+                    user.save(update_fields=updated_fields + ['updated_at'])
+                if full_name:
+                    UserSearchIndex.index_user(user)
+            get_user_cache().invalidate(user.cognito_id)
             return {
                 'status': 'SUCCESS',
                 'message': 'User updated successfully'
@@ -166,14 +332,14 @@ class DatabaseService:
         Send friend request on behalf of the user_id provided.
         
         Args:
-            user_id (str): ID of the user sending the request
+            user_id (str or User): ID of the user sending the request
             kwargs: Either recieve_username or recieve_useremail to identify recipient
             
         Returns:
             dict: Status of the friend request operation
         """
         try:
-            user = User.objects.get(id=user_id)
+            user = user_id if isinstance(user_id, User) else User.objects.get(id=user_id)
             # Add at the start of the function
             if ('recieve_username' in kwargs and kwargs['recieve_username'] == user.name) or \
                ('recieve_useremail' in kwargs and kwargs['recieve_useremail'] == user.email):
@@ -192,39 +358,54 @@ class DatabaseService:
                     'message': 'Invalid request: must provide username or email'
                 }
 
-            # Check if friendship already exists
-            existing_friendship = Friendship.objects.filter(
-                (models.Q(user1=user) & models.Q(user2=user2)) |
-                (models.Q(user1=user2) & models.Q(user2=user))
-            ).first()
+            sender = user  # Original user sending request
+            recipient = user2  # Original user receiving request
+
+            # Create ordered user variables for DB constraint
+            if sender.id < recipient.id:
+                user1, user2 = sender, recipient
+            else:
+                user1, user2 = recipient, sender
+
+            # Check if friendship already exists. This reads the table, not
+            # the friend graph cache, which may not have seen a block or
+            # request made on another worker yet
+            existing_friendship = Friendship.objects.filter(user1=user1, user2=user2).first()
 
             if existing_friendship:
-                if existing_friendship.status == 'ACCEPTED':
+                if existing_friendship.status == Friendship.ACCEPTED:
                     return {
                         'status': 'ERROR',
                         'message': 'Friendship already exists'
                     }
+                elif existing_friendship.status == Friendship.BLOCKED:
+                    return {
+                        'status': 'ERROR',
+                        'message': 'Cannot send friend request to this user'
+                    }
                 else:
                     return {
                         'status': 'PENDING',
                         'message': 'Friend request is pending'
                     }
-            sender = user  # Original user sending request
-            recipient = user2  # Original user receiving request
-
-            # Create ordered user variables for DB constraint
-            if sender.id < recipient.id:
-                user1, user2 = sender, recipient
-            else:
-                user1, user2 = recipient, sender
 
             # Create new friendship request
-            friendship = Friendship.objects.create(
-                user1=user1,
-                user2=user2,
-                action_user=sender,
-                status='PENDING'
-            )
+            try:
+                with transaction.atomic():
+                    friendship = Friendship.objects.create(
+                        user1=user1,
+                        user2=user2,
+                        action_user=sender,
+                        status=Friendship.PENDING
+                    )
+            except IntegrityError:
+                # Both users sent a request at the same time and the other one
+                # won the unique_friendship race
+                return {
+                    'status': 'PENDING',
+                    'message': 'Friend request is pending'
+                }
+            transaction.on_commit(lambda: get_friend_graph().record(friendship))
 
             friend = recipient
 
@@ -259,13 +440,13 @@ class DatabaseService:
         Get user ID from Cognito ID
         
         Args:
-            cognito_id (str): Cognito user ID
+            cognito_id (str or User): Cognito user ID
             
         Returns:
             dict: User ID or error message
         """
         try:
-            user = User.objects.get(cognito_id=cognito_id)
+            user = resolve_user(cognito_id)
             return {
                 'status': 'SUCCESS',
                 'user_id': user.id
@@ -283,14 +464,14 @@ class DatabaseService:
         provided in args.
 
         Args:
-            cognito_id (str) : Cognito user ID
+            cognito_id (str or User) : Cognito user ID
             request_id (str) : Friendship model ID
         Returns: 
             dict: Status of friend request acceptance 
         """
 
         try:
-            user = User.objects.get(cognito_id=cognito_id)
+            user = resolve_user(cognito_id)
             friendship = Friendship.objects.get(id=request_id)
 
             # Verify the user is the recipient of the friend request
@@ -301,15 +482,16 @@ class DatabaseService:
                 }
 
             # Verify the request is pending
-            if friendship.status != 'PENDING':
+            if friendship.status != Friendship.PENDING:
                 return {
                     'status': 'ERROR',
                     'message': f'Friend request is not pending, current status: {friendship.status}'
                 }
 
             # Accept the friend request
-            friendship.status = 'ACCEPTED'
+            friendship.status = Friendship.ACCEPTED
             friendship.save()
+            transaction.on_commit(lambda: get_friend_graph().record(friendship))
 
             return {
                 'status': 'SUCCESS',
@@ -344,10 +526,10 @@ class DatabaseService:
             dict: Username or error message
         """
         try:
-            user = User.objects.get(email=email)
+            username = User.objects.values_list('name', flat=True).get(email=email)
             return {
                 'status': 'SUCCESS',
-                'username': user.name
+                'username': username
             }
         except User.DoesNotExist:
             return {
@@ -355,13 +537,35 @@ class DatabaseService:
                 'message': 'User not found'
             }
 
+    @staticmethod
+    def check_user_exists(username, email):
+        """
+        Check whether a username or email is already registered, using the
+        username and email indexes of the users table
+        
+        Args:
+            username (str): Username to look for
+            email (str): Email address to look for
+            
+        Returns:
+            dict: Which of the two are taken
+        """
+        taken = User.objects.filter(
+            Q(name=username) | Q(email=email)
+        ).values_list('name', 'email')[:2]
+        return {
+            'status': 'SUCCESS',
+            'username_exists': any(name == username for name, _ in taken),
+            'email_exists': any(address == email for _, address in taken)
+        }
+
     @staticmethod
     def block_user(cognito_id, blocked_id):
         """
         Block another user from the provided account
 
         Args:
-            cognito_id (str): Cognito id of user who wants to block another user.
+            cognito_id (str or User): Cognito id of user who wants to block another user.
             blocked_id (str): id of the user being blocked.
             
         Returns:
@@ -369,7 +573,7 @@ class DatabaseService:
         """
         try:
             # Get both users
-            user = User.objects.get(cognito_id=cognito_id)
+            user = resolve_user(cognito_id)
             blocked_user = User.objects.get(id=blocked_id)
 
             if(user.id == blocked_user.id):
@@ -385,28 +589,32 @@ class DatabaseService:
             ).first()
 
             if friendship:
-                if friendship.status == 'BLOCKED':
+                if friendship.status == Friendship.BLOCKED:
                     return {
                         'status': 'ERROR',
                         'message': 'User is already blocked'
                     }
                 else:
                     # Update existing relationship status to BLOCKED
-                    friendship.status = 'BLOCKED'
+                    friendship.status = Friendship.BLOCKED
                     friendship.action_user = user
                     friendship.save()
+                    transaction.on_commit(lambda: get_friend_graph().record(friendship))
                     return {
                         'status': 'SUCCESS',
                         'message': 'User blocked successfully'
                     }
             else:
                 # No friendship record exists, so create a new one with BLOCKED status
+                # (ordered for the force_user_order constraint)
+                user1, user2 = sorted([user, blocked_user], key=lambda u: u.id)
                 friendship = Friendship.objects.create(
-                    user1=user,
-                    user2=blocked_user,
+                    user1=user1,
+                    user2=user2,
                     action_user=user,
-                    status='BLOCKED'
+                    status=Friendship.BLOCKED
                 )
+                transaction.on_commit(lambda: get_friend_graph().record(friendship))
                 return {
                     'status': 'SUCCESS',
                     'message': 'User blocked successfully',
@@ -429,16 +637,18 @@ class DatabaseService:
         Update user's profile photo URL
         
         Args:
-            cognito_id (str): Cognito user ID
+            cognito_id (str or User): Cognito user ID
             photo_url (str): URL of the uploaded profile photo
             
         Returns:
             dict: Status of the update operation
         """
         try:
-            user = User.objects.get(cognito_id=cognito_id)
-            user.avatar_url = photo_url
-            user.save()
+            with transaction.atomic():
+                user = lock_user(cognito_id)
+                user.avatar_url = photo_url
+                user.save(update_fields=['avatar_url', 'updated_at'])
+            get_user_cache().invalidate(user.cognito_id)
             
             return {
                 'status': 'SUCCESS',
@@ -459,34 +669,221 @@ class DatabaseService:
             }
     
     @staticmethod
-    def get_direct_messages(cognito_id, page=1, page_size=50):
+    def mark_direct_messages_read(user_sub, peer_id, up_to_message_id=None):
+        '''
+        Mark the messages a peer sent to the user as read, up to and
+        including a message or all of them. One UPDATE over the
+        (recipient, sender, is_read, created_at) index, however many
+        messages are unread.
+
+        Args:
+            user_sub (str or User): Cognito ID of the user reading
+            peer_id (str): Database ID of the other user in the conversation
+            up_to_message_id (str, optional): Last message the user has read
+        Returns:
+            dict: Status of the operation and how many messages were marked
+        '''
+        try:
+            user = resolve_user(user_sub)
+            unread = DirectMessage.objects.filter(recipient=user, sender_id=peer_id, is_read=False)
+
+            if up_to_message_id:
+                up_to = DirectMessage.objects.filter(
+                    models.Q(sender=user, recipient_id=peer_id) |
+                    models.Q(sender_id=peer_id, recipient=user),
+                    id=up_to_message_id
+                ).values_list('created_at', flat=True).first()
+                if up_to is None:
+                    return {
+                        'status': 'ERROR',
+                        'message': 'Message not found in this conversation'
+                    }
+                unread = unread.filter(created_at__lte=up_to)
+
+            with transaction.atomic():
+                marked = unread.update(is_read=True, read_at=timezone.now())
+                if marked:
+                    ConversationService.mark_read(user.id, peer_id)
+            return {
+                'status': 'SUCCESS',
+                'message': 'Messages marked as read',
+                'marked': marked
+            }
+        except User.DoesNotExist:
+            return {
+                'status': 'ERROR',
+                'message': 'User not found'
+            }
+        except Exception as e:
+            return {
+                'status': 'ERROR',
+                'message': str(e)
+            }
+
+    @staticmethod
+    def get_direct_unread_counts(user_sub):
+        '''
+        Get the number of unread direct messages in each of the user's
+        conversations.
+
+        Args:
+            user_sub (str or User): Cognito ID of the user
+        Returns:
+            dict: Unread count per peer user id and the total
+        '''
+        try:
+            user = resolve_user(user_sub)
+            unread = {}
+            for user1_id, user2_id, user1_unread, user2_unread in Conversation.objects.filter(
+                models.Q(user1=user, user1_unread__gt=0) |
+                models.Q(user2=user, user2_unread__gt=0)
+            ).values_list('user1_id', 'user2_id', 'user1_unread', 'user2_unread'):
+                if user1_id == user.id:
+                    unread[user2_id] = user1_unread
+                else:
+                    unread[user1_id] = user2_unread
+            return {
+                'status': 'SUCCESS',
+                'unread': unread,
+                'total_unread': sum(unread.values())
+            }
+        except User.DoesNotExist:
+            return {
+                'status': 'ERROR',
+                'message': 'User not found'
+            }
+
+    @staticmethod
+    def get_conversations(user_sub, limit=20, before=None):
+        '''
+        Get the user's direct message inbox, most recent conversation
+        first, with the peer, the last message and the unread count.
+        Pages are keyset paginated on (last_message_at, id).
+
+        Args:
+            user_sub (str or User): Cognito ID of the user
+            limit (int): Number of conversations per page
+            before (str, optional): Cursor, return conversations older than it
+        Returns:
+            dict: Status of the operation, the conversations and pagination
+        '''
+        try:
+            user = resolve_user(user_sub)
+            conversations = Conversation.objects.filter(
+                models.Q(user1=user) | models.Q(user2=user),
+                last_message_at__isnull=False
+            ).select_related('user1', 'user2', 'last_message')
+
+            if before:
+                last_message_at, conversation_id = decode_cursor(before)
+                conversations = conversations.filter(
+                    models.Q(last_message_at__lt=last_message_at) |
+                    models.Q(last_message_at=last_message_at, id__lt=conversation_id)
+                )
+            conversations = list(conversations.order_by('-last_message_at', '-id')[:limit + 1])
+            has_next = len(conversations) > limit
+            conversations = conversations[:limit]
+
+            conversation_list = []
+            for conversation in conversations:
+                is_user1 = conversation.user1_id == user.id
+                peer = conversation.user2 if is_user1 else conversation.user1
+                last_message = conversation.last_message
+                conversation_list.append({
+                    'conversation_id': conversation.id,
+                    'peer_id': peer.id,
+                    'peer_name': peer.full_name,
+                    'peer_username': peer.name,
+                    'profile_photo': peer.avatar_url,
+                    'last_message': {
+                        'message_id': last_message.id,
+                        'sender_id': last_message.sender_id,
+                        'content': last_message.content,
+                        'message_type': last_message.message_type,
+                        'created_at': last_message.created_at,
+                        'is_read': last_message.is_read
+                    } if last_message else None,
+                    'last_message_at': conversation.last_message_at,
+                    'unread': conversation.user1_unread if is_user1 else conversation.user2_unread
+                })
+
+            return {
+                'status': 'SUCCESS',
+                'conversations': conversation_list,
+                'pagination': {
+                    'page_size': limit,
+                    'next_cursor': encode_cursor(conversations[-1], 'last_message_at') if has_next else None,
+                    'has_next': has_next
+                }
+            }
+        except User.DoesNotExist:
+            return {
+                'status': 'ERROR',
+                'message': 'User not found'
+            }
+        except ValueError as e:
+            return {
+                'status': 'ERROR',
+                'message': str(e)
+            }
+
+    @staticmethod
+    def get_direct_messages(cognito_id, page=1, page_size=50, before=None, after=None,
+                            use_cursor=False, include_total=False, peer_id=None):
         '''
         Get user DMs, new and old, with pagination.
+        With peer_id only the conversation with that user is read, using the
+        (sender, recipient, created_at) index from both sides.
+        Page mode counts and skips rows; cursor mode (use_cursor, or when
+        before/after is given) seeks on (created_at, id) so every page costs the same.
         
         Args:
-            cognito_id (str): Cognito user ID
+            cognito_id (str or User): Cognito user ID
             page (int): Page number for pagination (default 1)
             page_size (int): Number of messages per page (default 50)
+            before (str, optional): Cursor, get messages older than it
+            after (str, optional): Cursor, get messages newer than it
+            use_cursor (bool): Use cursor mode without a cursor (first page)
+            include_total (bool): Also count all messages in cursor mode
+            peer_id (str, optional): ID of the other user in the conversation
         Returns:
             dict: Status of the get operation with paginated messages
         '''
         try:
-            user = User.objects.get(cognito_id=cognito_id)
-            
-            # Get total messages for pagination
-            total_messages = DirectMessage.objects.filter(
-                models.Q(sender=user) | models.Q(recipient=user)
-            ).count()
-            
-            total_pages = (total_messages + page_size - 1) // page_size
-            
-            # Apply proper pagination with ordering
-            start_idx = (page - 1) * page_size
-            
-            # Order messages by newest first (most chat interfaces show newest messages first)
-            messages = DirectMessage.objects.filter(
-                models.Q(sender=user) | models.Q(recipient=user)
-            ).select_related('sender', 'recipient').order_by('-created_at')[start_idx:start_idx+page_size]
+            user = resolve_user(cognito_id)
+            if peer_id:
+                conversation = (
+                    models.Q(sender=user, recipient_id=peer_id) |
+                    models.Q(sender_id=peer_id, recipient=user)
+                )
+            else:
+                conversation = models.Q(sender=user) | models.Q(recipient=user)
+            user_messages = DirectMessage.objects.filter(conversation).select_related('sender', 'recipient')
+
+            if use_cursor or before or after:
+                messages, has_older, has_newer = keyset_page(user_messages, page_size, before, after)
+                total_messages = user_messages.count() if include_total else None
+                pagination = cursor_pagination(messages, page_size, has_older, has_newer, total_messages)
+            else:
+                # Get total messages for pagination
+                total_messages = user_messages.count()
+                
+                total_pages = (total_messages + page_size - 1) // page_size
+                
+                # Apply proper pagination with ordering
+                start_idx = (page - 1) * page_size
+                
+                # Order messages by newest first (most chat interfaces show newest messages first)
+                messages = user_messages.order_by('-created_at')[start_idx:start_idx+page_size]
+
+                pagination = {
+                    'current_page': page,
+                    'total_pages': total_pages,
+                    'page_size': page_size,
+                    'total_messages': total_messages,
+                    'has_next': page < total_pages,
+                    'has_previous': page > 1
+                }
 
             messages_list = []
 
@@ -504,15 +901,6 @@ class DatabaseService:
                     'is_read': message.is_read,
                     'read_at': message.read_at
                 })
-                
-            pagination = {
-                'current_page': page,
-                'total_pages': total_pages,
-                'page_size': page_size,
-                'total_messages': total_messages,
-                'has_next': page < total_pages,
-                'has_previous': page > 1
-            }
 
             return {
                 'status': 'SUCCESS',
@@ -531,18 +919,25 @@ class DatabaseService:
             }
 
     @staticmethod
-    def get_group_messages(cognito_id, group_id, page=1, page_size=50):
+    def get_group_messages(cognito_id, group_id, page=1, page_size=50, before=None, after=None,
+                           use_cursor=False, include_total=False):
         '''
-        Get group messages with pagination
+        Get group messages with pagination.
+        Cursor mode (use_cursor, or when before/after is given) seeks on
+        (created_at, id) instead of counting and skipping rows.
 
         Args:
-            cognito_id (str): Cognito user ID
+            cognito_id (str or User): Cognito user ID
             group_id(str): Group Id
             page (int): Page number for pagination
             page_size (int): Number of messages per page
+            before (str, optional): Cursor, get messages older than it
+            after (str, optional): Cursor, get messages newer than it
+            use_cursor (bool): Use cursor mode without a cursor (first page)
+            include_total (bool): Also count all messages in cursor mode
         '''
         try:
-            user = User.objects.get(cognito_id=cognito_id)
+            user = resolve_user(cognito_id)
             group = Group.objects.get(id=group_id)
             
             # Check if user is a member
@@ -553,27 +948,44 @@ class DatabaseService:
                     'message': 'User is not a member of the group'
                 }
                 
-            # Get total messages for pagination
-            total_messages = GroupMessage.objects.filter(group=group).count()
-            total_pages = (total_messages + page_size - 1) // page_size
-            
-            # Apply proper pagination with ordering
-            start_idx = (page - 1) * page_size
-            
-            # Order messages by newest first (more typical for chat interfaces)
-            messages = GroupMessage.objects.filter(group=group) \
-                .select_related('sender', 'group') \
-                .order_by('-created_at')[start_idx:start_idx+page_size]
+            group_messages = GroupMessage.objects.filter(group=group).select_related('sender', 'group')
+
+            if use_cursor or before or after:
+                messages, has_older, has_newer = keyset_page(group_messages, page_size, before, after)
+                total_messages = group_messages.count() if include_total else None
+                pagination = cursor_pagination(messages, page_size, has_older, has_newer, total_messages)
+            else:
+                # Get total messages for pagination
+                total_messages = group_messages.count()
+                total_pages = (total_messages + page_size - 1) // page_size
+                
+                # Apply proper pagination with ordering
+                start_idx = (page - 1) * page_size
+                
+                # Order messages by newest first (more typical for chat interfaces)
+                messages = group_messages.order_by('-created_at')[start_idx:start_idx+page_size]
+
+                pagination = {
+                    'current_page': page,
+                    'total_pages': total_pages,
+                    'page_size': page_size,
+                    'total_messages': total_messages,
+                    'has_next': page < total_pages,
+                    'has_previous': page > 1
+                }
             
-            # Get read receipt for efficient status checking
-            try:
-                read_receipt = GroupReadReceipt.objects.get(user=user, group=group)
-                last_read_time = read_receipt.last_read_message.created_at
-            except GroupReadReceipt.DoesNotExist:
-                last_read_time = None
+            # The unread counter holds both the user's read position and the
+            # number of unread messages in the whole group
+            counter = UnreadCounter.objects.filter(user=user, group=group) \
+                .values_list('count', 'last_read_at').first()
+            if counter:
+                unread_count, last_read_time = counter
+            else:
+                last_read_time = GroupReadReceipt.objects.filter(user=user, group=group) \
+                    .values_list('last_read_at', flat=True).first()
+                unread_count = GroupSummaryService.count_unread(user.id, group.id)
             
             message_list = []
-            unread_count = 0
             
             for message in messages:
                 # A message is read if it's older than the last read message or user is sender
@@ -582,9 +994,6 @@ class DatabaseService:
                     is_read = True  # Message is read if it's older than the last read message
                 elif message.sender.id == user.id:
                     is_read = True  # Messages sent by the user are always considered read
-                        
-                if not is_read and message.sender.id != user.id:
-                    unread_count += 1
                     
                 message_list.append({
                     'message_id': message.id,
@@ -600,15 +1009,6 @@ class DatabaseService:
                     'is_read': is_read
                 })
                 
-            pagination = {
-                'current_page': page,
-                'total_pages': total_pages,
-                'page_size': page_size,
-                'total_messages': total_messages,
-                'has_next': page < total_pages,
-                'has_previous': page > 1
-            }
-                
             return {
                 'status': 'SUCCESS',
                 'messages': message_list,
@@ -632,12 +1032,100 @@ class DatabaseService:
                 'message': str(e)
             }
     
+    @staticmethod
+    def mark_group_read(user_sub, group_id, message_id=None):
+        '''
+        Mark a group as read up to a message, the latest one by default.
+        The read receipt and the unread counter only ever move forward.
+
+        Args:
+            user_sub (str or User): Cognito ID of the user
+            group_id (str): ID of the group
+            message_id (str, optional): ID of the last message the user has read
+        Returns:
+            dict: Status of the operation and the remaining unread count
+        '''
+        try:
+            user = resolve_user(user_sub)
+
+            if not GroupMember.objects.filter(user=user, group_id=group_id).exists():
+                return {
+                    'status': 'ERROR',
+                    'message': 'User is not a member of this group'
+                }
+
+            if message_id:
+                message = GroupMessage.objects.only('id', 'created_at').get(id=message_id, group_id=group_id)
+            else:
+                message = GroupMessage.objects.only('id', 'created_at').filter(
+                    id=GroupSummary.objects.filter(group_id=group_id).values('last_message')[:1]
+                ).first()
+                if message is None:
+                    return {
+                        'status': 'SUCCESS',
+                        'message': 'Group has no messages',
+                        'unread': 0
+                    }
+
+            with transaction.atomic():
+                moved = GroupSummaryService.advance_receipt(user.id, group_id, message)
+                if moved:
+                    GroupSummaryService.mark_read(user.id, group_id, message.created_at)
+
+            return {
+                'status': 'SUCCESS',
+                'message': 'Group marked as read' if moved else 'Group was already read up to this message',
+                'unread': UnreadCounter.objects.filter(user=user, group_id=group_id)
+                    .values_list('count', flat=True).first() or 0
+            }
+        except User.DoesNotExist:
+            return {
+                'status': 'ERROR',
+                'message': 'User not found'
+            }
+        except GroupMessage.DoesNotExist:
+            return {
+                'status': 'ERROR',
+                'message': 'Message not found in this group'
+            }
+        except Exception as e:
+            return {
+                'status': 'ERROR',
+                'message': str(e)
+            }
+
+    @staticmethod
+    def get_unread_counts(user_sub):
+        '''
+        Get the user's unread message count in every group they are in.
+
+        Args:
+            user_sub (str or User): Cognito ID of the user
+        Returns:
+            dict: Unread count per group id and the total
+        '''
+        try:
+            user = resolve_user(user_sub)
+            unread = dict(
+                UnreadCounter.objects.filter(user=user).values_list('group_id', 'count')
+            )
+            return {
+                'status': 'SUCCESS',
+                'unread': unread,
+                'total_unread': sum(unread.values())
+            }
+        except User.DoesNotExist:
+            return {
+                'status': 'ERROR',
+                'message': 'User not found'
+            }
+
     @staticmethod
     def send_direct_message(sender_id, recipient_id, content, message_type, file_url=None):
         '''
         Send a direct message to another user.
         Args:
-            sender_id (str): ID of the sender
+            sender_id (str or User): ID of the sender
             recipient_id (str): ID of the recipient
             content (str): Message content
             message_type (str): Type of message (text, image, )
@@ -646,32 +1134,62 @@ class DatabaseService:
             dict: Status of the send operation
         '''
         try:
-                sender = User.objects.get(cognito_id=sender_id)
+                sender = resolve_user(sender_id)
                 recipient = User.objects.get(id=recipient_id)
                 if(sender.id == recipient.id):
                     return {
                         'status': 'ERROR',
                         'message': 'Cannot send message to yourself'
                     }
-                relation = Friendship.objects.filter(   
-                    ((models.Q(user1=sender) & models.Q(user2=recipient)) or
-                    (models.Q(user1=recipient) & models.Q(user2=sender))) and
-                    models.Q(status='Accepted' or 'accepted')
-                )
-
-                if(relation):
-                    message = DirectMessage.objects.create(
-                        sender=sender,
-                        recipient=recipient,
-                        content=content,
-                        message_type=message_type,
-                        file_url=file_url
+                # Checked against the table rather than the friend graph cache,
+                # so an unfriend or block on another worker takes effect at once
+                user1_id, user2_id = sorted([sender.id, recipient.id])
+                is_friend = Friendship.objects.filter(
+                    user1_id=user1_id,
+                    user2_id=user2_id,
+                    status=Friendship.ACCEPTED
+                ).exists()
+
+                if is_friend:
+                    with transaction.atomic():
+                        message = DirectMessage.objects.create(
+                            sender=sender,
+                            recipient=recipient,
+                            content=content,
+                            message_type=message_type,
+                            file_url=file_url
+                        )
+                        # Move the conversation forward for both inboxes
+                        ConversationService.record_message(message)
+                    # Push to the recipient and the sender's other open sessions
+                    realtime.publish(
+                        [realtime.user_channel(recipient.id), realtime.user_channel(sender.id)],
+                        {
+                            'type': 'direct_message',
+                            'message': {
+                                'message_id': message.id,
+                                'sender_id': sender.id,
+                                'sender_name': sender.full_name,
+                                'recipient_id': recipient.id,
+                                'recipient_name': recipient.full_name,
+                                'content': message.content,
+                                'message_type': message.message_type,
+                                'file_url': message.file_url,
+                                'created_at': message.created_at,
+                                'is_read': message.is_read,
+                                'read_at': message.read_at
+                            }
+                        }
                     )
                     return {
                         'status': 'SUCCESS',
                         'message': 'Direct message sent successfully',
                         'message_id': message.id
                     }
+                return {
+                    'status': 'ERROR',
+                    'message': 'You can only message your friends'
+                }
         except User.DoesNotExist:
             return {
                 'status': 'ERROR',
@@ -688,32 +1206,27 @@ class DatabaseService:
         '''
         Search for users by username, email or full name.
         Args:
-            cognito_id (str): Cognito user ID
+            cognito_id (str or User): Cognito user ID
             search_term (str): Search term
             limit (int, optional): Maximum number of results to return
         Returns:
             dict: Status of the search operation
         '''
         try:
-            user = User.objects.get(cognito_id=cognito_id)
-
-            # Find users matching search criteria
-            users = User.objects.filter(
-                models.Q(name__icontains=search_term) |
-                models.Q(email__icontains=search_term) |
-                models.Q(full_name__icontains=search_term)
-            ).exclude(id=user.id)[:limit]
-
-            # Annotate each user with friendship status
-            users = users.annotate(
-                is_friend=Exists(
-                    Friendship.objects.filter(
-                        # The outerRef here refrences the user in the main query
-                        (models.Q(user1=OuterRef('pk')) & models.Q(user2=user)) |
-                        (models.Q(user1=user) & models.Q(user2=OuterRef('pk')))
-                    )
-                )
-            )[:limit]
+            user = resolve_user(cognito_id)
+            friends = get_friend_graph().get(user.id)
+
+            # Prefix matches are answered from the in-memory autocomplete
+            # index, which holds everything a result shows
+            users = get_autocomplete_index().search(search_term, limit, exclude=user.id)
+
+            # Only terms no username or name starts with (or an index that
+            # is still loading) go to the database for substring matches
+            if not users:
+                users = UserSearchIndex.search(
+                    search_term,
+                    User.objects.exclude(id=user.id)
+                )[:limit]
 
             # Then map results to dictionaries
             users_list = [{
@@ -721,7 +1234,7 @@ class DatabaseService:
                 'username': u.name,
                 'full_name': u.full_name,               
                 'profile_photo': u.avatar_url,
-                'is_friend': u.is_friend
+                'is_friend': u.id in friends
             } for u in users]
             return {
                 'status': 'SUCCESS',
@@ -745,14 +1258,14 @@ class DatabaseService:
         provided in args.
 
         Args:
-            cognito_id (str) : Cognito user ID
+            cognito_id (str or User) : Cognito user ID
             request_id (str) : Friendship model ID
         Returns: 
             dict: Status of friend request rejection 
         """
 
         try:
-            user = User.objects.get(cognito_id=cognito_id)
+            user = resolve_user(cognito_id)
             friendship = Friendship.objects.select_related('user1', 'user2').get(id= request_id)
 
             if friendship.user1 != user and friendship.user2 != user:
@@ -761,13 +1274,14 @@ class DatabaseService:
                     'message': 'User not authorized to reject this friend request'
                 }
 
-            if friendship.status != 'PENDING':
+            if friendship.status != Friendship.PENDING:
                 return {
                     'status': 'ERROR',
                     'message': f'Friend request is not pending, current status: {friendship.status}'
                 }
 
             friendship.delete()
+            transaction.on_commit(lambda: get_friend_graph().forget(friendship))
 
             return {
                 'status': 'SUCCESS',
@@ -796,22 +1310,24 @@ class DatabaseService:
         Remove a friend connection between two users.
         and block them if block is True
         Args:
-            cognito_id (str): Cognito ID of the user initiating the removal
+            cognito_id (str or User): Cognito ID of the user initiating the removal
             friendship_id (str): Friendship model ID
             block (bool): Block the user after removal
         Returns:
             dict: Status of the friend removal operation
         """
         try:
-            user = User.objects.get(cognito_id=cognito_id)
+            user = resolve_user(cognito_id)
             friendship = Friendship.objects.filter(id=friendship_id).select_related('user1', 'user2').first()
             if friendship:
                 if friendship.user1 == user or friendship.user2 == user:
                     if block:
-                        friendship.status = 'BLOCKED'
+                        friendship.status = Friendship.BLOCKED
                         friendship.save()
+                        transaction.on_commit(lambda: get_friend_graph().record(friendship))
                     else:
                         friendship.delete()
+                        transaction.on_commit(lambda: get_friend_graph().forget(friendship))
                     return {
                         'status': 'SUCCESS',
                         'message': 'Friend removed successfully'
@@ -843,14 +1359,14 @@ class DatabaseService:
         Get the group info along with members and pending invites.
         requires user passed in to be a member of the group.
         Args:
-            user_sub(str): Cognito ID of the user requesting info.
+            user_sub(str or User): Cognito ID of the user requesting info.
             group_id(str): ID of requested group.
         Returns: 
             dict: operation status and info if successful. 
         """
         try:
             # First, get the user
-            user = User.objects.get(cognito_id=user_sub)
+            user = resolve_user(user_sub)
             # Check if the user has access to group
             if not GroupMember.objects.filter(user=user, group_id=group_id).exists():
                 return {
@@ -928,23 +1444,26 @@ class DatabaseService:
         """
         Create a new group and add the user who created it as an adnub.
         Args:
-            user_sub (str): Cognito ID of the user creating the group
+            user_sub (str or User): Cognito ID of the user creating the group
             group_name (str): Name of the new group
         Returns:
             dict: Status of the group creation operation
         """
         try:
-            user = User.objects.get(cognito_id=user_sub)
-            group = Group.objects.create(
-                name=group_name,
-                created_by=user,
-                description = group_description
-            )
-            GroupMember.objects.create(
-                user=user,
-                group=group,
-                role='admin'
-            )
+            user = resolve_user(user_sub)
+            with transaction.atomic():
+                group = Group.objects.create(
+                    name=group_name,
+                    created_by=user,
+                    description = group_description
+                )
+                GroupMember.objects.create(
+                    user=user,
+                    group=group,
+                    role='admin'
+                )
+                GroupSummaryService.add_member(user.id, group.id)
+                realtime.join_group(user.id, group.id)
             return {
                 'status': 'SUCCESS',
                 'message': 'Group created successfully',
@@ -971,14 +1490,14 @@ class DatabaseService:
         (Only admins can invite)
         Invite a user to your group using their id.
         Args:
-            user_sub (str): Cognito ID of the user inviting
+            user_sub (str or User): Cognito ID of the user inviting
             invited_id (str): ID of the user being invited
             group_id (str): ID of the group
         Returns:
             dict: status of invite operation.
         """
         try:
-            user = User.objects.get(cognito_id=user_sub)
+            user = resolve_user(user_sub)
             invited_user = User.objects.get(id=invited_id)
             group = Group.objects.get(id=group_id)
 
@@ -1029,13 +1548,13 @@ class DatabaseService:
         """
         Leave a group using the group ID.
         Args:
-            user_sub (str): Cognito ID of the user leaving the group
+            user_sub (str or User): Cognito ID of the user leaving the group
             group_id (str): ID of the group
         Returns:
             dict: status of leave operation.
         """
         try:
-            user = User.objects.get(cognito_id=user_sub)
+            user = resolve_user(user_sub)
             group = Group.objects.get(id=group_id)
 
             # Check if the user is a member of the group
@@ -1046,7 +1565,10 @@ class DatabaseService:
                 }
 
             # Remove the user from the group
-            GroupMember.objects.filter(user=user, group=group).delete()
+            with transaction.atomic():
+                GroupMember.objects.filter(user=user, group=group).delete()
+                GroupSummaryService.remove_member(user.id, group.id)
+                realtime.leave_group(user.id, group.id)
 
             return {
                 'status': 'SUCCESS',
@@ -1073,70 +1595,47 @@ class DatabaseService:
         """
         Returns the groups in which the user is a member in.
         Args:
-            user_sub (str): Cognito ID of the user.
+            user_sub (str or User): Cognito ID of the user.
         Returns:
             dict: dict of grps.
         """
         try:
-            user = User.objects.get(cognito_id=user_sub)
-            
-            # Get the user's groups and prefetch member counts in one query
-            user_groups = Group.objects.filter(members__user=user).annotate(
-                members_count=Count('members', distinct=True),
-                user_role=F('members__role')  # Get the user's role in each group
-            ).distinct()
-            
-            # Get groups with latest message info
-            group_ids = list(user_groups.values_list('id', flat=True))
-            
-            # Get latest message for each group in a single query
-            latest_messages = {}
-            if group_ids:
-                messages_query = GroupMessage.objects.filter(group_id__in=group_ids)
-                
-                # Find the most recent message for each group
-                for group_id in group_ids:
-                    group_messages = messages_query.filter(group_id=group_id).order_by('-created_at')[:1]
-                    if group_messages:
-                        latest_messages[group_id] = {
-                            'content': group_messages[0].content,
-                            'created_at': group_messages[0].created_at
-                        }
-            
-            # Get unread counts in bulk
-            unread_counts = {}
-            if group_ids:
-                # Optional: Get read receipts in bulk
-                read_receipts = {
-                    receipt.group_id: receipt.last_read_message.created_at
-                    for receipt in GroupReadReceipt.objects.filter(
-                        user=user, group_id__in=group_ids
-                    ).select_related('last_read_message')
-                }
-                
-                # Calculate unread counts per group
-                for group_id in group_ids:
-                    read_time = read_receipts.get(group_id)
-                    query = GroupMessage.objects.filter(group_id=group_id).exclude(sender=user)
-                    if read_time:
-                        query = query.filter(created_at__gt=read_time)
-                    unread_counts[group_id] = query.count()
-            
+            user = resolve_user(user_sub)
+
+            # One query: the user's memberships joined with each group's
+            # summary row and the user's own unread counter
+            memberships = GroupMember.objects.filter(user=user).annotate(
+                user_unread=FilteredRelation(
+                    'group__unread_counters',
+                    condition=Q(group__unread_counters__user=user)
+                )
+            ).values(
+                'role',
+                'group_id',
+                'group__name',
+                'group__created_at',
+                'group__photo_url',
+                'group__description',
+                'group__summary__member_count',
+                'group__summary__last_message_at',
+                'group__summary__last_message__content',
+                'user_unread__count'
+            )
+
             # Build the result list
             groups_list = []
-            for group in user_groups:
-                group_id = group.id
+            for membership in memberships:
                 groups_list.append({
-                    'group_id': group_id,
-                    'group_name': group.name,
-                    'created_at': group.created_at,
-                    'photo_url': group.photo_url,
-                    'description': group.description,
-                    'role': group.user_role,
-                    'last_message': latest_messages.get(group_id, {}).get('content'),
-                    'last_message_time': latest_messages.get(group_id, {}).get('created_at'),
-                    'unread_count': unread_counts.get(group_id, 0),
-                    'members_count': group.members_count
+                    'group_id': membership['group_id'],
+                    'group_name': membership['group__name'],
+                    'created_at': membership['group__created_at'],
+                    'photo_url': membership['group__photo_url'],
+                    'description': membership['group__description'],
+                    'role': membership['role'],
+                    'last_message': membership['group__summary__last_message__content'],
+                    'last_message_time': membership['group__summary__last_message_at'],
+                    'unread_count': membership['user_unread__count'] or 0,
+                    'members_count': membership['group__summary__member_count'] or 0
                 })
             
             return {
@@ -1153,13 +1652,13 @@ class DatabaseService:
         """
         Accept a group invite using the invite ID.
         Args:
-            user_sub (str): Cognito ID of the user accepting the invite
+            user_sub (str or User): Cognito ID of the user accepting the invite
             invite_id (str): ID of the group invitation
         Returns:
             dict: status of accept operation.
         """
         try:
-            user = User.objects.get(cognito_id=user_sub)
+            user = resolve_user(user_sub)
             invitation = GroupInvitation.objects.get(id=invite_id)
 
             # Check if the invited user is the one accepting the invite
@@ -1176,15 +1675,18 @@ class DatabaseService:
                     'message': 'User is already a member of this group'
                 }
 
-            # Add the user to the group
-            GroupMember.objects.create(
-                user=user,
-                group=invitation.group,
-                role='member'
-            )
+            with transaction.atomic():
+                # Add the user to the group
+                GroupMember.objects.create(
+                    user=user,
+                    group=invitation.group,
+                    role='member'
+                )
+                GroupSummaryService.add_member(user.id, invitation.group_id)
+                realtime.join_group(user.id, invitation.group_id)
 
-            # Delete the invitation after acceptance
-            invitation.delete()
+                # Delete the invitation after acceptance
+                invitation.delete()
 
             return {
                 'status': 'SUCCESS',
@@ -1212,13 +1714,13 @@ class DatabaseService:
         Reject group invite by group ID.
 
         Args:
-            user_sub (str): Cognito ID of the user rejecting the invite
+            user_sub (str or User): Cognito ID of the user rejecting the invite
             invite_id (str): ID of the invitation
         Returns:
             dict: status of reject operation.
         """
         try:
-            user = User.objects.get(cognito_id=user_sub)
+            user = resolve_user(user_sub)
             invitation = GroupInvitation.objects.get(id=invite_id)
 
             # Check if the invited user is the one rejecting the invite
@@ -1257,12 +1759,12 @@ class DatabaseService:
         Get the group invites for a user using the cognito ID.
 
         Args:
-            user_sub(str): cognito ID of the user.
+            user_sub(str or User): cognito ID of the user.
         Returns:
             dict: invites dict and status of the operation.
         """
         try:
-            user = User.objects.get(cognito_id=user_sub)
+            user = resolve_user(user_sub)
             invitations = GroupInvitation.objects.filter(invited_user=user).select_related('group')
             invites_list = []
 
@@ -1297,11 +1799,11 @@ class DatabaseService:
         Cancel invite before the invitee takes any aciton.
 
         Args:
-            user_sub(str): cognito id of the user who sent the invite.
+            user_sub(str or User): cognito id of the user who sent the invite.
             invite_id(str): invititation id.
         """
         try:
-            user = User.objects.get(cognito_id=user_sub)
+            user = resolve_user(user_sub)
             invitation = GroupInvitation.objects.get(id=invite_id)
             # Check if the user is the one who sent the invitation
             if invitation.invited_by != user:
@@ -1336,54 +1838,76 @@ class DatabaseService:
     def send_group_message(sender_id, group_id, content, message_type, file_url=None):
         """
         Send a message to a group.
+
+        Membership comes from the cached group members and is confirmed
+        inside the transaction that writes the message, group summary,
+        unread counters and the sender's read receipt. A send on a warm
+        cache is one INSERT, two UPDATEs and an upsert, plus an indexed
+        EXISTS when the cache is process-local.
         
         Args:
-            sender_id (str): ID of the sender
+            sender_id (str or User): ID of the sender
             group_id (str): ID of the group
             content (str): Message content
             message_type (str): Type of message (text, image, etc.)
             file_url (str, optional): URL of the file being sent
         
         Returns:
-            dict: Status of the send operation
+            dict: Status of the send operation and the created message
         """
         try:
-            sender = User.objects.get(cognito_id=sender_id)
-            group = Group.objects.get(id=group_id)
+            sender = resolve_user(sender_id)
 
             # Check if the user is a member of the group
-            if not GroupMember.objects.filter(user=sender, group=group).exists():
+            group_name = GroupSummaryService.get_member_group_name(sender.id, group_id)
+            if group_name is None:
                 return {
                     'status': 'ERROR',
                     'message': 'User is not a member of this group'
                 }
 
-            message = GroupMessage.objects.create(
-                sender=sender,
-                group=group,
-                content=content,
-                message_type=message_type,
-                file_url=file_url
-            )
-            # Update last message of the user
-            try:
-                read_receipt, created = GroupReadReceipt.objects.get_or_create(
-                    user=sender,
-                    group=group,
-                    defaults={'last_read_message': message}
+            with transaction.atomic():
+                if not GroupSummaryService.confirm_member(sender.id, group_id):
+                    return {
+                        'status': 'ERROR',
+                        'message': 'User is not a member of this group'
+                    }
+
+                message = GroupMessage.objects.create(
+                    sender=sender,
+                    group_id=group_id,
+                    content=content,
+                    message_type=message_type,
+                    file_url=file_url
                 )
-                if not created:
-                    read_receipt.last_read_message = message
-                    read_receipt.save()
-                    
-            except Exception as e:
-                # Just log the error but don't fail the message sending
-                print(f"Error updating read receipt: {str(e)}")
+                # Update the group summary and everyone's unread counters,
+                # the sender's counter is reset along with their read receipt
+                GroupSummaryService.record_message(message)
+                GroupSummaryService.upsert_receipt(sender.id, group_id, message)
+
+                payload = {
+                    'message_id': message.id,
+                    'sender_id': sender.id,
+                    'sender_name': sender.full_name,
+                    'group_id': group_id,
+                    'group_name': group_name,
+                    'content': message.content,
+                    'message_type': message.message_type,
+                    'file_url': message.file_url,
+                    'created_at': message.created_at,
+                    'is_deleted': message.is_deleted
+                }
+                # Push the new message to members connected over websockets
+                realtime.publish([realtime.group_channel(group_id)], {
+                    'type': 'group_message',
+                    'message': payload
+                })
 
             return {
                 'status': 'SUCCESS',
                 'message': 'Group message sent successfully',
-                'message_id': message.id
+                'message_id': message.id,
+                'data': payload
             }
         except User.DoesNotExist:
             return {
@@ -1407,7 +1931,7 @@ class DatabaseService:
         Search for users to invite to a group.
         
         Args:
-            user_sub (str): Cognito ID of the user searching
+            user_sub (str or User): Cognito ID of the user searching
             group_id (str): ID of the group
             search_term (str): Search term for username or email
         
@@ -1415,7 +1939,7 @@ class DatabaseService:
             dict: Status of the search operation and list of users found
         """
         try:
-            user = User.objects.get(cognito_id=user_sub)
+            user = resolve_user(user_sub)
             group = Group.objects.get(id=group_id)
 
             # Check if the user is an admin of the group
@@ -1425,12 +1949,8 @@ class DatabaseService:
                     'message': 'User is not an admin of this group'
                 }
 
-            # Find users matching search criteria
-            users = User.objects.filter(
-                models.Q(name__icontains=search_term) |
-                models.Q(email__icontains=search_term) |
-                models.Q(full_name__icontains=search_term)
-            ).exclude(
+            # Find users matching search criteria, most relevant first
+            users = UserSearchIndex.search(search_term).exclude(
                 models.Q(id=user.id) | 
                 models.Q(id__in=Subquery(
                     GroupMember.objects.filter(group_id=group_id).values('user__id')
@@ -1471,13 +1991,13 @@ class DatabaseService:
         Verifies if the user is an admin and deletes the group.
 
         Args:
-            user_sub(str): cognito id of the user,
+            user_sub(str or User): cognito id of the user,
             group_id(str): id of the group to be deleted
         Returns:
             dict: dict with status of the delete operation.
         '''
         try:
-            user = User.objects.get(cognito_id=user_sub)
+            user = resolve_user(user_sub)
             group = Group.objects.get(id=group_id)
     
             if not GroupMember.objects.filter(user=user, group=group, role='admin').exists():
@@ -1487,6 +2007,9 @@ class DatabaseService:
                 }
             
             # Delete all group members and messages
+            GroupSummaryService.forget_group(group.id)
+            for member_id in GroupMember.objects.filter(group=group).values_list('user_id', flat=True):
+                realtime.leave_group(member_id, group.id)
             GroupMember.objects.filter(group=group).delete()
             GroupMessage.objects.filter(group=group).delete()
 
@@ -1515,7 +2038,7 @@ class DatabaseService:
         Edit the group details.
 
         Args:
-            user_sub (str): Cognito ID of the user editing the group
+            user_sub (str or User): Cognito ID of the user editing the group
             group_id (str): ID of the group
             group_name (str, optional): New name for the group
             group_description (str, optional): New description for the group
@@ -1524,7 +2047,7 @@ class DatabaseService:
             dict: Status of the edit operation
         """
         try:
-            user = User.objects.get(cognito_id=user_sub)
+            user = resolve_user(user_sub)
             group = Group.objects.get(id=group_id)
 
             # Check if the user is an admin of the group
@@ -1540,6 +2063,7 @@ class DatabaseService:
             if group_description:
                 group.description = group_description
             group.save()
+            GroupSummaryService.forget_group(group.id)
 
             return {
                 'status': 'SUCCESS',
@@ -1567,7 +2091,7 @@ class DatabaseService:
         Remove a user from a group only if the method id called by group admin.
 
         Args:
-            user_sub (str): Cognito ID of the user performing the action
+            user_sub (str or User): Cognito ID of the user performing the action
             group_id (str): ID of the group
             user_id (str): ID of the user to be removed
         
@@ -1575,7 +2099,7 @@ class DatabaseService:
             dict: Status of the removal operation
         """
         try:
-            user = User.objects.get(cognito_id=user_sub)
+            user = resolve_user(user_sub)
             group = Group.objects.get(id=group_id)
             member_to_remove = User.objects.get(id=user_id)
 
@@ -1594,7 +2118,10 @@ class DatabaseService:
                 }
 
             # Remove the member from the group
-            GroupMember.objects.filter(user=member_to_remove, group=group).delete()
+            with transaction.atomic():
+                GroupMember.objects.filter(user=member_to_remove, group=group).delete()
+                GroupSummaryService.remove_member(member_to_remove.id, group.id)
+                realtime.leave_group(member_to_remove.id, group.id)
 
             return {
                 'status': 'SUCCESS',
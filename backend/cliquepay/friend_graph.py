@@ -0,0 +1,144 @@
+import threading
+import uuid
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models
+from .cache_utils import TTLCache
+from .models import Friendship
+
+KEY_PREFIX = 'cliquepay:friends'
+
+FriendEdge = namedtuple('FriendEdge', ['friendship_id', 'status', 'action_user_id', 'created_at'])
+
+
+class FriendGraph:
+    """
+    user id -> {friend id: FriendEdge} adjacency cache.
+
+    A user's adjacency is loaded with one query over their friendships and
+    then kept current by the friendship operations in DatabaseService,
+    which call record() or forget() once their change is committed. The
+    dicts handed out are never modified in place, so callers may hold on
+    to them for the rest of a request.
+
+    Keys carry a per-user version that changes with every update, the same
+    way UserCache does. Without a shared cache the process that made the
+    change stores the updated adjacency under the new version and other
+    processes catch up when their entries expire. With a shared Django
+    cache the new version is shared, so every process reloads.
+    """
+
+    def __init__(self, maxsize=10000, ttl=60, shared=None):
+        self.ttl = ttl
+        self.shared = shared
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def _version_key(self, user_id):
+        return f'{KEY_PREFIX}:version:{user_id}'
+
+    def _entry_key(self, user_id, version):
+        return f'{KEY_PREFIX}:{version}:{user_id}'
+
+    def _get_version(self, user_id):
+        if self.shared is not None:
+            return self.shared.get(self._version_key(user_id), '0')
+        return self._versions.get(user_id, '0')
+
+    def _load(self, user_id):
+        adjacency = {}
+        for friendship_id, user1_id, user2_id, status, action_user_id, created_at in Friendship.objects.filter(
+            models.Q(user1_id=user_id) | models.Q(user2_id=user_id)
+        ).values_list('id', 'user1_id', 'user2_id', 'status', 'action_user_id', 'created_at'):
+            friend_id = user2_id if user1_id == user_id else user1_id
+            adjacency[friend_id] = FriendEdge(friendship_id, status, action_user_id, created_at)
+        return adjacency
+
+    def get(self, user_id):
+        """
+        Friendships of a user, keyed by the other user's ID.
+
+        Args:
+            user_id (str): Database ID of the user
+
+        Returns:
+            dict: friend id -> FriendEdge, for every status
+        """
+        version = self._get_version(user_id)
+        key = self._entry_key(user_id, version)
+        adjacency = self._local.get(key)
+        if adjacency is None and self.shared is not None:
+            adjacency = self.shared.get(key)
+            if adjacency is not None:
+                self._local.set(key, adjacency)
+        if adjacency is None:
+            adjacency = self._load(user_id)
+            self._local.set(key, adjacency)
+            if self.shared is not None:
+                self.shared.set(key, adjacency, timeout=self.ttl)
+        return adjacency
+
+    def _update(self, user_id, friend_id, edge):
+        # A new version also strands any adjacency a concurrent get() loaded
+        # from before the change
+        version = uuid.uuid4().hex
+        if self.shared is not None:
+            self.shared.set(self._version_key(user_id), version, timeout=self.ttl)
+            return
+        with self._lock:
+            adjacency = self._local.get(self._entry_key(user_id, self._get_version(user_id)))
+            self._versions.set(user_id, version)
+            if adjacency is None:
+                return
+            adjacency = dict(adjacency)
+            if edge is None:
+                adjacency.pop(friend_id, None)
+            else:
+                adjacency[friend_id] = edge
+            self._local.set(self._entry_key(user_id, version), adjacency)
+
+    def record(self, friendship):
+        """
+        Account for a created or updated friendship.
+
+        Args:
+            friendship (Friendship): The friendship as saved
+        """
+        edge = FriendEdge(str(friendship.id), friendship.status, friendship.action_user_id, friendship.created_at)
+        self._update(friendship.user1_id, friendship.user2_id, edge)
+        self._update(friendship.user2_id, friendship.user1_id, edge)
+
+    def forget(self, friendship):
+        """
+        Account for a deleted friendship.
+
+        Args:
+            friendship (Friendship): The friendship that was deleted
+        """
+        self._update(friendship.user1_id, friendship.user2_id, None)
+        self._update(friendship.user2_id, friendship.user1_id, None)
+
+
+_friend_graph = None
+_friend_graph_lock = threading.Lock()
+
+
+def get_friend_graph():
+    """
+    Return the process-wide friend graph cache, building it on first use.
+    FRIEND_GRAPH_CACHE_ALIAS names a Django cache to share adjacencies
+    across processes, without it the cache is process-local.
+    """
+    global _friend_graph
+    if _friend_graph is None:
+        with _friend_graph_lock:
+            if _friend_graph is None:
+                alias = getattr(settings, 'FRIEND_GRAPH_CACHE_ALIAS', None)
+                _friend_graph = FriendGraph(
+                    maxsize=getattr(settings, 'FRIEND_GRAPH_CACHE_SIZE', 10000),
+                    ttl=getattr(settings, 'FRIEND_GRAPH_CACHE_TTL', 60),
+                    shared=caches[alias] if alias else None
+                )
+    return _friend_graph
@@ -0,0 +1,242 @@
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, Sum, When
+from .models import Balance, Expense, ExpenseSplit
+
+CENT = Decimal('0.01')
+
+
+def to_amount(value):
+    """
+    Convert a number (Decimal, float, str) into a two decimal place Decimal.
+    """
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class BalanceLedger:
+    """
+    Keeps the balances table in step with expense splits.
+
+    Every write path that changes a split's remaining amount hands the
+    change to apply() inside its own transaction, so the dashboard can read
+    totals straight from the ledger instead of adding splits up.
+    """
+
+    @staticmethod
+    def split_deltas(splits, paid_by_id, group_id, sign=1):
+        """
+        Collect what each split's user still owes the payer.
+
+        Args:
+            splits (iterable): ExpenseSplit objects of a single expense
+            paid_by_id (str): ID of the user who paid the expense
+            group_id (str): Group of the expense, None for friend expenses
+            sign (int): 1 to add the debt, -1 to remove it
+        Returns:
+            dict: (debtor_id, creditor_id, group_id) -> Decimal delta
+        """
+        deltas = defaultdict(Decimal)
+        for split in splits:
+            if split.is_paid or str(split.user_id) == str(paid_by_id):
+                continue
+            deltas[(split.user_id, paid_by_id, group_id)] += sign * to_amount(split.remaining_amount)
+        return deltas
+
+    @staticmethod
+    def apply(deltas):
+        """
+        Add the given deltas to the ledger with a fixed number of queries.
+
+        Existing rows are locked and bulk updated, missing ones bulk created.
+        Must run inside the caller's transaction so the ledger commits or
+        rolls back together with the splits.
+
+        Two transactions can both find a row missing and try to create it.
+        The unique_balance constraint makes the second one fail; its
+        savepoint is rolled back and the deltas are applied again, now on
+        top of the row the first one committed.
+
+        Args:
+            deltas (dict): (debtor_id, creditor_id, group_id) -> Decimal delta
+        """
+        deltas = {key: value for key, value in deltas.items() if value}
+        if not deltas:
+            return
+
+        try:
+            BalanceLedger._apply(deltas)
+        except IntegrityError:
+            BalanceLedger._apply(deltas)
+
+    @staticmethod
+    def _apply(deltas):
+        debtor_ids = {key[0] for key in deltas}
+        creditor_ids = {key[1] for key in deltas}
+        group_ids = {key[2] for key in deltas if key[2] is not None}
+
+        group_filter = models.Q(group_id__in=group_ids)
+        if any(key[2] is None for key in deltas):
+            group_filter |= models.Q(group__isnull=True)
+
+        with transaction.atomic():
+            rows = Balance.objects.select_for_update().filter(
+                group_filter,
+                debtor_id__in=debtor_ids,
+                creditor_id__in=creditor_ids
+            ).order_by('pk')
+
+            existing = {}
+            for row in rows:
+                existing.setdefault((row.debtor_id, row.creditor_id, row.group_id), row)
+
+            to_update = []
+            to_create = []
+            for key, delta in deltas.items():
+                row = existing.get(key)
+                if row:
+                    row.amount = row.amount + delta
+                    to_update.append(row)
+                else:
+                    debtor_id, creditor_id, group_id = key
+                    to_create.append(Balance(
+                        debtor_id=debtor_id,
+                        creditor_id=creditor_id,
+                        group_id=group_id,
+                        amount=delta
+                    ))
+
+            if to_update:
+                Balance.objects.bulk_update(to_update, ['amount'])
+            if to_create:
+                Balance.objects.bulk_create(to_create)
+
+    @staticmethod
+    def get_totals(user_id):
+        """
+        Get how much the user owes others and how much others owe the user.
+
+        Args:
+            user_id (str): Database ID of the user
+        Returns:
+            tuple: (you_owe, they_owe) as Decimals
+        """
+        you_owe = Balance.objects.filter(debtor_id=user_id) \
+            .aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        they_owe = Balance.objects.filter(creditor_id=user_id) \
+            .aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        return you_owe, they_owe
+
+    @staticmethod
+    def get_creditors(user_id, group_id=None):
+        """
+        Get the users this user owes money to, with the owed amount.
+
+        Args:
+            user_id (str): Database ID of the debtor
+            group_id (str, optional): Only count debts from this group
+        Returns:
+            list: dicts with creditor id, full_name, avatar_url and total
+        """
+        balances = Balance.objects.filter(debtor_id=user_id)
+        if group_id:
+            balances = balances.filter(group_id=group_id)
+
+        return list(
+            balances.values(
+                'creditor_id',
+                'creditor__full_name',
+                'creditor__avatar_url'
+            ).annotate(total=Sum('amount')).filter(total__gt=0).order_by('-total')
+        )
+
+
+class SettlementEngine:
+    """
+    Pays off a user's unpaid splits, oldest first, in a single transaction.
+
+    The affected splits (and their expenses) are locked up front, the
+    payment is allocated in memory and everything is written back with
+    bulk statements, so the query count does not grow with the number of
+    splits and concurrent payments on the same expense can't interleave.
+    """
+
+    @staticmethod
+    def settle(debtor_id, amount=None, creditor_id=None, group_id=None):
+        """
+        Record a payment from the debtor against their unpaid splits.
+
+        Args:
+            debtor_id (str): Database ID of the paying user
+            amount (Decimal, optional): Amount paid, None settles everything owed
+            creditor_id (str, optional): Only settle splits owed to this user
+            group_id (str, optional): Only settle splits from this group
+        Returns:
+            dict: Status, amount settled, amount left over and settled splits
+        """
+        with transaction.atomic():
+            splits = ExpenseSplit.objects.select_for_update() \
+                .select_related('expense') \
+                .filter(user_id=debtor_id, is_paid=False) \
+                .exclude(expense__paid_by_id=debtor_id)
+            if group_id:
+                splits = splits.filter(expense__group_id=group_id)
+            if creditor_id:
+                splits = splits.filter(expense__paid_by_id=creditor_id)
+            splits = list(splits.order_by('created_at', 'id'))
+
+            if not splits:
+                return {
+                    'status': 'ERROR',
+                    'message': 'No splits found to settle'
+                }
+
+            if amount is None:
+                amount = sum((split.remaining_amount for split in splits), Decimal('0'))
+            amount = to_amount(amount)
+
+            # Allocate the payment across the splits in memory
+            remaining_to_pay = amount
+            paid_splits = []
+            settled_splits = []
+            expense_payments = defaultdict(Decimal)
+            ledger_deltas = defaultdict(Decimal)
+            for split in splits:
+                if remaining_to_pay <= 0:
+                    break
+                paid = min(split.remaining_amount, remaining_to_pay)
+
+                split.remaining_amount -= paid
+                split.is_paid = split.remaining_amount <= 0
+                remaining_to_pay -= paid
+
+                paid_splits.append(split)
+                expense_payments[split.expense_id] += paid
+                ledger_deltas[(debtor_id, split.expense.paid_by_id, split.expense.group_id)] -= paid
+                settled_splits.append({
+                    'id': split.id,
+                    'expense_id': split.expense_id,
+                    'amount_paid': paid,
+                    'is_fully_paid': split.is_paid
+                })
+
+            # Write everything back in a fixed number of statements
+            ExpenseSplit.objects.bulk_update(paid_splits, ['remaining_amount', 'is_paid'])
+            Expense.objects.filter(id__in=expense_payments).update(
+                remaining_amount=Case(
+                    *[
+                        When(id=expense_id, then=F('remaining_amount') - paid)
+                        for expense_id, paid in expense_payments.items()
+                    ],
+                    default=F('remaining_amount'),
+                    output_field=models.DecimalField(max_digits=10, decimal_places=2)
+                )
+            )
+            BalanceLedger.apply(ledger_deltas)
+
+        return {
+            'status': 'SUCCESS',
+            'amount_settled': amount - remaining_to_pay,
+            'remaining_amount': remaining_to_pay,
+            'settled_splits': settled_splits
+        }
@@ -0,0 +1,38 @@
+import time
+import boto3
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from cliquepay.aws_cognito import CognitoService
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare building a new Cognito client for every CognitoService '
+        'with sharing the process-wide client. No requests are sent to AWS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        # What every request used to pay in CognitoService.__init__
+        start = time.perf_counter()
+        for _ in range(iterations):
+            boto3.client('cognito-idp', region_name=settings.COGNITO_AWS_REGION)
+        per_client = (time.perf_counter() - start) / iterations
+
+        # First call builds the shared client, the rest reuse it
+        CognitoService()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            CognitoService()
+        per_shared = (time.perf_counter() - start) / iterations
+
+        self.stdout.write(f'Iterations:            {iterations}')
+        self.stdout.write(f'New client per call:   {per_client * 1000:.3f} ms')
+        self.stdout.write(f'Shared client:         {per_shared * 1000:.3f} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved per request:     {(per_client - per_shared) * 1000:.3f} ms'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from cliquepay.search_index import UserSearchIndex
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the trigram index used by user search from the users table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        indexed = UserSearchIndex.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} users'))
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def backfill_balances(apps, schema_editor):
+    ExpenseSplit = apps.get_model('cliquepay', 'ExpenseSplit')
+    Balance = apps.get_model('cliquepay', 'Balance')
+
+    owed = ExpenseSplit.objects.filter(is_paid=False) \
+        .exclude(user_id=F('expense__paid_by_id')) \
+        .values('user_id', 'expense__paid_by_id', 'expense__group_id') \
+        .annotate(amount=Sum('remaining_amount'))
+
+    Balance.objects.bulk_create([
+        Balance(
+            debtor_id=row['user_id'],
+            creditor_id=row['expense__paid_by_id'],
+            group_id=row['expense__group_id'],
+            amount=row['amount']
+        )
+        for row in owed
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cliquepay', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Balance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('creditor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credits', to='cliquepay.user')),
+                ('debtor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='debts', to='cliquepay.user')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='cliquepay.group')),
+            ],
+            options={
+                'db_table': 'balances',
+                'indexes': [models.Index(fields=['creditor', 'debtor'], name='balance_creditor_idx')],
+                'constraints': [models.UniqueConstraint(fields=('debtor', 'creditor', 'group'), name='unique_balance')],
+            },
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
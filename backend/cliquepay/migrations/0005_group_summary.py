@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_group_summaries(apps, schema_editor):
+    Group = apps.get_model('cliquepay', 'Group')
+    GroupMember = apps.get_model('cliquepay', 'GroupMember')
+    GroupMessage = apps.get_model('cliquepay', 'GroupMessage')
+    GroupReadReceipt = apps.get_model('cliquepay', 'GroupReadReceipt')
+    GroupSummary = apps.get_model('cliquepay', 'GroupSummary')
+    UnreadCounter = apps.get_model('cliquepay', 'UnreadCounter')
+
+    summaries = []
+    counters = []
+    for group in Group.objects.annotate(message_count=Count('messages')):
+        last_message = GroupMessage.objects.filter(group=group).order_by('-created_at', '-id').first()
+        summaries.append(GroupSummary(
+            group=group,
+            last_message=last_message,
+            last_message_at=last_message.created_at if last_message else None,
+            message_count=group.message_count,
+            member_count=GroupMember.objects.filter(group=group).count()
+        ))
+
+        read_times = {
+            receipt.user_id: receipt.last_read_message.created_at
+            for receipt in GroupReadReceipt.objects.filter(group=group).select_related('last_read_message')
+        }
+        for user_id in GroupMember.objects.filter(group=group).values_list('user_id', flat=True):
+            unread = GroupMessage.objects.filter(group=group).exclude(sender_id=user_id)
+            if read_times.get(user_id):
+                unread = unread.filter(created_at__gt=read_times[user_id])
+            counters.append(UnreadCounter(user_id=user_id, group=group, count=unread.count()))
+
+    GroupSummary.objects.bulk_create(summaries, batch_size=500)
+    UnreadCounter.objects.bulk_create(counters, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cliquepay', '0004_direct_message_conversation_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupSummary',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='cliquepay.group')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('member_count', models.PositiveIntegerField(default=0)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='cliquepay.groupmessage')),
+            ],
+            options={
+                'db_table': 'group_summaries',
+            },
+        ),
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unread_counters', to='cliquepay.group')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unread_counters', to='cliquepay.user')),
+            ],
+            options={
+                'db_table': 'unread_counters',
+                'constraints': [models.UniqueConstraint(fields=('user', 'group'), name='unique_unread_counter')],
+            },
+        ),
+        migrations.RunPython(backfill_group_summaries, migrations.RunPython.noop),
+    ]
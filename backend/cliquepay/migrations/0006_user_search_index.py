@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:42
+
+import unicodedata
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_user_search_grams(apps, schema_editor):
+    User = apps.get_model('cliquepay', 'User')
+    UserSearchGram = apps.get_model('cliquepay', 'UserSearchGram')
+
+    rows = []
+    for user_id, *values in User.objects.values_list('id', 'name', 'email', 'full_name').iterator():
+        grams = set()
+        for value in values:
+            # Lowercased and without accents, like search_index.normalize()
+            value = unicodedata.normalize('NFKD', (value or '').lower())
+            value = ''.join(char for char in value if not unicodedata.combining(char))
+            grams.update(value[i:i + 3] for i in range(len(value) - 2))
+        rows.extend(UserSearchGram(user_id=user_id, gram=gram) for gram in grams)
+        if len(rows) >= 1000:
+            UserSearchGram.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    UserSearchGram.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cliquepay', '0005_group_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchGram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=3)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_grams', to='cliquepay.user')),
+            ],
+            options={
+                'db_table': 'user_search_grams',
+                'constraints': [models.UniqueConstraint(fields=('gram', 'user'), name='unique_user_search_gram')],
+            },
+        ),
+        migrations.RunPython(backfill_user_search_grams, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:45
+
+from django.db import migrations, models
+
+
+def normalize_friendship_status(apps, schema_editor):
+    Friendship = apps.get_model('cliquepay', 'Friendship')
+    for status in ['PENDING', 'ACCEPTED', 'BLOCKED']:
+        Friendship.objects.filter(status__iexact=status).update(status=status)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cliquepay', '0006_user_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_friendship_status, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='friendship',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('ACCEPTED', 'Accepted'), ('BLOCKED', 'Blocked')], default='PENDING', max_length=8),
+        ),
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(fields=['user1', 'status'], name='friendship_user1_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(fields=['user2', 'status'], name='friendship_user2_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='friendship',
+            constraint=models.CheckConstraint(condition=models.Q(('status__in', ['PENDING', 'ACCEPTED', 'BLOCKED'])), name='friendship_status_valid'),
+        ),
+    ]
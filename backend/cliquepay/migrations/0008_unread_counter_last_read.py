@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:46
+
+from django.db import migrations, models
+
+
+def backfill_last_read_at(apps, schema_editor):
+    GroupReadReceipt = apps.get_model('cliquepay', 'GroupReadReceipt')
+    UnreadCounter = apps.get_model('cliquepay', 'UnreadCounter')
+
+    for user_id, group_id, read_at in GroupReadReceipt.objects.values_list(
+        'user_id', 'group_id', 'last_read_message__created_at'
+    ).iterator():
+        UnreadCounter.objects.filter(user_id=user_id, group_id=group_id).update(last_read_at=read_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cliquepay', '0007_friendship_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unreadcounter',
+            name='last_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_last_read_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:47
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_last_read_at(apps, schema_editor):
+    GroupMessage = apps.get_model('cliquepay', 'GroupMessage')
+    GroupReadReceipt = apps.get_model('cliquepay', 'GroupReadReceipt')
+
+    GroupReadReceipt.objects.update(last_read_at=Subquery(
+        GroupMessage.objects.filter(id=OuterRef('last_read_message_id')).values('created_at')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cliquepay', '0008_unread_counter_last_read'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='groupreadreceipt',
+            options={'ordering': ['-last_read_at']},
+        ),
+        migrations.AddField(
+            model_name='groupreadreceipt',
+            name='last_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_last_read_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='groupreadreceipt',
+            index=models.Index(fields=['user', 'group', 'last_read_at'], name='read_receipt_position_idx'),
+        ),
+    ]
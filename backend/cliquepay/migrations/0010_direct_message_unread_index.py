@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cliquepay', '0009_read_receipt_last_read_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='directmessage',
+            index=models.Index(fields=['recipient', 'sender', 'is_read', 'created_at'], name='dm_unread_idx'),
+        ),
+    ]
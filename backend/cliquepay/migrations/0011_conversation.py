@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def backfill_conversations(apps, schema_editor):
+    Conversation = apps.get_model('cliquepay', 'Conversation')
+    DirectMessage = apps.get_model('cliquepay', 'DirectMessage')
+
+    pairs = {
+        (sender_id, recipient_id) if sender_id < recipient_id else (recipient_id, sender_id)
+        for sender_id, recipient_id in DirectMessage.objects.values_list('sender_id', 'recipient_id').distinct()
+        if sender_id != recipient_id
+    }
+    conversations = []
+    for user1_id, user2_id in pairs:
+        messages = DirectMessage.objects.filter(
+            Q(sender_id=user1_id, recipient_id=user2_id) |
+            Q(sender_id=user2_id, recipient_id=user1_id)
+        )
+        last_message = messages.order_by('-created_at', '-id').first()
+        conversations.append(Conversation(
+            user1_id=user1_id,
+            user2_id=user2_id,
+            last_message=last_message,
+            last_message_at=last_message.created_at,
+            user1_unread=messages.filter(recipient_id=user1_id, is_read=False).count(),
+            user2_unread=messages.filter(recipient_id=user2_id, is_read=False).count()
+        ))
+    Conversation.objects.bulk_create(conversations, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cliquepay', '0010_direct_message_unread_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('user1_unread', models.PositiveIntegerField(default=0)),
+                ('user2_unread', models.PositiveIntegerField(default=0)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='cliquepay.directmessage')),
+                ('user1', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user1_conversations', to='cliquepay.user')),
+                ('user2', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user2_conversations', to='cliquepay.user')),
+            ],
+            options={
+                'db_table': 'conversations',
+                'indexes': [models.Index(fields=['user1', 'last_message_at'], name='conversation_user1_recent_idx'), models.Index(fields=['user2', 'last_message_at'], name='conversation_user2_recent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user1', 'user2'), name='unique_conversation'), models.CheckConstraint(condition=models.Q(('user1__lt', models.F('user2'))), name='conversation_user_order')],
+            },
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:02
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_friend_balances(apps, schema_editor):
+    # The old constraint let rows without a group repeat, fold each pair's
+    # rows into one before the new constraint is created
+    Balance = apps.get_model('cliquepay', 'Balance')
+
+    duplicates = Balance.objects.filter(group__isnull=True) \
+        .values('debtor_id', 'creditor_id') \
+        .annotate(rows=Count('id'), total=Sum('amount')) \
+        .filter(rows__gt=1)
+
+    for row in duplicates:
+        balances = Balance.objects.filter(
+            group__isnull=True,
+            debtor_id=row['debtor_id'],
+            creditor_id=row['creditor_id']
+        ).order_by('pk')
+        keep = balances.first()
+        balances.exclude(pk=keep.pk).delete()
+        keep.amount = row['total']
+        keep.save(update_fields=['amount'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cliquepay', '0011_conversation'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_friend_balances, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='balance',
+            name='unique_balance',
+        ),
+        migrations.AddConstraint(
+            model_name='balance',
+            constraint=models.UniqueConstraint(models.F('debtor'), models.F('creditor'), django.db.models.functions.comparison.Coalesce('group', models.Value('')), name='unique_balance'),
+        ),
+    ]
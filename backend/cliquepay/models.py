@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.core.validators import RegexValidator
 import uuid 
 
@@ -43,16 +44,19 @@ class User(models.Model):
         return f"{self.full_name} ({self.email})"
     
 class Friendship(models.Model):
+    PENDING = 'PENDING'
+    ACCEPTED = 'ACCEPTED'
+    BLOCKED = 'BLOCKED'
     STATUS_CHOICES = [
-        ('pending', 'Pending'),
-        ('accepted', 'Accepted'),
-        ('blocked', 'Blocked'),
+        (PENDING, 'Pending'),
+        (ACCEPTED, 'Accepted'),
+        (BLOCKED, 'Blocked'),
     ]
     
     id = models.CharField(max_length=128, primary_key=True, default=uuid.uuid4, unique=True)
     user1 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user1_friendships')
     user2 = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user2_friendships')
-    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default='pending')
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=PENDING)
     created_at = models.DateTimeField(auto_now_add=True)
     action_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='friendship_actions')
 
@@ -64,10 +68,18 @@ class Friendship(models.Model):
                 name='unique_friendship'
             ),
             models.CheckConstraint(
-                check=models.Q(user1__lt=models.F('user2')),
+                condition=models.Q(user1__lt=models.F('user2')),
                 name='force_user_order'
+            ),
+            models.CheckConstraint(
+                condition=models.Q(status__in=['PENDING', 'ACCEPTED', 'BLOCKED']),
+                name='friendship_status_valid'
             )
         ]
+        indexes = [
+            models.Index(fields=['user1', 'status'], name='friendship_user1_status_idx'),
+            models.Index(fields=['user2', 'status'], name='friendship_user2_status_idx'),
+        ]
 
 class Group(models.Model):
     id = models.CharField(max_length=128, primary_key=True, default=uuid.uuid4, unique=True)
@@ -167,6 +179,12 @@ class DirectMessage(ChatMessage):
     class Meta:
         db_table = 'direct_messages'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['sender', 'created_at'], name='dm_sender_created_idx'),
+            models.Index(fields=['recipient', 'created_at'], name='dm_recipient_created_idx'),
+            models.Index(fields=['sender', 'recipient', 'created_at'], name='dm_conversation_idx'),
+            models.Index(fields=['recipient', 'sender', 'is_read', 'created_at'], name='dm_unread_idx'),
+        ]
 
 class GroupMessage(ChatMessage):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_group_messages')
@@ -176,16 +194,86 @@ class GroupMessage(ChatMessage):
     class Meta:
         db_table = 'group_messages'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['group', 'created_at'], name='group_msg_created_idx'),
+        ]
 
 class GroupReadReceipt(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='read_receipts')
     last_read_message = models.ForeignKey(GroupMessage, on_delete=models.CASCADE, related_name='read_receipts')
     group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='read_receipts')
+    # Copy of last_read_message.created_at so the read position can be
+    # compared and advanced without joining group_messages
+    last_read_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         db_table = 'group_read_receipts'
         unique_together = ('user', 'group')
-        ordering = ['-last_read_message__created_at']
+        ordering = ['-last_read_at']
+        indexes = [
+            models.Index(fields=['user', 'group', 'last_read_at'], name='read_receipt_position_idx'),
+        ]
+
+class GroupSummary(models.Model):
+    """
+    Denormalized chat summary of a group, updated whenever a message is
+    sent or the membership changes, so the groups sidebar doesn't have to
+    look up the latest message and count members for every group.
+    """
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='summary'
+    )
+    last_message = models.ForeignKey(
+        GroupMessage,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    message_count = models.PositiveIntegerField(default=0)
+    member_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'group_summaries'
+
+    def __str__(self):
+        return f"{self.group.name}: {self.message_count} messages, {self.member_count} members"
+
+class UnreadCounter(models.Model):
+    """
+    Number of messages in a group the user has not read yet, and the time
+    of the last message they have read.
+    Bumped for every other member when a message is sent and reset when
+    the user's read receipt moves forward.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='unread_counters'
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='unread_counters'
+    )
+    count = models.PositiveIntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'unread_counters'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'group'],
+                name='unique_unread_counter'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user.full_name} has {self.count} unread in {self.group.name}"
 
 class Expense(models.Model):
     """
@@ -253,4 +341,119 @@ class ExpenseSplit(models.Model):
         unique_together = ['expense', 'user']
 
     def __str__(self):
-        return f"{self.user.full_name} owes ${self.remaining_amount} for {self.expense.description}"
\ No newline at end of file
+        return f"{self.user.full_name} owes ${self.remaining_amount} for {self.expense.description}"
+
+class Balance(models.Model):
+    """
+    Running total of what one user owes another, kept in step with the
+    unpaid expense splits so summaries don't have to add them up again.
+    Group is null for expenses shared directly with a friend.
+    """
+    debtor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='debts'
+    )
+    creditor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='credits'
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='balances',
+        null=True,
+        blank=True
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'balances'
+        constraints = [
+            # On the group id with null mapped to '', since a unique index
+            # treats every NULL as distinct and would let two concurrent
+            # friend expenses create duplicate rows
+            models.UniqueConstraint(
+                'debtor', 'creditor', Coalesce('group', models.Value('')),
+                name='unique_balance'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['creditor', 'debtor'], name='balance_creditor_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.debtor.full_name} owes {self.creditor.full_name} ${self.amount}"
+
+class UserSearchGram(models.Model):
+    """
+    One trigram of a user's username, email or full name. User search
+    looks trigrams up here instead of scanning the users table with
+    leading-wildcard LIKEs, which no index can serve.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='search_grams'
+    )
+    gram = models.CharField(max_length=3)
+
+    class Meta:
+        db_table = 'user_search_grams'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['gram', 'user'],
+                name='unique_user_search_gram'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.gram} -> {self.user_id}"
+
+class Conversation(models.Model):
+    """
+    Inbox entry for the direct messages between two users, updated with
+    every message so the chats sidebar doesn't have to group messages.
+    Like Friendship, user1 is always the user with the smaller id.
+    """
+    user1 = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='user1_conversations'
+    )
+    user2 = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='user2_conversations'
+    )
+    last_message = models.ForeignKey(
+        DirectMessage,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    user1_unread = models.PositiveIntegerField(default=0)
+    user2_unread = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'conversations'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user1', 'user2'],
+                name='unique_conversation'
+            ),
+            models.CheckConstraint(
+                condition=models.Q(user1__lt=models.F('user2')),
+                name='conversation_user_order'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user1', 'last_message_at'], name='conversation_user1_recent_idx'),
+            models.Index(fields=['user2', 'last_message_at'], name='conversation_user2_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user1_id} <-> {self.user2_id}"
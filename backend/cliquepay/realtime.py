@@ -0,0 +1,258 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKEND = 'cliquepay.realtime.InMemoryPubSub'
+WEBSOCKET_PATH = '/ws/chat/'
+# Seconds a new connection has to send its ID token
+DEFAULT_AUTH_TIMEOUT = 10
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def group_channel(group_id):
+    return f'group:{group_id}'
+
+
+class Subscription:
+    """
+    One connection's view of the pub/sub backend.
+    Events are handed over from any thread and read back on the
+    connection's event loop with get().
+    """
+
+    def __init__(self, backend, channels, max_pending=100):
+        self.backend = backend
+        self.channels = list(channels)
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=max_pending)
+
+    def deliver(self, event):
+        # Membership changes come in on the user's own channel and move the
+        # subscription before the client hears about them, so no group
+        # event published after the change reaches a former member
+        if event.get('type') == 'group_joined':
+            self.backend.add_channels(self, [group_channel(event['group_id'])])
+        elif event.get('type') == 'group_left':
+            self.backend.remove_channels(self, [group_channel(event['group_id'])])
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The connection's loop is already gone
+            pass
+
+    def _put(self, event):
+        # A slow client drops its oldest events rather than growing forever
+        if self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(event)
+
+    async def get(self):
+        return await self._queue.get()
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+class InMemoryPubSub:
+    """
+    Process-local pub/sub backend.
+
+    Works when the views and the websocket connections run in the same
+    ASGI process. To fan events out across several workers, point the
+    REALTIME_BACKEND setting at a broker-backed class that provides the
+    same subscribe/unsubscribe/add_channels/remove_channels/publish
+    methods.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.remove_channels(subscription, list(subscription.channels))
+
+    def add_channels(self, subscription, channels):
+        with self._lock:
+            for channel in channels:
+                if channel not in subscription.channels:
+                    subscription.channels.append(channel)
+                self._subscribers[channel].add(subscription)
+
+    def remove_channels(self, subscription, channels):
+        with self._lock:
+            for channel in channels:
+                if channel in subscription.channels:
+                    subscription.channels.remove(channel)
+                subscribers = self._subscribers.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    Return the process-wide pub/sub backend, building it on first use.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_class = import_string(getattr(settings, 'REALTIME_BACKEND', DEFAULT_BACKEND))
+                _backend = backend_class()
+    return _backend
+
+
+def publish(channels, event):
+    """
+    Publish an event to the given channels once the current transaction
+    commits, so clients never hear about rows that were rolled back.
+    """
+    def send():
+        backend = get_backend()
+        for channel in channels:
+            backend.publish(channel, event)
+
+    transaction.on_commit(send)
+
+
+def join_group(user_id, group_id):
+    """
+    Tell a user's open connections that they joined a group, which also
+    subscribes them to its channel. Sent once the transaction commits.
+    """
+    publish([user_channel(user_id)], {'type': 'group_joined', 'group_id': group_id})
+
+
+def leave_group(user_id, group_id):
+    """
+    Tell a user's open connections that they left or were removed from a
+    group, which also unsubscribes them from its channel. Sent once the
+    transaction commits.
+    """
+    publish([user_channel(user_id)], {'type': 'group_left', 'group_id': group_id})
+
+
+def resolve_channels(id_token):
+    """
+    Work out which channels the owner of the ID token may listen to:
+    their own user channel plus one per group they belong to.
+    Returns an empty list when the token or user is invalid.
+    """
+    from .aws_cognito import CognitoService
+    from .db_service import resolve_user
+    from .models import GroupMember, User
+
+    if not id_token:
+        return []
+
+    decoded = CognitoService().get_user_id(id_token)
+    if decoded['status'] != 'SUCCESS':
+        return []
+
+    try:
+        user = resolve_user(decoded['user_sub'])
+    except User.DoesNotExist:
+        return []
+
+    group_ids = GroupMember.objects.filter(user=user).values_list('group_id', flat=True)
+    return [user_channel(user.id)] + [group_channel(group_id) for group_id in group_ids]
+
+
+async def websocket_application(scope, receive, send):
+    """
+    ASGI websocket handler that pushes new direct and group messages.
+
+    Clients connect to /ws/chat/ and authenticate with their first
+    message, {"type": "auth", "id_token": "..."}, within
+    REALTIME_AUTH_TIMEOUT seconds (default 10). The token is never put in
+    the URL, where proxies and access logs would record it. Once
+    {"type": "authenticated"} comes back they receive JSON events of the
+    form {"type": "group_message" | "direct_message", "message": {...}},
+    and {"type": "group_joined" | "group_left", "group_id": ...} when
+    their memberships change.
+    """
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    if scope['path'] != WEBSOCKET_PATH:
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    await send({'type': 'websocket.accept'})
+
+    try:
+        message = await asyncio.wait_for(
+            receive(),
+            timeout=getattr(settings, 'REALTIME_AUTH_TIMEOUT', DEFAULT_AUTH_TIMEOUT)
+        )
+    except asyncio.TimeoutError:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+    if message['type'] != 'websocket.receive':
+        return
+
+    try:
+        auth = json.loads(message.get('text') or '')
+    except ValueError:
+        auth = None
+    id_token = auth.get('id_token') if isinstance(auth, dict) and auth.get('type') == 'auth' else None
+
+    channels = await sync_to_async(resolve_channels)(id_token)
+    if not channels:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+
+    subscription = get_backend().subscribe(channels)
+    await send({'type': 'websocket.send', 'text': json.dumps({'type': 'authenticated'})})
+    receive_task = asyncio.ensure_future(receive())
+    event_task = asyncio.ensure_future(subscription.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait(
+                {receive_task, event_task},
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if event_task in done:
+                await send({
+                    'type': 'websocket.send',
+                    'text': json.dumps(event_task.result(), cls=DjangoJSONEncoder)
+                })
+                event_task = asyncio.ensure_future(subscription.get())
+            if receive_task in done:
+                if receive_task.result()['type'] == 'websocket.disconnect':
+                    break
+                # Messages from the client are ignored, sending goes through the REST API
+                receive_task = asyncio.ensure_future(receive())
+    finally:
+        subscription.close()
+        receive_task.cancel()
+        event_task.cancel()
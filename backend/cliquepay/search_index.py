@@ -0,0 +1,133 @@
+import unicodedata
+from django.db import models
+from django.db.models import Case, Count, Q, Value, When
+from .models import User, UserSearchGram
+
+GRAM_SIZE = 3
+
+
+def normalize(value):
+    """
+    Lowercase a string and strip its accents, so grams that MySQL's
+    default accent- and case-insensitive collation treats as equal
+    ("osé" and "ose") are equal here too.
+    """
+    value = unicodedata.normalize('NFKD', (value or '').lower())
+    return ''.join(char for char in value if not unicodedata.combining(char))
+
+
+def user_search_grams(*values):
+    """
+    Normalized trigrams of the given strings.
+    """
+    grams = set()
+    for value in values:
+        value = normalize(value)
+        grams.update(value[i:i + GRAM_SIZE] for i in range(len(value) - GRAM_SIZE + 1))
+    return grams
+
+
+class UserSearchIndex:
+    """
+    Trigram index over usernames, emails and full names.
+
+    Every trigram of a user's searchable fields is a row in
+    user_search_grams. A search term of three or more characters can only
+    be contained in a field that has all of the term's trigrams, so
+    candidates are found with an index lookup per trigram and only those
+    are checked with LIKE. Shorter terms match on prefixes, which the
+    username, full name and email indexes serve directly.
+    """
+
+    @staticmethod
+    def index_user(user):
+        """
+        Bring a user's trigrams in line with their current fields.
+
+        Args:
+            user (User): The user that was created or updated
+        """
+        grams = user_search_grams(user.name, user.email, user.full_name)
+        indexed = set(UserSearchGram.objects.filter(user=user).values_list('gram', flat=True))
+        if indexed - grams:
+            UserSearchGram.objects.filter(user=user, gram__in=indexed - grams).delete()
+        # Conflicts are ignored in case the database collation still equates
+        # two grams that normalize() keeps apart
+        UserSearchGram.objects.bulk_create(
+            [UserSearchGram(user=user, gram=gram) for gram in grams - indexed],
+            ignore_conflicts=True
+        )
+
+    @staticmethod
+    def rebuild(batch_size=1000):
+        """
+        Rebuild the whole index from the users table.
+
+        Returns:
+            int: Number of users indexed
+        """
+        UserSearchGram.objects.all().delete()
+        indexed = 0
+        rows = []
+        for user_id, name, email, full_name in User.objects.values_list(
+            'id', 'name', 'email', 'full_name'
+        ).iterator(chunk_size=batch_size):
+            rows.extend(
+                UserSearchGram(user_id=user_id, gram=gram)
+                for gram in user_search_grams(name, email, full_name)
+            )
+            indexed += 1
+            if len(rows) >= batch_size:
+                UserSearchGram.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+                rows = []
+        UserSearchGram.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+        return indexed
+
+    @staticmethod
+    def search(search_term, queryset=None):
+        """
+        Users whose username, email or full name contain the search term,
+        most relevant first: exact username, then username, full name and
+        email prefixes, then any other match.
+
+        Args:
+            search_term (str): Text typed by the user
+            queryset (QuerySet, optional): Users to search, all by default
+
+        Returns:
+            QuerySet: Matching users annotated with search_rank
+        """
+        queryset = User.objects.all() if queryset is None else queryset
+        term = search_term.strip().lower()
+        if not term:
+            return queryset.none()
+
+        grams = user_search_grams(term)
+        if grams:
+            candidates = UserSearchGram.objects.filter(
+                gram__in=grams
+            ).values('user_id').annotate(
+                hits=Count('gram')
+            ).filter(hits=len(grams)).values('user_id')
+            queryset = queryset.filter(id__in=candidates).filter(
+                Q(name__icontains=term) |
+                Q(email__icontains=term) |
+                Q(full_name__icontains=term)
+            )
+        else:
+            queryset = queryset.filter(
+                Q(name__istartswith=term) |
+                Q(email__istartswith=term) |
+                Q(full_name__istartswith=term)
+            )
+
+        return queryset.annotate(
+            search_rank=Case(
+                When(name__iexact=term, then=Value(4)),
+                When(name__istartswith=term, then=Value(3)),
+                When(full_name__istartswith=term, then=Value(2)),
+                When(email__istartswith=term, then=Value(1)),
+                default=Value(0),
+                output_field=models.IntegerField()
+            )
+        ).order_by('-search_rank', 'name', 'id')
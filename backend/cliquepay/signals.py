@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .autocomplete import get_autocomplete_index
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def index_saved_user(sender, instance, **kwargs):
+    get_autocomplete_index().update_user(instance)
+
+
+@receiver(post_delete, sender=User)
+def unindex_deleted_user(sender, instance, **kwargs):
+    get_autocomplete_index().remove_user(instance.id)
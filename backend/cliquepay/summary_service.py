@@ -0,0 +1,484 @@
+import threading
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from .cache_utils import TTLCache
+from .models import (
+    Conversation, DirectMessage, Group, GroupMember, GroupMessage, GroupReadReceipt, GroupSummary, UnreadCounter
+)
+
+MEMBERSHIP_KEY_PREFIX = 'cliquepay:group_members'
+
+
+class GroupMembershipCache:
+    """
+    group id -> (group name, member ids) cache for the membership check on
+    send.
+
+    Entries live in an in-process LRU. With a shared Django cache each
+    group's entries carry a version kept in the shared cache, and forget()
+    replaces it, so a membership change made in one process is seen by
+    every process on its next read. Without one, other processes only
+    catch up when their entries expire, so callers must confirm a cached
+    "member" answer against the database (see is_shared).
+    """
+
+    def __init__(self, maxsize=4096, ttl=30, shared=None):
+        self.ttl = ttl
+        self.shared = shared
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @property
+    def is_shared(self):
+        return self.shared is not None
+
+    def _version_key(self, group_id):
+        return f'{MEMBERSHIP_KEY_PREFIX}:version:{group_id}'
+
+    def get_version(self, group_id):
+        """
+        Current version of a group's entry. Read it before loading the
+        members and pass it to set(), so members loaded while the group was
+        changing are never cached as current.
+        """
+        if self.shared is not None:
+            return self.shared.get(self._version_key(group_id), '0')
+        return '0'
+
+    def get(self, group_id, version):
+        return self._local.get((group_id, version))
+
+    def set(self, group_id, entry, version):
+        self._local.set((group_id, version), entry)
+
+    def forget(self, group_id):
+        if self.shared is not None:
+            # Outlives the entries it guards, like the user cache versions
+            self.shared.set(self._version_key(group_id), uuid.uuid4().hex, timeout=self.ttl * 2)
+        else:
+            self._local.delete((group_id, '0'))
+
+
+_membership_cache = None
+_membership_cache_lock = threading.Lock()
+
+
+def get_membership_cache():
+    """
+    Return the process-wide group membership cache, building it on first
+    use. GROUP_MEMBERSHIP_CACHE_ALIAS names a Django cache that holds the
+    versions, without it the cache is process-local.
+    """
+    global _membership_cache
+    if _membership_cache is None:
+        with _membership_cache_lock:
+            if _membership_cache is None:
+                alias = getattr(settings, 'GROUP_MEMBERSHIP_CACHE_ALIAS', None)
+                _membership_cache = GroupMembershipCache(
+                    ttl=getattr(settings, 'GROUP_MEMBERSHIP_CACHE_TTL', 30),
+                    shared=caches[alias] if alias else None
+                )
+    return _membership_cache
+
+
+class GroupSummaryService:
+    """
+    Keeps the group_summaries and unread_counters tables in step with
+    group messages, memberships and read receipts.
+
+    Writes are single UPDATE statements keyed on the group, so sending a
+    message costs the same no matter how many members the group has, and
+    the groups sidebar reads everything with one joined query.
+    """
+
+    @staticmethod
+    def record_message(message):
+        """
+        Account for a newly sent group message.
+
+        Moves the group's last message forward, bumps the message count and
+        adds one unread message for every member except the sender, whose
+        counter is reset because sending moves their read receipt.
+
+        Args:
+            message (GroupMessage): The message that was just created
+        """
+        newer = Q(last_message_at__isnull=True) | Q(last_message_at__lte=message.created_at)
+        updated = GroupSummary.objects.filter(group_id=message.group_id).update(
+            last_message=Case(
+                When(newer, then=Value(str(message.id))),
+                default=F('last_message'),
+                output_field=models.CharField()
+            ),
+            last_message_at=Case(
+                When(newer, then=Value(message.created_at)),
+                default=F('last_message_at'),
+                output_field=models.DateTimeField()
+            ),
+            message_count=F('message_count') + 1
+        )
+        if not updated:
+            GroupSummaryService.rebuild(message.group_id)
+
+        UnreadCounter.objects.filter(group_id=message.group_id).update(
+            count=Case(
+                When(user_id=message.sender_id, then=Value(0)),
+                default=F('count') + 1
+            ),
+            last_read_at=Case(
+                When(user_id=message.sender_id, then=Value(message.created_at)),
+                default=F('last_read_at'),
+                output_field=models.DateTimeField()
+            )
+        )
+
+    @staticmethod
+    def mark_read(user_id, group_id, read_at):
+        """
+        Move the user's counter forward after their read receipt moved.
+
+        The messages from other members still unread after read_at are
+        counted inside the same UPDATE, which is a range scan of the
+        group's newest messages and nothing at all when the user read up
+        to the latest one. A counter that is already further ahead is
+        left alone.
+
+        Args:
+            user_id (str): Database ID of the user
+            group_id (str): ID of the group
+            read_at (datetime): Time of the message the user has read up to
+        Returns:
+            bool: Whether the counter moved
+        """
+        remaining = GroupMessage.objects.filter(
+            group_id=OuterRef('group_id'),
+            created_at__gt=read_at
+        ).exclude(
+            sender_id=OuterRef('user_id')
+        ).order_by().values('group_id').annotate(unread=Count('id')).values('unread')
+
+        return bool(UnreadCounter.objects.filter(
+            Q(last_read_at__isnull=True) | Q(last_read_at__lt=read_at),
+            user_id=user_id,
+            group_id=group_id
+        ).update(
+            count=Coalesce(Subquery(remaining), 0),
+            last_read_at=read_at
+        ))
+
+    @staticmethod
+    def advance_receipt(user_id, group_id, message):
+        """
+        Move the user's read receipt to message, unless it already points
+        at the same or a later message. Takes a single UPDATE, plus an
+        INSERT the first time the user reads the group.
+
+        Args:
+            user_id (str): Database ID of the user
+            group_id (str): ID of the group
+            message (GroupMessage): The message the user has read up to
+        Returns:
+            bool: Whether the receipt moved
+        """
+        behind = GroupReadReceipt.objects.filter(
+            Q(last_read_at__isnull=True) | Q(last_read_at__lt=message.created_at),
+            user_id=user_id,
+            group_id=group_id
+        )
+        if behind.update(last_read_message=message, last_read_at=message.created_at):
+            return True
+
+        try:
+            with transaction.atomic():
+                GroupReadReceipt.objects.create(
+                    user_id=user_id,
+                    group_id=group_id,
+                    last_read_message=message,
+                    last_read_at=message.created_at
+                )
+            return True
+        except IntegrityError:
+            # The receipt exists and is already at or past this message,
+            # or a concurrent request just created it
+            return bool(behind.update(last_read_message=message, last_read_at=message.created_at))
+
+    @staticmethod
+    def upsert_receipt(user_id, group_id, message):
+        """
+        Point the user's read receipt at message in a single statement
+        (INSERT ... ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE).
+        Only for messages known to be the newest the user has read, such
+        as one they just sent, use advance_receipt() otherwise.
+
+        Args:
+            user_id (str): Database ID of the user
+            group_id (str): ID of the group
+            message (GroupMessage): The message the user has read up to
+        """
+        options = {}
+        if connection.features.supports_update_conflicts_with_target:
+            options['unique_fields'] = ['user', 'group']
+        GroupReadReceipt.objects.bulk_create(
+            [GroupReadReceipt(
+                user_id=user_id,
+                group_id=group_id,
+                last_read_message=message,
+                last_read_at=message.created_at
+            )],
+            update_conflicts=True,
+            update_fields=['last_read_message', 'last_read_at'],
+            **options
+        )
+
+    @staticmethod
+    def get_member_group_name(user_id, group_id):
+        """
+        Name of the group if the user is a member of it, for the hot
+        membership check when sending a message.
+
+        The group's name and member ids are cached for
+        GROUP_MEMBERSHIP_CACHE_TTL seconds (default 30) and dropped by every
+        membership or group change made through this service. Unless the
+        cache is shared across processes, confirm a positive answer with
+        confirm_member() inside the write transaction.
+
+        Args:
+            user_id (str): Database ID of the user
+            group_id (str): ID of the group
+        Returns:
+            str: The group name, or None if the user is not a member
+        Raises:
+            Group.DoesNotExist: If the group does not exist
+        """
+        cache = get_membership_cache()
+        version = cache.get_version(group_id)
+        entry = cache.get(group_id, version)
+        if entry is None:
+            rows = list(GroupMember.objects.filter(group_id=group_id).values_list('user_id', 'group__name'))
+            if rows:
+                group_name = rows[0][1]
+            else:
+                group_name = Group.objects.values_list('name', flat=True).get(id=group_id)
+            entry = (group_name, frozenset(member_id for member_id, _ in rows))
+            cache.set(group_id, entry, version)
+        group_name, member_ids = entry
+        return group_name if user_id in member_ids else None
+
+    @staticmethod
+    def confirm_member(user_id, group_id):
+        """
+        Confirm a cached membership answer from get_member_group_name()
+        inside the transaction that depends on it.
+
+        A shared membership cache already sees every change, so this only
+        queries the database when the cache is process-local and may not
+        have seen a removal made by another worker.
+
+        Args:
+            user_id (str): Database ID of the user
+            group_id (str): ID of the group
+        Returns:
+            bool: True if the user is still a member
+        """
+        if get_membership_cache().is_shared:
+            return True
+        return GroupMember.objects.filter(user_id=user_id, group_id=group_id).exists()
+
+    @staticmethod
+    def forget_group(group_id):
+        """
+        Drop the cached membership of a group after its members or details
+        changed. Dropped again on commit, so a read racing the change can't
+        cache the old state.
+
+        Args:
+            group_id (str): ID of the group
+        """
+        cache = get_membership_cache()
+        cache.forget(group_id)
+        transaction.on_commit(lambda: cache.forget(group_id))
+
+    @staticmethod
+    def add_member(user_id, group_id):
+        """
+        Account for a user joining a group.
+
+        Args:
+            user_id (str): Database ID of the new member
+            group_id (str): ID of the group
+        """
+        GroupSummaryService.forget_group(group_id)
+        updated = GroupSummary.objects.filter(group_id=group_id).update(member_count=F('member_count') + 1)
+        if not updated:
+            GroupSummaryService.rebuild(group_id)
+
+        UnreadCounter.objects.update_or_create(
+            user_id=user_id,
+            group_id=group_id,
+            defaults={
+                'count': GroupSummaryService.count_unread(user_id, group_id),
+                'last_read_at': GroupReadReceipt.objects.filter(user_id=user_id, group_id=group_id)
+                    .values_list('last_read_at', flat=True).first()
+            }
+        )
+
+    @staticmethod
+    def remove_member(user_id, group_id):
+        """
+        Account for a user leaving or being removed from a group.
+
+        Args:
+            user_id (str): Database ID of the former member
+            group_id (str): ID of the group
+        """
+        GroupSummaryService.forget_group(group_id)
+        updated = GroupSummary.objects.filter(group_id=group_id, member_count__gt=0) \
+            .update(member_count=F('member_count') - 1)
+        if not updated:
+            GroupSummaryService.rebuild(group_id)
+
+        UnreadCounter.objects.filter(user_id=user_id, group_id=group_id).delete()
+
+    @staticmethod
+    def count_unread(user_id, group_id):
+        """
+        Count the user's unread messages in a group from scratch.
+        Only used when a counter is first created, the hot paths keep it
+        up to date incrementally.
+
+        Args:
+            user_id (str): Database ID of the user
+            group_id (str): ID of the group
+        Returns:
+            int: Messages from other members newer than the user's read receipt
+        """
+        unread = GroupMessage.objects.filter(group_id=group_id).exclude(sender_id=user_id)
+        last_read_at = GroupReadReceipt.objects.filter(user_id=user_id, group_id=group_id) \
+            .values_list('last_read_at', flat=True).first()
+        if last_read_at:
+            unread = unread.filter(created_at__gt=last_read_at)
+        return unread.count()
+
+    @staticmethod
+    def rebuild(group_id):
+        """
+        Recompute a group's summary row from the messages and members tables.
+
+        Args:
+            group_id (str): ID of the group
+        Returns:
+            GroupSummary: The refreshed summary
+        """
+        messages = GroupMessage.objects.filter(group_id=group_id)
+        last_message = messages.order_by('-created_at', '-id').first()
+        summary, _ = GroupSummary.objects.update_or_create(
+            group_id=group_id,
+            defaults={
+                'last_message': last_message,
+                'last_message_at': last_message.created_at if last_message else None,
+                'message_count': messages.count(),
+                'member_count': GroupMember.objects.filter(group_id=group_id).count()
+            }
+        )
+        return summary
+
+
+class ConversationService:
+    """
+    Keeps the conversations table in step with direct messages, one row
+    per pair of users holding the latest message and each side's unread
+    count.
+    """
+
+    @staticmethod
+    def _pair(user_a, user_b):
+        return (user_a, user_b) if user_a < user_b else (user_b, user_a)
+
+    @staticmethod
+    def record_message(message):
+        """
+        Account for a newly sent direct message: move the conversation's
+        last message forward and add one unread message for the recipient.
+
+        Args:
+            message (DirectMessage): The message that was just created
+        """
+        user1_id, user2_id = ConversationService._pair(message.sender_id, message.recipient_id)
+        unread_field = 'user1_unread' if message.recipient_id == user1_id else 'user2_unread'
+        newer = Q(last_message_at__isnull=True) | Q(last_message_at__lte=message.created_at)
+        conversation = Conversation.objects.filter(user1_id=user1_id, user2_id=user2_id)
+        changes = dict(
+            last_message=Case(
+                When(newer, then=Value(str(message.id))),
+                default=F('last_message'),
+                output_field=models.CharField()
+            ),
+            last_message_at=Case(
+                When(newer, then=Value(message.created_at)),
+                default=F('last_message_at'),
+                output_field=models.DateTimeField()
+            ),
+            **{unread_field: F(unread_field) + 1}
+        )
+        if not conversation.update(**changes):
+            # First message between the pair: insert an empty row, or keep
+            # the one a concurrent first message just inserted, and apply
+            # this message to it like to any other
+            Conversation.objects.bulk_create(
+                [Conversation(user1_id=user1_id, user2_id=user2_id)],
+                ignore_conflicts=True
+            )
+            conversation.update(**changes)
+
+    @staticmethod
+    def mark_read(user_id, peer_id):
+        """
+        Recount the user's side of a conversation after messages from the
+        peer were marked read, in the same UPDATE.
+
+        Args:
+            user_id (str): Database ID of the user who read the messages
+            peer_id (str): Database ID of the other user
+        """
+        user1_id, user2_id = ConversationService._pair(user_id, peer_id)
+        unread_field = 'user1_unread' if user_id == user1_id else 'user2_unread'
+        remaining = DirectMessage.objects.filter(
+            recipient_id=user_id,
+            sender_id=peer_id,
+            is_read=False
+        ).order_by().values('recipient_id').annotate(unread=Count('id')).values('unread')
+        Conversation.objects.filter(user1_id=user1_id, user2_id=user2_id).update(
+            **{unread_field: Coalesce(Subquery(remaining), 0)}
+        )
+
+    @staticmethod
+    def rebuild(user_a, user_b):
+        """
+        Recompute a conversation row from the direct messages table.
+
+        Args:
+            user_a (str): Database ID of one user
+            user_b (str): Database ID of the other user
+        Returns:
+            Conversation: The refreshed conversation
+        """
+        user1_id, user2_id = ConversationService._pair(user_a, user_b)
+        messages = DirectMessage.objects.filter(
+            Q(sender_id=user1_id, recipient_id=user2_id) |
+            Q(sender_id=user2_id, recipient_id=user1_id)
+        )
+        last_message = messages.order_by('-created_at', '-id').first()
+        conversation, _ = Conversation.objects.update_or_create(
+            user1_id=user1_id,
+            user2_id=user2_id,
+            defaults={
+                'last_message': last_message,
+                'last_message_at': last_message.created_at if last_message else None,
+                'user1_unread': messages.filter(recipient_id=user1_id, is_read=False).count(),
+                'user2_unread': messages.filter(recipient_id=user2_id, is_read=False).count()
+            }
+        )
+        return conversation
@@ -0,0 +1,88 @@
+import time
+from unittest import mock
+import jwt
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, override_settings
+from cliquepay import aws_cognito
+from cliquepay.aws_cognito import LOCAL_AUTH_CACHE_MAX_TTL, AuthCache, CognitoService
+
+
+def make_access_token(sub='user-sub', session='a'):
+    # Only the unverified claims are read, Cognito checks the signature
+    claims = {'sub': sub, 'exp': int(time.time()) + 3600, 'jti': session}
+    return jwt.encode(claims, 'not-a-real-key-but-long-enough-for-hs256', algorithm='HS256')
+
+
+def auth_result(sub='user-sub'):
+    return {'status': 'SUCCESS', 'user_sub': sub, 'username': 'name', 'is_confirmed': True}
+
+
+class AuthCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.shared = LocMemCache('auth-cache-tests', {})
+        self.shared.clear()
+
+    def cache_result(self, cache, token, sub='user-sub'):
+        cache.set(token, auth_result(sub), cache.get_version(sub), ttl=3600)
+
+    def test_logout_drops_every_session_of_the_user(self):
+        cache = AuthCache(ttl=60)
+        first, second, other = make_access_token(session='a'), make_access_token(session='b'), make_access_token('other')
+        for token in (first, second):
+            self.cache_result(cache, token)
+        self.cache_result(cache, other, 'other')
+
+        cache.invalidate(first)
+        self.assertIsNone(cache.get(first))
+        self.assertIsNone(cache.get(second))
+        self.assertEqual(cache.get(other)['user_sub'], 'other')
+
+    def test_shared_cache_reaches_other_workers(self):
+        worker_a = AuthCache(ttl=60, shared=self.shared)
+        worker_b = AuthCache(ttl=60, shared=self.shared)
+        token = make_access_token()
+        self.cache_result(worker_a, token)
+        self.cache_result(worker_b, token)
+
+        worker_a.invalidate(token)
+        self.assertIsNone(worker_b.get(token))
+
+    def test_result_fetched_during_logout_is_not_served(self):
+        cache = AuthCache(ttl=60, shared=self.shared)
+        token = make_access_token()
+        version = cache.get_version('user-sub')
+        cache.invalidate(token)
+        cache.set(token, auth_result(), version, ttl=3600)
+        self.assertIsNone(cache.get(token))
+
+    def test_local_cache_caps_the_ttl(self):
+        self.assertEqual(AuthCache(ttl=300).ttl, LOCAL_AUTH_CACHE_MAX_TTL)
+        self.assertEqual(AuthCache(ttl=300, shared=self.shared).ttl, 300)
+
+
+@override_settings(COGNITO_APP_CLIENT_ID='client', COGNITO_APP_CLIENT_SECRET='secret')
+class CheckUserAuthTests(SimpleTestCase):
+    def setUp(self):
+        self.client_mock = mock.Mock()
+        self.client_mock.get_user.return_value = {
+            'Username': 'name',
+            'UserAttributes': [{'Name': 'sub', 'Value': 'user-sub'}]
+        }
+        for target, value in (
+            ('get_cognito_client', mock.Mock(return_value=self.client_mock)),
+            ('_auth_cache', AuthCache(ttl=60, shared=LocMemCache('check-user-auth-tests', {}))),
+        ):
+            patcher = mock.patch.object(aws_cognito, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_results_are_cached_until_logout(self):
+        token = make_access_token()
+        service = CognitoService()
+        self.assertEqual(service.check_user_auth(token)['user_sub'], 'user-sub')
+        self.assertEqual(service.check_user_auth(token)['user_sub'], 'user-sub')
+        self.assertEqual(self.client_mock.get_user.call_count, 1)
+
+        self.assertEqual(service.logout_user(make_access_token(session='other'))['status'], 'SUCCESS')
+        service.check_user_auth(token)
+        self.assertEqual(self.client_mock.get_user.call_count, 2)
@@ -0,0 +1,69 @@
+from unittest import mock
+from django.test import TestCase
+from cliquepay import autocomplete
+from cliquepay.autocomplete import IndexedUser, PrefixIndex
+from cliquepay.models import User
+
+
+class PrefixIndexTests(TestCase):
+    def setUp(self):
+        # Keep the User signals away from the process-wide index, which
+        # would start a background build
+        patcher = mock.patch.object(autocomplete, '_index', PrefixIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.alice = User.objects.create(
+            id='u1', cognito_id='c1', name='alice', email='alice@x.com',
+            full_name='Alice Wonder', avatar_url='https://x/alice.png'
+        )
+        self.bob = User.objects.create(
+            id='u2', cognito_id='c2', name='bob', email='bob@x.com', full_name='Bob Alison'
+        )
+        self.index = PrefixIndex()
+        # Build in the test's thread and transaction instead of a background thread
+        self.index._building = True
+        with mock.patch.object(autocomplete.connection, 'close'):
+            self.index._build()
+
+    def test_results_carry_what_search_shows(self):
+        self.assertEqual(
+            self.index.search('won'),
+            [IndexedUser('u1', 'alice', 'Alice Wonder', 'https://x/alice.png')]
+        )
+
+    def test_usernames_come_first(self):
+        self.assertEqual([user.id for user in self.index.search('ali')], ['u1', 'u2'])
+
+    def test_exclude(self):
+        self.assertEqual([user.id for user in self.index.search('ali', exclude='u1')], ['u2'])
+
+    def test_search_does_not_query_the_database(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.index.search('a')), 2)
+
+    def test_updates_and_removals(self):
+        self.alice.full_name = 'Alice Carroll'
+        self.alice.avatar_url = 'https://x/new.png'
+        self.index.update_user(self.alice)
+        self.assertEqual(self.index.search('won'), [])
+        self.assertEqual(self.index.search('carr')[0].avatar_url, 'https://x/new.png')
+
+        self.index.remove_user('u1')
+        self.assertEqual([user.id for user in self.index.search('ali')], ['u2'])
+
+    def test_changes_during_a_build_are_replayed(self):
+        index = PrefixIndex()
+        index._building = True
+        index.update_user(User(id='u3', name='carol', full_name='Carol', avatar_url=''))
+        index.remove_user('u2')
+        with mock.patch.object(autocomplete.connection, 'close'):
+            index._build()
+        self.assertEqual([user.id for user in index.search('carol')], ['u3'])
+        self.assertEqual(index.search('bob'), [])
+
+    def test_unbuilt_index_starts_a_build_and_returns_nothing(self):
+        index = PrefixIndex()
+        with mock.patch.object(index, '_start_build') as start_build:
+            self.assertEqual(index.search('ali'), [])
+        start_build.assert_called_once_with()
@@ -0,0 +1,232 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from api import views
+from api.serializers import ExpenseCreateSerializer
+from cliquepay import autocomplete
+from cliquepay.ledger_service import BalanceLedger, SettlementEngine
+from cliquepay.models import Balance, Expense, ExpenseSplit, Group, GroupMember, User
+
+
+def ledger_balances():
+    """
+    Non-zero balances as stored in the ledger.
+    """
+    return {
+        (debtor_id, creditor_id, group_id): amount
+        for debtor_id, creditor_id, group_id, amount in Balance.objects.values_list(
+            'debtor_id', 'creditor_id', 'group_id', 'amount'
+        )
+        if amount
+    }
+
+
+def recomputed_balances():
+    """
+    Non-zero balances added up from the unpaid splits, the way the
+    summaries worked before the ledger existed.
+    """
+    totals = defaultdict(Decimal)
+    for split in ExpenseSplit.objects.select_related('expense').filter(is_paid=False):
+        if split.user_id != split.expense.paid_by_id:
+            totals[(split.user_id, split.expense.paid_by_id, split.expense.group_id)] += split.remaining_amount
+    return {key: amount for key, amount in totals.items() if amount}
+
+
+class LedgerTestCase(TestCase):
+    def setUp(self):
+        # Keep the User signals from starting a background index build
+        patcher = mock.patch.object(autocomplete, '_index', autocomplete.PrefixIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.users = [
+            User.objects.create(
+                id=f'u{i}', cognito_id=f'c{i}', name=f'user{i}', email=f'user{i}@x.com', full_name=f'User {i}'
+            )
+            for i in range(4)
+        ]
+        self.group = Group.objects.create(name='Trip', created_by=self.users[0], description='')
+        for user in self.users:
+            GroupMember.objects.create(group=self.group, user=user)
+        self.factory = APIRequestFactory()
+
+    def create_expense(self, paid_by, total_amount, group=None, friend=None):
+        data = {'paid_by': paid_by.id, 'total_amount': total_amount, 'description': 'expense'}
+        if group:
+            data['group_id'] = group.id
+        else:
+            data['friend_id'] = friend.id
+        serializer = ExpenseCreateSerializer(data=data)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer.save()
+
+    def assertLedgerMatchesSplits(self):
+        self.assertEqual(ledger_balances(), recomputed_balances())
+
+
+class BalanceLedgerTests(LedgerTestCase):
+    def test_create_update_and_delete_keep_the_ledger_in_step(self):
+        group_expense = self.create_expense(self.users[0], '100.00', group=self.group)
+        friend_expense = self.create_expense(self.users[1], '30.00', friend=self.users[0])
+        self.assertLedgerMatchesSplits()
+        self.assertEqual(ledger_balances()[('u1', 'u0', str(self.group.id))], Decimal('25.00'))
+        self.assertEqual(ledger_balances()[('u0', 'u1', None)], Decimal('15.00'))
+
+        request = self.factory.patch(
+            '/api/update-expense/', {'expense_id': group_expense.id, 'total_amount': '200.00'}, format='json'
+        )
+        force_authenticate(request, user=self.users[0])
+        self.assertEqual(views.update_expense(request).status_code, 200)
+        self.assertLedgerMatchesSplits()
+        self.assertEqual(ledger_balances()[('u1', 'u0', str(self.group.id))], Decimal('50.00'))
+
+        request = self.factory.delete('/api/delete-expense/', {'expense_id': friend_expense.id}, format='json')
+        force_authenticate(request, user=self.users[1])
+        self.assertEqual(views.delete_expense(request).status_code, 200)
+        self.assertLedgerMatchesSplits()
+        self.assertNotIn(('u0', 'u1', None), ledger_balances())
+
+    def test_totals_and_creditors(self):
+        self.create_expense(self.users[0], '100.00', group=self.group)
+        self.create_expense(self.users[1], '30.00', friend=self.users[0])
+
+        self.assertEqual(BalanceLedger.get_totals('u0'), (Decimal('15.00'), Decimal('75.00')))
+        creditors = BalanceLedger.get_creditors('u1')
+        self.assertEqual([(row['creditor_id'], row['total']) for row in creditors], [('u0', Decimal('25.00'))])
+
+    def test_apply_retries_when_a_concurrent_insert_wins(self):
+        key = ('u2', 'u3', None)
+        apply_deltas = BalanceLedger._apply
+        calls = []
+
+        def racing_apply(deltas):
+            calls.append(deltas)
+            if len(calls) == 1:
+                # Another transaction creates the row after this one looked
+                # for it, so the bulk create collides with unique_balance
+                Balance.objects.create(debtor_id='u2', creditor_id='u3', group=None, amount=Decimal('4.00'))
+                with mock.patch.object(Balance.objects, 'select_for_update', return_value=Balance.objects.none()):
+                    return apply_deltas(deltas)
+            return apply_deltas(deltas)
+
+        with mock.patch.object(BalanceLedger, '_apply', side_effect=racing_apply):
+            with transaction.atomic():
+                BalanceLedger.apply({key: Decimal('6.00')})
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(ledger_balances(), {key: Decimal('10.00')})
+
+    def test_friend_balances_are_unique(self):
+        Balance.objects.create(debtor_id='u0', creditor_id='u1', group=None, amount=Decimal('1.00'))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Balance.objects.create(debtor_id='u0', creditor_id='u1', group=None, amount=Decimal('1.00'))
+
+
+class SettlementEngineTests(LedgerTestCase):
+    def setUp(self):
+        super().setUp()
+        # u1 owes u0 10.00 on each of three friend expenses, oldest first
+        now = timezone.now()
+        self.expenses = []
+        for days_ago in (3, 2, 1):
+            expense = self.create_expense(self.users[0], '20.00', friend=self.users[1])
+            ExpenseSplit.objects.filter(expense=expense).update(created_at=now - timedelta(days=days_ago))
+            self.expenses.append(expense)
+
+    def unpaid(self, expense):
+        return ExpenseSplit.objects.get(expense=expense, user_id='u1').remaining_amount
+
+    def test_partial_payment_pays_the_oldest_splits_first(self):
+        result = SettlementEngine.settle('u1', Decimal('15.00'), creditor_id='u0')
+
+        self.assertEqual(result['status'], 'SUCCESS')
+        self.assertEqual(result['amount_settled'], Decimal('15.00'))
+        self.assertEqual(result['remaining_amount'], Decimal('0.00'))
+        self.assertEqual(
+            [(split['expense_id'], split['amount_paid'], split['is_fully_paid']) for split in result['settled_splits']],
+            [(self.expenses[0].id, Decimal('10.00'), True), (self.expenses[1].id, Decimal('5.00'), False)]
+        )
+        self.assertEqual(
+            [self.unpaid(expense) for expense in self.expenses],
+            [Decimal('0.00'), Decimal('5.00'), Decimal('10.00')]
+        )
+        self.assertEqual(
+            [Expense.objects.get(id=expense.id).remaining_amount for expense in self.expenses],
+            [Decimal('0.00'), Decimal('5.00'), Decimal('10.00')]
+        )
+        self.assertLedgerMatchesSplits()
+
+    def test_overpayment_reports_what_is_left(self):
+        result = SettlementEngine.settle('u1', Decimal('50.00'))
+        self.assertEqual(result['amount_settled'], Decimal('30.00'))
+        self.assertEqual(result['remaining_amount'], Decimal('20.00'))
+        self.assertLedgerMatchesSplits()
+
+    def test_settle_all(self):
+        group_expense = self.create_expense(self.users[0], '100.00', group=self.group)
+
+        result = SettlementEngine.settle('u1', creditor_id='u0')
+        self.assertEqual(result['amount_settled'], Decimal('55.00'))
+        self.assertTrue(all(split['is_fully_paid'] for split in result['settled_splits']))
+        self.assertFalse(ExpenseSplit.objects.filter(user_id='u1', is_paid=False).exists())
+        self.assertEqual(Expense.objects.get(id=group_expense.id).remaining_amount, Decimal('50.00'))
+        self.assertEqual(BalanceLedger.get_totals('u1'), (Decimal('0.00'), Decimal('0')))
+        self.assertLedgerMatchesSplits()
+
+    def test_settle_all_within_a_group(self):
+        self.create_expense(self.users[0], '100.00', group=self.group)
+
+        result = SettlementEngine.settle('u1', group_id=self.group.id)
+        self.assertEqual(result['amount_settled'], Decimal('25.00'))
+        self.assertEqual([self.unpaid(expense) for expense in self.expenses], [Decimal('10.00')] * 3)
+        self.assertLedgerMatchesSplits()
+
+    def test_nothing_to_settle(self):
+        result = SettlementEngine.settle('u0', Decimal('10.00'))
+        self.assertEqual(result, {'status': 'ERROR', 'message': 'No splits found to settle'})
+
+
+class MergeFriendBalancesMigrationTests(TransactionTestCase):
+    before = [('cliquepay', '0011_conversation')]
+    after = [('cliquepay', '0012_balance_null_group_unique')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicate_friend_balances_are_merged(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        User = apps.get_model('cliquepay', 'User')
+        Group = apps.get_model('cliquepay', 'Group')
+        Balance = apps.get_model('cliquepay', 'Balance')
+
+        for i in range(3):
+            User.objects.create(id=f'u{i}', cognito_id=f'c{i}', name=f'user{i}', email=f'user{i}@x.com')
+        group = Group.objects.create(id='g', name='Trip', created_by_id='u0', description='')
+        for amount in ('1.00', '2.00', '3.50'):
+            Balance.objects.create(debtor_id='u0', creditor_id='u1', group=None, amount=Decimal(amount))
+        Balance.objects.create(debtor_id='u0', creditor_id='u2', group=None, amount=Decimal('4.00'))
+        Balance.objects.create(debtor_id='u0', creditor_id='u1', group=group, amount=Decimal('5.00'))
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        Balance = executor.loader.project_state(self.after).apps.get_model('cliquepay', 'Balance')
+
+        self.assertEqual(
+            list(Balance.objects.order_by('creditor_id', 'amount').values_list(
+                'debtor_id', 'creditor_id', 'group_id', 'amount'
+            )),
+            [
+                ('u0', 'u1', 'g', Decimal('5.00')),
+                ('u0', 'u1', None, Decimal('6.50')),
+                ('u0', 'u2', None, Decimal('4.00')),
+            ]
+        )
@@ -0,0 +1,152 @@
+import asyncio
+import json
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from cliquepay import realtime
+
+
+class WebSocketClient:
+    """
+    Drives websocket_application the way an ASGI server would.
+    """
+
+    def __init__(self, path=realtime.WEBSOCKET_PATH, query_string=b''):
+        self.scope = {'type': 'websocket', 'path': path, 'query_string': query_string}
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+        self.task = None
+
+    async def connect(self):
+        self.task = asyncio.ensure_future(
+            realtime.websocket_application(self.scope, self.incoming.get, self.outgoing.put)
+        )
+        await self.incoming.put({'type': 'websocket.connect'})
+        return await self.receive()
+
+    async def send_json(self, data):
+        await self.incoming.put({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def receive(self):
+        return await asyncio.wait_for(self.outgoing.get(), timeout=1)
+
+    async def receive_json(self):
+        message = await self.receive()
+        self.assert_type(message, 'websocket.send')
+        return json.loads(message['text'])
+
+    async def authenticate(self, id_token='token'):
+        await self.send_json({'type': 'auth', 'id_token': id_token})
+        return await self.receive()
+
+    async def disconnect(self):
+        await self.incoming.put({'type': 'websocket.disconnect'})
+        await asyncio.wait_for(self.task, timeout=1)
+
+    @staticmethod
+    def assert_type(message, message_type):
+        if message['type'] != message_type:
+            raise AssertionError(f'expected {message_type}, got {message}')
+
+
+class RealtimeTestCase(SimpleTestCase):
+    def setUp(self):
+        self.backend = realtime.InMemoryPubSub()
+        patcher = mock.patch.object(realtime, '_backend', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.channels = [realtime.user_channel('u1'), realtime.group_channel('g1')]
+        patcher = mock.patch.object(
+            realtime, 'resolve_channels',
+            side_effect=lambda id_token: list(self.channels) if id_token == 'token' else []
+        )
+        self.resolve_channels = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def connect(self):
+        client = WebSocketClient()
+        self.assertEqual((await client.connect())['type'], 'websocket.accept')
+        self.assertEqual(json.loads((await client.authenticate())['text']), {'type': 'authenticated'})
+        return client
+
+
+class WebSocketAuthTests(RealtimeTestCase):
+    async def test_unknown_path_is_rejected(self):
+        client = WebSocketClient(path='/ws/other/')
+        self.assertEqual(await client.connect(), {'type': 'websocket.close', 'code': 4404})
+
+    async def test_token_comes_from_first_message(self):
+        client = await self.connect()
+        self.resolve_channels.assert_called_once_with('token')
+        await client.disconnect()
+
+    async def test_invalid_token_is_rejected(self):
+        client = WebSocketClient()
+        await client.connect()
+        self.assertEqual(await client.authenticate('bad'), {'type': 'websocket.close', 'code': 4401})
+
+    async def test_query_string_token_is_ignored(self):
+        client = WebSocketClient(query_string=b'id_token=token')
+        await client.connect()
+        await client.send_json({'type': 'hello'})
+        self.assertEqual(await client.receive(), {'type': 'websocket.close', 'code': 4401})
+        self.resolve_channels.assert_called_once_with(None)
+
+    async def test_malformed_first_message_is_rejected(self):
+        client = WebSocketClient()
+        await client.connect()
+        await client.incoming.put({'type': 'websocket.receive', 'text': 'not json'})
+        self.assertEqual(await client.receive(), {'type': 'websocket.close', 'code': 4401})
+
+    @override_settings(REALTIME_AUTH_TIMEOUT=0.01)
+    async def test_connection_without_auth_times_out(self):
+        client = WebSocketClient()
+        await client.connect()
+        self.assertEqual(await client.receive(), {'type': 'websocket.close', 'code': 4401})
+
+
+class WebSocketDeliveryTests(RealtimeTestCase):
+    async def test_events_are_delivered_on_subscribed_channels(self):
+        client = await self.connect()
+        self.backend.publish(realtime.group_channel('g1'), {'type': 'group_message', 'message': {'id': 1}})
+        self.backend.publish(realtime.group_channel('g2'), {'type': 'group_message', 'message': {'id': 2}})
+        self.backend.publish(realtime.user_channel('u1'), {'type': 'direct_message', 'message': {'id': 3}})
+
+        self.assertEqual((await client.receive_json())['message'], {'id': 1})
+        self.assertEqual((await client.receive_json())['message'], {'id': 3})
+        await client.disconnect()
+
+    async def test_leaving_a_group_stops_its_events(self):
+        client = await self.connect()
+        self.backend.publish(realtime.user_channel('u1'), {'type': 'group_left', 'group_id': 'g1'})
+        self.backend.publish(realtime.group_channel('g1'), {'type': 'group_message', 'message': {'id': 1}})
+        self.backend.publish(realtime.user_channel('u1'), {'type': 'direct_message', 'message': {'id': 2}})
+
+        self.assertEqual(await client.receive_json(), {'type': 'group_left', 'group_id': 'g1'})
+        self.assertEqual((await client.receive_json())['message'], {'id': 2})
+        await client.disconnect()
+
+    async def test_joining_a_group_starts_its_events(self):
+        client = await self.connect()
+        self.backend.publish(realtime.user_channel('u1'), {'type': 'group_joined', 'group_id': 'g2'})
+        self.backend.publish(realtime.group_channel('g2'), {'type': 'group_message', 'message': {'id': 1}})
+
+        self.assertEqual(await client.receive_json(), {'type': 'group_joined', 'group_id': 'g2'})
+        self.assertEqual((await client.receive_json())['message'], {'id': 1})
+        await client.disconnect()
+
+    async def test_disconnect_unsubscribes(self):
+        client = await self.connect()
+        await client.disconnect()
+        self.assertEqual(dict(self.backend._subscribers), {})
+
+    async def test_membership_helpers_publish_to_the_user_channel(self):
+        subscription = self.backend.subscribe([realtime.user_channel('u1')])
+        with mock.patch.object(realtime.transaction, 'on_commit', side_effect=lambda send: send()):
+            realtime.join_group('u1', 'g2')
+            realtime.leave_group('u1', 'g2')
+
+        self.assertEqual(await subscription.get(), {'type': 'group_joined', 'group_id': 'g2'})
+        self.assertEqual(await subscription.get(), {'type': 'group_left', 'group_id': 'g2'})
+        self.assertEqual(subscription.channels, [realtime.user_channel('u1')])
+        subscription.close()
@@ -0,0 +1,46 @@
+from unittest import mock
+from django.test import TestCase
+from cliquepay import autocomplete
+from cliquepay.models import User, UserSearchGram
+from cliquepay.search_index import UserSearchIndex, user_search_grams
+
+
+class UserSearchGramTests(TestCase):
+    def setUp(self):
+        # Keep the User signals from starting a background index build
+        patcher = mock.patch.object(autocomplete, '_index', autocomplete.PrefixIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_grams_ignore_case_and_accents(self):
+        self.assertEqual(user_search_grams('JOSÉ'), {'jos', 'ose'})
+        self.assertEqual(user_search_grams('José', 'jose@x.com'), user_search_grams('jose', 'jose@x.com'))
+
+    def test_accented_name_and_plain_email_index_once(self):
+        user = User.objects.create(
+            id='u1', cognito_id='c1', name='jose', email='jose@x.com', full_name='José Núñez'
+        )
+        UserSearchIndex.index_user(user)
+
+        grams = list(UserSearchGram.objects.filter(user=user).values_list('gram', flat=True))
+        self.assertEqual(sorted(grams), sorted(user_search_grams(user.name, user.email, user.full_name)))
+        self.assertIn('ose', grams)
+        self.assertNotIn('osé', grams)
+
+    def test_reindexing_keeps_grams_in_line(self):
+        user = User.objects.create(id='u1', cognito_id='c1', name='ana', email='ana@x.com', full_name='Ana')
+        UserSearchIndex.index_user(user)
+        user.full_name = 'Anaïs Émile'
+        UserSearchIndex.index_user(user)
+
+        grams = set(UserSearchGram.objects.filter(user=user).values_list('gram', flat=True))
+        self.assertEqual(grams, user_search_grams(user.name, user.email, user.full_name))
+
+    def test_rebuild(self):
+        User.objects.create(id='u1', cognito_id='c1', name='zoë', email='zoe@x.com', full_name='Zoë')
+        self.assertEqual(UserSearchIndex.rebuild(), 1)
+        self.assertEqual(
+            set(UserSearchGram.objects.values_list('gram', flat=True)),
+            user_search_grams('zoë', 'zoe@x.com', 'Zoë')
+        )
+        self.assertEqual(list(UserSearchIndex.search('zoe@').values_list('id', flat=True)), ['u1'])
@@ -0,0 +1,179 @@
+import threading
+import time
+from unittest import mock
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.test import SimpleTestCase, override_settings
+from cliquepay import token_verifier
+from cliquepay.token_verifier import StaticJWKSSource, TokenVerifier
+
+ISSUER = 'https://cognito-idp.us-east-1.amazonaws.com/us-east-1_test'
+AUDIENCE = 'test-client'
+
+
+def generate_key(kid):
+    """
+    Generate an RSA key pair and the JWK Cognito would publish for it.
+    """
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    jwk.update({'kid': kid, 'alg': 'RS256', 'use': 'sig'})
+    return private_key, jwk
+
+
+class CountingJWKSSource(StaticJWKSSource):
+    def __init__(self, jwks):
+        super().__init__(jwks)
+        self.fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        return super().fetch()
+
+
+class TokenVerifierTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.private_key, cls.jwk = generate_key('key-1')
+
+    def setUp(self):
+        self.source = CountingJWKSSource({'keys': [self.jwk]})
+        self.verifier = TokenVerifier(self.source, issuer=ISSUER, audience=AUDIENCE)
+
+    def make_token(self, private_key=None, kid='key-1', **overrides):
+        now = int(time.time())
+        claims = {
+            'sub': 'user-sub',
+            'aud': AUDIENCE,
+            'iss': ISSUER,
+            'token_use': 'id',
+            'iat': now,
+            'exp': now + 3600,
+        }
+        claims.update(overrides)
+        return jwt.encode(claims, private_key or self.private_key, algorithm='RS256', headers={'kid': kid})
+
+    def test_valid_token(self):
+        claims = self.verifier.verify(self.make_token())
+        self.assertEqual(claims['sub'], 'user-sub')
+
+    def test_verified_token_is_cached(self):
+        token = self.make_token()
+        self.verifier.verify(token)
+        with mock.patch.object(jwt, 'decode') as decode:
+            self.assertEqual(self.verifier.verify(token)['sub'], 'user-sub')
+        decode.assert_not_called()
+
+    def test_wrong_audience(self):
+        with self.assertRaises(jwt.InvalidAudienceError):
+            self.verifier.verify(self.make_token(aud='other-client'))
+
+    def test_wrong_issuer(self):
+        with self.assertRaises(jwt.InvalidIssuerError):
+            self.verifier.verify(self.make_token(iss='https://cognito-idp.us-east-1.amazonaws.com/other'))
+
+    def test_expired_token(self):
+        now = int(time.time())
+        with self.assertRaises(jwt.ExpiredSignatureError):
+            self.verifier.verify(self.make_token(iat=now - 7200, exp=now - 3600))
+
+    def test_access_token_is_rejected(self):
+        with self.assertRaisesMessage(jwt.InvalidTokenError, 'Token is not an ID token'):
+            self.verifier.verify(self.make_token(token_use='access'))
+
+    def test_token_signed_by_another_key(self):
+        other_key, _ = generate_key('key-1')
+        with self.assertRaises(jwt.InvalidSignatureError):
+            self.verifier.verify(self.make_token(private_key=other_key))
+
+    def test_unknown_kid_refreshes_keys(self):
+        self.verifier.verify(self.make_token())
+        self.assertEqual(self.source.fetches, 1)
+
+        # The user pool rotates to a new key
+        new_key, new_jwk = generate_key('key-2')
+        self.source.jwks = {'keys': [self.jwk, new_jwk]}
+        self.verifier.min_refresh_interval = 0
+
+        claims = self.verifier.verify(self.make_token(private_key=new_key, kid='key-2'))
+        self.assertEqual(claims['sub'], 'user-sub')
+        self.assertEqual(self.source.fetches, 2)
+
+    def test_unknown_kid_refreshes_are_rate_limited(self):
+        self.verifier.verify(self.make_token())
+        for _ in range(3):
+            with self.assertRaisesMessage(jwt.InvalidTokenError, 'Token signed with an unknown key'):
+                self.verifier.verify(self.make_token(kid='missing'))
+        self.assertEqual(self.source.fetches, 1)
+
+    def test_cached_tokens_do_not_wait_for_key_fetch(self):
+        token = self.make_token()
+        self.verifier.verify(token)
+
+        fetch_started = threading.Event()
+        release_fetch = threading.Event()
+
+        def slow_fetch():
+            fetch_started.set()
+            release_fetch.wait(5)
+            return {'keys': [self.jwk]}
+
+        def verify_unknown_kid():
+            try:
+                self.verifier.verify(self.make_token(kid='missing'))
+            except jwt.InvalidTokenError:
+                pass
+
+        self.source.fetch = slow_fetch
+        self.verifier.min_refresh_interval = 0
+        refresh = threading.Thread(target=verify_unknown_kid)
+        refresh.start()
+        try:
+            self.assertTrue(fetch_started.wait(5))
+            started = time.monotonic()
+            self.assertEqual(self.verifier.verify(token)['sub'], 'user-sub')
+            self.assertLess(time.monotonic() - started, 1)
+        finally:
+            release_fetch.set()
+            refresh.join(5)
+
+
+@override_settings(
+    COGNITO_AWS_REGION='us-east-1',
+    COGNITO_USER_POOL_ID='us-east-1_test',
+    COGNITO_APP_CLIENT_ID=AUDIENCE
+)
+class GetTokenVerifierTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(token_verifier, '_verifier', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_default_source_is_the_user_pool_url(self):
+        source = token_verifier.get_token_verifier().jwks_source
+        self.assertIsInstance(source, token_verifier.UrlJWKSSource)
+        self.assertEqual(source.url, f'{ISSUER}/.well-known/jwks.json')
+
+    @override_settings(COGNITO_JWKS={'keys': []})
+    def test_jwks_setting(self):
+        source = token_verifier.get_token_verifier().jwks_source
+        self.assertIsInstance(source, StaticJWKSSource)
+        self.assertEqual(source.fetch(), {'keys': []})
+
+    @override_settings(
+        COGNITO_JWKS_SOURCE='cliquepay.token_verifier.StaticJWKSSource',
+        COGNITO_JWKS_SOURCE_OPTIONS={'jwks': {'keys': []}}
+    )
+    def test_source_path_with_options(self):
+        source = token_verifier.get_token_verifier().jwks_source
+        self.assertIsInstance(source, StaticJWKSSource)
+        self.assertEqual(source.fetch(), {'keys': []})
+
+    def test_source_factory(self):
+        _, jwk = generate_key('key-1')
+        with override_settings(COGNITO_JWKS_SOURCE=lambda: StaticJWKSSource({'keys': [jwk]})):
+            verifier = token_verifier.get_token_verifier()
+        self.assertEqual(verifier.jwks_source.fetch(), {'keys': [jwk]})
+        self.assertEqual(verifier.issuer, ISSUER)
+        self.assertEqual(verifier.audience, AUDIENCE)
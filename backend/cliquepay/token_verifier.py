@@ -0,0 +1,185 @@
+import hashlib
+import json
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+import jwt
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class UrlJWKSSource:
+    """
+    Fetches the JSON Web Key Set of a Cognito user pool over HTTPS.
+    """
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def fetch(self):
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+
+class StaticJWKSSource:
+    """
+    Serves a fixed key set, e.g. one generated locally for tests.
+    """
+
+    def __init__(self, jwks):
+        self.jwks = jwks
+
+    def fetch(self):
+        return self.jwks
+
+
+class TokenVerifier:
+    """
+    Verifies Cognito ID tokens locally against the user pool's public keys.
+
+    Checks the signature, audience, issuer, expiry and token_use claims.
+    The key set is fetched once and refetched only when a token is signed
+    with an unknown key id, which is how Cognito rotates keys. Recently
+    verified tokens are kept in a small LRU so repeated requests with the
+    same token skip the signature check entirely.
+    """
+
+    def __init__(self, jwks_source, issuer, audience, cache_size=1024, min_refresh_interval=60):
+        self.jwks_source = jwks_source
+        self.issuer = issuer
+        self.audience = audience
+        self.cache_size = cache_size
+        self.min_refresh_interval = min_refresh_interval
+        self._keys = {}
+        self._keys_fetched_at = None
+        self._verified = OrderedDict()
+        # Guards the verified-token LRU
+        self._lock = threading.Lock()
+        # Serializes key set fetches, which can take seconds. Kept apart
+        # from _lock so verifying cached tokens never waits on the network
+        self._refresh_lock = threading.Lock()
+
+    def _refresh_keys(self):
+        # Don't hammer the JWKS endpoint with tokens signed by unknown keys
+        now = time.monotonic()
+        if self._keys_fetched_at is not None and now - self._keys_fetched_at < self.min_refresh_interval:
+            return
+        jwks = self.jwks_source.fetch()
+        self._keys = {
+            jwk['kid']: jwt.PyJWK(jwk)
+            for jwk in jwks.get('keys', [])
+            if 'kid' in jwk
+        }
+        self._keys_fetched_at = now
+
+    def _get_key(self, kid):
+        # _keys is only ever replaced whole, so it can be read without a lock
+        key = self._keys.get(kid)
+        if key is None:
+            with self._refresh_lock:
+                # Another thread may have fetched the new keys meanwhile
+                key = self._keys.get(kid)
+                if key is None:
+                    self._refresh_keys()
+                    key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError('Token signed with an unknown key')
+        return key
+
+    def verify(self, token):
+        """
+        Verify an ID token and return its claims.
+
+        Args:
+            token (str): Encoded ID token
+        Returns:
+            dict: The verified claims
+        Raises:
+            jwt.InvalidTokenError: If the token is malformed, expired or not
+                issued by the configured user pool and app client
+        """
+        cache_key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        with self._lock:
+            claims = self._verified.get(cache_key)
+            if claims is not None:
+                if claims['exp'] > time.time():
+                    self._verified.move_to_end(cache_key)
+                    return claims
+                del self._verified[cache_key]
+
+        header = jwt.get_unverified_header(token)
+        key = self._get_key(header.get('kid'))
+        claims = jwt.decode(
+            token,
+            key.key,
+            algorithms=[key.algorithm_name or 'RS256'],
+            audience=self.audience,
+            issuer=self.issuer,
+            options={'require': ['exp', 'iat', 'sub']}
+        )
+        if claims.get('token_use') != 'id':
+            raise jwt.InvalidTokenError('Token is not an ID token')
+
+        with self._lock:
+            self._verified[cache_key] = claims
+            self._verified.move_to_end(cache_key)
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return claims
+
+
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def get_jwks_source(issuer):
+    """
+    Build the key set source the verifier reads from.
+
+    COGNITO_JWKS pins a key set given in settings, e.g. one generated
+    locally for tests. COGNITO_JWKS_SOURCE names a source class or factory
+    (a dotted path or the callable itself) that is called with the
+    COGNITO_JWKS_SOURCE_OPTIONS keyword arguments and must return an
+    object with fetch(). Without either, keys come from the user pool's
+    JWKS URL.
+
+    Args:
+        issuer (str): Issuer URL of the user pool
+    Returns:
+        object: A source with a fetch() method returning the key set dict
+    """
+    jwks = getattr(settings, 'COGNITO_JWKS', None)
+    if jwks is not None:
+        return StaticJWKSSource(jwks)
+
+    factory = getattr(settings, 'COGNITO_JWKS_SOURCE', None)
+    if factory:
+        if isinstance(factory, str):
+            factory = import_string(factory)
+        return factory(**getattr(settings, 'COGNITO_JWKS_SOURCE_OPTIONS', {}))
+
+    return UrlJWKSSource(f'{issuer}/.well-known/jwks.json')
+
+
+def get_token_verifier():
+    """
+    Return the process-wide ID token verifier, building it on first use.
+    See get_jwks_source() for where the keys come from.
+    """
+    global _verifier
+    if _verifier is None:
+        with _verifier_lock:
+            if _verifier is None:
+                issuer = (
+                    f'https://cognito-idp.{settings.COGNITO_AWS_REGION}.amazonaws.com/'
+                    f'{settings.COGNITO_USER_POOL_ID}'
+                )
+                _verifier = TokenVerifier(
+                    get_jwks_source(issuer),
+                    issuer=issuer,
+                    audience=settings.COGNITO_APP_CLIENT_ID,
+                    cache_size=getattr(settings, 'COGNITO_TOKEN_CACHE_SIZE', 1024)
+                )
+    return _verifier
@@ -0,0 +1,97 @@
+import threading
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from .cache_utils import TTLCache
+from .models import User
+
+KEY_PREFIX = 'cliquepay:user'
+
+
+class UserCache:
+    """
+    cognito_id -> User record cache.
+
+    Records live in an in-process LRU, optionally backed by a shared Django
+    cache (e.g. Redis or Memcached) so other workers can reuse them. Keys
+    carry a per-user version that invalidate() replaces, so a profile
+    update in one process makes every process's copy unreachable without
+    having to find and delete it. Callers get a fresh User instance on
+    every hit, never an object shared with another request.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300, shared=None):
+        self.ttl = ttl
+        self.shared = shared
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Versions outlive the entries they guard, so an expired version
+        # can't bring an older entry back: an entry written under the old
+        # version just after invalidate() lives at most ttl past it
+        self.version_ttl = ttl * 2
+        self._versions = TTLCache(maxsize=maxsize, ttl=self.version_ttl)
+        self._fields = [field.attname for field in User._meta.concrete_fields]
+
+    def _version_key(self, cognito_id):
+        return f'{KEY_PREFIX}:version:{cognito_id}'
+
+    def _entry_key(self, cognito_id, version):
+        return f'{KEY_PREFIX}:{version}:{cognito_id}'
+
+    def get_version(self, cognito_id):
+        """
+        Current version of a user's cache key. Read it before loading the
+        user from the database and pass it to set(), so a record loaded
+        while the user was being updated is never cached as current.
+        """
+        if self.shared is not None:
+            return self.shared.get(self._version_key(cognito_id), '0')
+        return self._versions.get(cognito_id, '0')
+
+    def get(self, cognito_id, version=None):
+        version = self.get_version(cognito_id) if version is None else version
+        key = self._entry_key(cognito_id, version)
+        values = self._local.get(key)
+        if values is None and self.shared is not None:
+            values = self.shared.get(key)
+            if values is not None:
+                self._local.set(key, values)
+        if values is None:
+            return None
+        return User.from_db('default', self._fields, values)
+
+    def set(self, user, version=None):
+        version = self.get_version(user.cognito_id) if version is None else version
+        key = self._entry_key(user.cognito_id, version)
+        values = tuple(getattr(user, field) for field in self._fields)
+        self._local.set(key, values)
+        if self.shared is not None:
+            self.shared.set(key, values, timeout=self.ttl)
+
+    def invalidate(self, cognito_id):
+        version = uuid.uuid4().hex
+        self._versions.set(cognito_id, version)
+        if self.shared is not None:
+            self.shared.set(self._version_key(cognito_id), version, timeout=self.version_ttl)
+
+
+_user_cache = None
+_user_cache_lock = threading.Lock()
+
+
+def get_user_cache():
+    """
+    Return the process-wide user cache, building it on first use.
+    USER_CACHE_ALIAS names a Django cache to share records across
+    processes, without it the cache is process-local.
+    """
+    global _user_cache
+    if _user_cache is None:
+        with _user_cache_lock:
+            if _user_cache is None:
+                alias = getattr(settings, 'USER_CACHE_ALIAS', None)
+                _user_cache = UserCache(
+                    maxsize=getattr(settings, 'USER_CACHE_SIZE', 10000),
+                    ttl=getattr(settings, 'USER_CACHE_TTL', 300),
+                    shared=caches[alias] if alias else None
+                )
+    return _user_cache
@@ -139,7 +139,6 @@ export const PaymentModal = ({ isOpen, onClose, onSuccess }) => {
         setError('Authentication required');
         return;
       }
-      const encodedToken = encodeURIComponent(token);
       
       // Different endpoints for group vs friend payment
       const endpoint =`${API_URL}/create-expense/` 
@@ -149,14 +148,14 @@ export const PaymentModal = ({ isOpen, onClose, onSuccess }) => {
             group_id: selectedGroupId,
             total_amount: parseFloat(amount),
             description: description,
-            paid_by: token, 
+            id_token: token,
             deadline: deadline,
           }
         : {
             friend_id: selectedFriendId,
             total_amount: parseFloat(amount),
             description: description,
-            paid_by: encodedToken,
+            id_token: token,
             deadline: deadline, 
           };
       